@@ -0,0 +1,105 @@
+"""
+Build time and quality of the content similarity index (movies.services.content_index)
+on synthetic overviews, for growing catalog sizes. No database needed:
+
+    DJANGO_SETTINGS_MODULE=movie_backend.settings python -m benchmarks.content_index --sizes 1000 10000 50000
+
+For each size: time to vectorize and to find every movie's neighbours, neighbours kept,
+recall@10 against exact brute force on a sample of movies (over all exact
+neighbours, and over the strong ones only), and what one brute-force query
+would cost per request without the index.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+STRONG = 0.3  # neighbours at least this similar are the ones worth recommending
+
+
+def _word(i):
+    # letters only: the tokenizer ignores digits
+    letters = ""
+    while True:
+        i, rest = divmod(i, 26)
+        letters += chr(ord("a") + rest)
+        if not i:
+            return "x" + letters
+
+
+def synthetic_overviews(n, seed=0, vocabulary=20_000, topics=300):
+    """
+    Overviews mixing topic words with Zipf-distributed background words. About
+    half the movies belong to small franchises that share names and a phrase,
+    like sequels do, so there are strong neighbours to find.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array([_word(i) for i in range(vocabulary)])
+    topic_words = rng.integers(0, vocabulary, size=(topics, 60))
+    franchise = np.where(rng.random(n) < 0.5, rng.integers(0, max(1, n // 6), size=n), -1)
+    franchise_words = np.random.default_rng(seed + 1).integers(0, vocabulary, size=(max(1, n // 6), 8))
+
+    texts = []
+    for i, topic in enumerate(rng.integers(0, topics, size=n)):
+        length = rng.integers(15, 60)
+        parts = [rng.choice(topic_words[topic], size=length // 3), rng.zipf(1.3, size=length - length // 3) % vocabulary]
+        if franchise[i] >= 0:
+            parts.insert(0, franchise_words[franchise[i]])
+        texts.append(" ".join(words[np.concatenate(parts)]))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    parser.add_argument("--max-df", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=200, help="Movies checked against brute force")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "movie_backend.settings")
+    import django
+    django.setup()
+
+    from movies.services.content_index import document_frequency, hashed_counts, nearest_neighbours, tfidf
+
+    print(f"{'movies':>8}{'vectorize s':>13}{'neighbours s':>14}{'pairs':>10}"
+          f"{'recall@10':>11}{'strong recall':>15}{'brute ms/query':>16}")
+    for size in args.sizes:
+        texts = synthetic_overviews(size)
+
+        started = time.perf_counter()
+        counts = hashed_counts(texts, 2 ** 18)
+        vectors = tfidf(counts)
+        vectorized = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found = {row: set(columns.tolist()) for row, columns, _ in
+                 nearest_neighbours(vectors, document_frequency(counts), top_n=10, max_df=args.max_df)}
+        built = time.perf_counter() - started
+        pairs = sum(len(columns) for columns in found.values())
+
+        rng = np.random.default_rng(1)
+        sample = rng.choice(size, size=min(args.sample, size), replace=False)
+        transposed = vectors.T.tocsr()
+        hits = total = strong_hits = strong_total = 0
+        started = time.perf_counter()
+        for row in sample:
+            scores = (vectors[row] @ transposed).toarray().ravel()
+            scores[row] = -1
+            exact = np.argpartition(-scores, 10)[:10]
+            strong = set(exact[scores[exact] >= STRONG].tolist())
+            exact = set(exact[scores[exact] >= 0.05].tolist())
+            hits += len(exact & found.get(row, set()))
+            total += len(exact)
+            strong_hits += len(strong & found.get(row, set()))
+            strong_total += len(strong)
+        brute = (time.perf_counter() - started) / len(sample) * 1000
+
+        recall = hits / total if total else float("nan")
+        strong_recall = strong_hits / strong_total if strong_total else float("nan")
+        print(f"{size:>8}{vectorized:>13.2f}{built:>14.2f}{pairs:>10}{recall:>11.2f}{strong_recall:>15.2f}{brute:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Local stand-in for the TMDB API, so the service can be load tested without
+touching (or being rate limited by) the real one.
+
+    python -m benchmarks.fake_tmdb --port 8001 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+    TMDB_BASE_URL=http://127.0.0.1:8001/3 PROFILE_REQUESTS=True gunicorn movie_backend.wsgi
+
+Serves the payloads recorded in benchmarks/fixtures/movies.json. Refresh them
+from the real API with:
+
+    TMDB_API_KEY=... python -m benchmarks.fake_tmdb record
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures" / "movies.json"
+PAGE_SIZE = 20
+
+
+def list_item(movie):
+    """Details payload -> the shorter shape TMDB uses in result lists."""
+    item = {key: value for key, value in movie.items() if key not in ("genres", "runtime")}
+    item["genre_ids"] = [genre["id"] for genre in movie.get("genres", [])]
+    return item
+
+
+def page(items, number=1):
+    start = (number - 1) * PAGE_SIZE
+    return {
+        "page": number,
+        "results": items[start:start + PAGE_SIZE],
+        "total_pages": max(1, -(-len(items) // PAGE_SIZE)),
+        "total_results": len(items),
+    }
+
+
+class Fixtures:
+    def __init__(self, path=FIXTURES):
+        with open(path, encoding="utf-8") as fixture:
+            movies = json.load(fixture)
+        self.movies = {movie["id"]: movie for movie in movies}
+        self.by_popularity = sorted(movies, key=lambda movie: -movie.get("popularity", 0))
+
+    def trending(self):
+        return page([list_item(movie) for movie in self.by_popularity])
+
+    def details(self, movie_id):
+        return self.movies.get(movie_id)
+
+    def recommendations(self, movie_id):
+        movie = self.movies.get(movie_id)
+        if movie is None:
+            return None
+        # Movies sharing a genre, most popular first - stable for a given id
+        genres = {genre["id"] for genre in movie["genres"]}
+        similar = [
+            list_item(other) for other in self.by_popularity
+            if other["id"] != movie_id and genres & {genre["id"] for genre in other["genres"]}
+        ]
+        return page(similar)
+
+    def search(self, query, number=1):
+        query = query.lower()
+        return page([list_item(movie) for movie in self.by_popularity if query in movie["title"].lower()], number)
+
+
+class FakeTMDB(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        super().__init__(address, Handler)
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, status):
+        with self.stats_lock:
+            self.stats[status] += 1
+
+    def delay(self):
+        spread = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + spread) / 1000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    ROUTES = [
+        (re.compile(r"/3/trending/movie/week"), lambda f, match, query: f.trending()),
+        (re.compile(r"/3/search/movie"), lambda f, match, query: f.search(
+            query.get("query", [""])[0], int(query.get("page", ["1"])[0]))),
+        (re.compile(r"/3/movie/(\d+)/recommendations"), lambda f, match, query: f.recommendations(int(match[1]))),
+        (re.compile(r"/3/movie/(\d+)"), lambda f, match, query: f.details(int(match[1]))),
+    ]
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.delay())
+
+        roll = server.random.random()
+        if roll < server.rate_limit_rate:
+            return self.reply(429, {"status_code": 25, "status_message": "Too many requests"}, {"Retry-After": "1"})
+        if roll < server.rate_limit_rate + server.error_rate:
+            return self.reply(503, {"status_code": 9, "status_message": "Service unavailable"})
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        for pattern, handler in self.ROUTES:
+            match = pattern.fullmatch(url.path)
+            if match:
+                data = handler(server.fixtures, match, query)
+                if data is None:
+                    break
+                return self.reply(200, data)
+
+        self.reply(404, {"status_code": 34, "status_message": "The resource you requested could not be found."})
+
+    def reply(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(status)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate the benchmark
+
+
+def record(api_key, path=FIXTURES):
+    """Saves details of this week's trending movies as the fixture set."""
+    import requests
+
+    base = "https://api.themoviedb.org/3"
+    session = requests.Session()
+    trending = session.get(f"{base}/trending/movie/week", params={"api_key": api_key}, timeout=10).json()
+
+    movies = []
+    for item in trending["results"]:
+        response = session.get(f"{base}/movie/{item['id']}", params={"api_key": api_key}, timeout=10)
+        if response.status_code == 200:
+            movies.append(response.json())
+
+    with open(path, "w", encoding="utf-8") as fixture:
+        json.dump(movies, fixture, indent=1, ensure_ascii=False)
+    print(f"Recorded {len(movies)} movies to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["serve", "record"], default="serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mean added latency per response")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Latency varies uniformly by +/- this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses that are 503s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of responses that are 429s")
+    parser.add_argument("--seed", type=int, help="Makes injected latency and errors repeatable")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        api_key = os.getenv("TMDB_API_KEY")
+        if not api_key:
+            parser.error("record needs TMDB_API_KEY")
+        return record(api_key, args.fixtures)
+
+    server = FakeTMDB(
+        (args.host, args.port), Fixtures(args.fixtures),
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+    print(f"Fake TMDB on http://{args.host}:{args.port}/3 ({len(server.fixtures.movies)} movies)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses by status: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
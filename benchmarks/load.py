@@ -0,0 +1,198 @@
+"""
+Replays a traffic mix against a running instance of the API.
+
+    python -m benchmarks.fake_tmdb --seed 1 &
+    TMDB_BASE_URL=http://127.0.0.1:8001/3 PROFILE_REQUESTS=True gunicorn -w 4 movie_backend.wsgi &
+    python -m benchmarks.load --mix trending-heavy --duration 60 --concurrency 32 --output after.json
+    python -m benchmarks.report before.json after.json
+
+DB queries per request are read from the Server-Timing header, so run the
+server with PROFILE_REQUESTS=True (and a sample rate of 0 if slow request
+logs get in the way) to get them.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+import httpx
+
+from .report import format_table, parse_server_timing, summarize
+
+SEARCH_TERMS = ["the", "dark", "toy", "blade", "dune", "alien", "matrix", "story", "god", "inside", "zzz"]
+
+# Relative weights of each operation
+MIXES = {
+    "trending-heavy": {
+        "trending": 70, "details": 15, "recommended": 5, "search": 5, "list_favorites": 5,
+    },
+    "search-heavy": {
+        "search": 55, "autocomplete": 25, "details": 10, "trending": 10,
+    },
+    "favorites-heavy": {
+        "list_favorites": 40, "add_favorite": 25, "remove_favorite": 15, "details": 10, "trending": 10,
+    },
+}
+
+
+class Session:
+    """One simulated user: an authenticated client plus the movies it has seen."""
+
+    def __init__(self, base_url, movies, timeout):
+        self.client = httpx.Client(base_url=base_url, timeout=timeout)
+        self.movies = movies  # (local id, tmdb id) pairs
+        username = f"bench-{uuid.uuid4().hex[:12]}"
+        response = self.client.post(
+            "/api/users/register/",
+            json={"username": username, "email": f"{username}@example.com", "password": "benchmark"},
+        )
+        response.raise_for_status()
+        self.client.headers["Authorization"] = f"Bearer {response.json()['tokens']['access']}"
+
+    def movie_id(self, rng):
+        """Local id, what the favorites endpoints take."""
+        return rng.choice(self.movies)[0]
+
+    def tmdb_id(self, rng):
+        """TMDB id, what details and recommendations take."""
+        return rng.choice(self.movies)[1]
+
+
+# Operations take a session and a seeded Random and return the response
+
+def trending(session, rng):
+    return session.client.get("/api/movies/trending/")
+
+
+def details(session, rng):
+    # Mostly movies we store, sometimes an id TMDB doesn't know
+    movie_id = session.tmdb_id(rng) if rng.random() < 0.95 else rng.randint(10**8, 10**9)
+    return session.client.get(f"/api/movies/{movie_id}/")
+
+
+def recommended(session, rng):
+    return session.client.get(f"/api/movies/{session.tmdb_id(rng)}/recommended/")
+
+
+def search(session, rng):
+    return session.client.get("/api/movies/search/", params={"query": rng.choice(SEARCH_TERMS)})
+
+
+def autocomplete(session, rng):
+    term = rng.choice(SEARCH_TERMS)
+    return session.client.get("/api/movies/autocomplete/", params={"q": term[:rng.randint(3, max(3, len(term)))]})
+
+
+def list_favorites(session, rng):
+    return session.client.get("/api/movies/favorites/")
+
+
+def add_favorite(session, rng):
+    return session.client.post(f"/api/movies/{session.movie_id(rng)}/favorite/")
+
+
+def remove_favorite(session, rng):
+    return session.client.delete(f"/api/movies/favorites/{session.movie_id(rng)}/remove/")
+
+
+OPERATIONS = {
+    "trending": trending,
+    "details": details,
+    "recommended": recommended,
+    "search": search,
+    "autocomplete": autocomplete,
+    "list_favorites": list_favorites,
+    "add_favorite": add_favorite,
+    "remove_favorite": remove_favorite,
+}
+
+
+class LoadRun:
+    def __init__(self, base_url, mix, concurrency, duration, warmup, seed, timeout):
+        self.base_url = base_url
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.timeout = timeout
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def seed_movies(self):
+        """Trending stores movies locally; their ids are what the other operations use."""
+        session = Session(self.base_url, [], self.timeout)
+        response = session.client.get("/api/movies/trending/")
+        session.client.close()
+        response.raise_for_status()
+        return [(movie["id"], movie["tmdb_id"]) for movie in response.json()]
+
+    def run(self):
+        movies = self.seed_movies()
+        # Every session registers before the clock starts, so sign-up isn't measured
+        ready = threading.Barrier(self.concurrency, action=self._start_clock)
+        threads = [
+            threading.Thread(target=self.worker, args=(index, movies, ready), daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(self.samples, self.duration)
+
+    def _start_clock(self):
+        self.measure_from = time.monotonic() + self.warmup
+        self.stop_at = self.measure_from + self.duration
+
+    def worker(self, index, movies, ready):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        session = Session(self.base_url, movies, self.timeout)
+        ready.wait()
+
+        samples = []
+        while (now := time.monotonic()) < self.stop_at:
+            name = rng.choices(self.names, self.weights)[0]
+            began = time.perf_counter()
+            try:
+                response = OPERATIONS[name](session, rng)
+                status, timing = response.status_code, response.headers.get("Server-Timing")
+            except httpx.HTTPError:
+                status, timing = 0, None
+            latency = time.perf_counter() - began
+
+            if now >= self.measure_from:  # warmup requests aren't reported
+                samples.append((name, status, latency, parse_server_timing(timing)[0]))
+
+        session.client.close()
+        with self.lock:
+            self.samples.extend(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="trending-heavy")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simulated users sending requests back to back")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of traffic before measuring")
+    parser.add_argument("--seed", type=int, help="Makes the request sequence repeatable")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Save the summary as JSON (for benchmarks.report)")
+    args = parser.parse_args()
+
+    run = LoadRun(args.url, MIXES[args.mix], args.concurrency, args.duration, args.warmup, args.seed, args.timeout)
+    summary = run.run()
+    print(format_table(summary))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"mix": args.mix, "concurrency": args.concurrency, "duration": args.duration,
+                       "summary": summary}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
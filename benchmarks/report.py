@@ -0,0 +1,117 @@
+"""
+Summaries of a load run: throughput, latency percentiles and DB queries per
+request, per operation. Runs are saved as JSON so before/after can be compared:
+
+    python -m benchmarks.report before.json after.json
+"""
+import argparse
+import json
+import math
+import re
+
+# Server-Timing entry written by movies.profiling, e.g. db;dur=3.1;desc="4 calls"
+DB_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) calls"')
+
+
+def parse_server_timing(header):
+    """(queries, db ms) from a Server-Timing header; None when profiling is off."""
+    if header is None:
+        return None, None
+    match = DB_TIMING.search(header)
+    if match is None:
+        return 0, 0.0  # profiled, no queries
+    return int(match[2]), float(match[1])
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    samples: (operation, status, latency seconds, queries or None) tuples.
+    Returns {operation: stats} with an "all" row.
+    """
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+
+    summary = {}
+    for operation, group in groups.items():
+        latencies = sorted(sample[2] * 1000 for sample in group)
+        queries = [sample[3] for sample in group if sample[3] is not None]
+        summary[operation] = {
+            "requests": len(group),
+            "errors": sum(1 for sample in group if sample[1] >= 500 or sample[1] == 0),
+            "rps": len(group) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries_per_request": sum(queries) / len(queries) if queries else None,
+        }
+    return summary
+
+
+def _cell(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def format_table(summary):
+    lines = [f"{'operation':<18}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"]
+    for operation in sorted(summary, key=lambda name: (name == "all", name)):
+        row = summary[operation]
+        lines.append(
+            f"{operation:<18}{row['requests']:>8}{row['errors']:>8}{row['rps']:>9.1f}"
+            f"{_cell(row['p50_ms'], '>9.1f')}{_cell(row['p95_ms'], '>9.1f')}{_cell(row['p99_ms'], '>9.1f')}"
+            f"{_cell(row['queries_per_request'], '>9.2f')}"
+        )
+    return "\n".join(lines)
+
+
+def _change(before, after):
+    if before is None or after is None:
+        return "-"
+    if before == 0:
+        return f"{after:+.2f}"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def format_comparison(before, after):
+    """Relative change per operation for the numbers that matter."""
+    columns = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+    lines = [f"{'operation':<18}" + "".join(f"{column:>24}" for column in columns)]
+    for operation in sorted(after, key=lambda name: (name == "all", name)):
+        if operation not in before:
+            continue
+        cells = []
+        for column in columns:
+            old, new = before[operation][column], after[operation][column]
+            text = f"{_cell(old, '.1f')} -> {_cell(new, '.1f')} ({_change(old, new)})"
+            cells.append(f"{text:>24}")
+        lines.append(f"{operation:<18}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def load(path):
+    with open(path) as saved:
+        return json.load(saved)["summary"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after", nargs="?")
+    args = parser.parse_args()
+
+    if args.after is None:
+        print(format_table(load(args.before)))
+    else:
+        print(format_comparison(load(args.before), load(args.after)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+DRF serializers vs the read-only fast path (movies.serializers.serialize_*)
+on in-memory lists, so no database is needed:
+
+    DJANGO_SETTINGS_MODULE=movie_backend.settings python -m benchmarks.serializers --rows 10000
+"""
+import argparse
+import os
+import timeit
+from datetime import date, datetime, timedelta, timezone
+
+
+def build(rows):
+    from movies.models import FavoriteMovie, Movie
+    from movies.serializers import FAVORITE_VALUES, MOVIE_FIELDS
+
+    added = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    movies = [
+        Movie(
+            id=i, tmdb_id=1000 + i, title=f"Movie {i}", overview="An overview of a reasonable length. " * 4,
+            poster_url=f"https://image.tmdb.org/t/p/w500/poster{i}.jpg",
+            release_date=date(2000, 1, 1) + timedelta(days=i % 9000), genres=[18, 35], language="en",
+        )
+        for i in range(1, rows + 1)
+    ]
+    favorites = [
+        FavoriteMovie(id=movie.id, user_id=1, movie=movie, added_at=added + timedelta(minutes=movie.id))
+        for movie in movies
+    ]
+
+    movie_rows = [{name: getattr(movie, name) for name in MOVIE_FIELDS} for movie in movies]
+    favorite_rows = [
+        {"id": favorite.id, "added_at": favorite.added_at,
+         **{column: movie_row[column.removeprefix("movie__")] for column in FAVORITE_VALUES[2:]}}
+        for favorite, movie_row in zip(favorites, movie_rows)
+    ]
+    return movies, movie_rows, favorites, favorite_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs is reported")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "movie_backend.settings")
+    import django
+    django.setup()
+
+    from movies.renderers import ORJSONRenderer
+    from movies.serializers import FavoriteMovieSerializer, MovieSerializer, serialize_favorites, serialize_movies
+
+    movies, movie_rows, favorites, favorite_rows = build(args.rows)
+    render = ORJSONRenderer().render
+    assert render(serialize_movies(movies)) == render(MovieSerializer(movies, many=True).data)
+    assert render(serialize_favorites(favorite_rows)) == render(FavoriteMovieSerializer(favorites, many=True).data)
+
+    cases = [
+        ("movies", "MovieSerializer(many=True)", lambda: MovieSerializer(movies, many=True).data),
+        ("movies", "serialize_movies(instances)", lambda: serialize_movies(movies)),
+        ("movies", "serialize_movies(rows)", lambda: serialize_movies(movie_rows)),
+        ("favorites", "FavoriteMovieSerializer(many=True)", lambda: FavoriteMovieSerializer(favorites, many=True).data),
+        ("favorites", "serialize_favorites(instances)", lambda: serialize_favorites(favorites)),
+        ("favorites", "serialize_favorites(rows)", lambda: serialize_favorites(favorite_rows)),
+    ]
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    baseline = {}
+    for group, name, run in cases:
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        baseline.setdefault(group, best)
+        print(f"  {name:<38}{best * 1000:>9.1f} ms{baseline[group] / best:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+With ASYNC_MOVIE_VIEWS=True the movie endpoints are native async views, e.g.:
+
+    ASYNC_MOVIE_VIEWS=True uvicorn movie_backend.asgi:application --workers 2 --lifespan off
 """
 
 import os
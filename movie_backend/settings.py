@@ -27,6 +27,36 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+# Point at benchmarks/fake_tmdb.py (http://127.0.0.1:8001/3) to load test without the real API
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# TMDB HTTP client (seconds / connection counts)
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3"))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+TMDB_POOL_TIMEOUT = 5           # how long an async request waits for a free pooled connection
+TMDB_MAX_CONNECTIONS = 100
+TMDB_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Token bucket shared by all workers (Redis). Calls queue up to max_wait seconds
+# before failing with 503; a 429 halves the rate for penalty_seconds.
+TMDB_RATE_LIMIT = {
+    "rate": float(os.getenv("TMDB_RATE_LIMIT_PER_SECOND", "40")),
+    "burst": 40,
+    "max_wait": 2,
+    "penalty_seconds": 60,
+}
+
+# Circuit breaker: open after N consecutive failures/timeouts, probe again after reset_timeout seconds
+TMDB_CIRCUIT_BREAKER = {
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+}
+TMDB_NOT_FOUND_TTL = 10 * 60  # unknown movie ids don't reach TMDB again for this long
+
+# Request coalescing for identical TMDB calls (seconds)
+TMDB_SINGLE_FLIGHT_LOCK_TIMEOUT = 10   # how long a worker may hold the refresh lock
+TMDB_SINGLE_FLIGHT_WAIT = 5            # how long other workers wait for its result
+TMDB_SINGLE_FLIGHT_STALE_TTL = 60 * 60 # last good trending / recommendations served when waiting times out
 APPEND_SLASH=True
 
 #tell Django to use  custom User model
@@ -37,6 +67,9 @@ DEBUG = os.getenv("DEBUG", "True") == "True"  # Default to True if not set
 
 ALLOWED_HOSTS = os.getenv("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
 
+# Serve the TMDB-backed movie endpoints with native async views (run under ASGI, e.g. uvicorn)
+ASYNC_MOVIE_VIEWS = os.getenv("ASYNC_MOVIE_VIEWS", "False") == "True"
+
 # Static files configuration for development
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -56,6 +89,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "movies",
@@ -75,6 +109,17 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-request profiling (movies/profiling.py): SQL, cache, TMDB and serialization
+# time in a Server-Timing header. Off by default; turn on with PROFILE_REQUESTS=True.
+PROFILING = {
+    "enabled": os.getenv("PROFILE_REQUESTS", "False") == "True",
+    "slow_ms": 500,       # log requests slower than this (None to never log)
+    "sample_rate": 0.1,   # fraction of slow requests that get logged
+    "log_queries": 10,    # most repeated statements shown per logged request
+}
+if PROFILING["enabled"]:
+    MIDDLEWARE.insert(0, "movies.profiling.ProfilingMiddleware")
+
 ROOT_URLCONF = "movie_backend.urls"
 
 TEMPLATES = [
@@ -154,14 +199,102 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "movies.cache_backends.TwoTierRedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CLIENT_CLASS": (
+                "movies.profiling.ProfiledRedisClient" if PROFILING["enabled"]
+                else "django_redis.client.DefaultClient"
+            ),
+            # orjson instead of pickle; set CACHE_COMPRESSION=lz4 or zstd (needs the lz4 /
+            # zstandard package) to also compress values of COMPRESS_MIN_BYTES or more
+            "SERIALIZER": "movies.cache_backends.ORJSONSerializer",
+            "COMPRESSION": os.getenv("CACHE_COMPRESSION") or None,
+            "COMPRESS_MIN_BYTES": 1024,
+            # Hot keys also kept in process memory; writes are broadcast so other
+            # workers drop their copy, TTL (seconds) caps staleness if a message is lost
+            "LOCAL_CACHE": {
+                "KEY_PREFIXES": ("swr:v1:trending_movies", "swr:v1:movie_details:", "swr:v1:recommended_movies:"),
+                "MAX_ENTRIES": 2000,
+                "TTL": 30,
+            },
         }
     }
 }
 
+# Stale-while-revalidate TTLs per endpoint (seconds).
+# Past "soft" a value is served stale and refreshed in the background, past "hard" it's gone.
+TMDB_CACHE_TTLS = {
+    "trending": {"soft": 15 * 60, "hard": 6 * 60 * 60},
+    "details": {"soft": 24 * 60 * 60, "hard": 7 * 24 * 60 * 60},
+    "search": {"soft": 10 * 60, "hard": 60 * 60},
+    "recommended": {"soft": 6 * 60 * 60, "hard": 24 * 60 * 60},
+}
+
+# Search answers from the local full-text index when it has at least this many hits,
+# otherwise it falls back to TMDB
+LOCAL_SEARCH_MIN_RESULTS = 5
+LOCAL_SEARCH_LIMIT = 20
+
+# Title autocomplete (trigram index): shorter queries can't use the index
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_MAX_RESULTS = 10
+AUTOCOMPLETE_CACHE_TTL = 10 * 60
+
+# GET /api/movies/favorites/ is cursor paginated (see services/pagination.py)
+FAVORITES_PAGE_SIZE = 50
+FAVORITES_MAX_PAGE_SIZE = 200
+# Most TMDB ids the batch add/remove/check endpoints take at once
+FAVORITES_BATCH_MAX = 100
+
+# GET /api/movies/discover/ filters stored movies only, cursor paginated
+DISCOVER_PAGE_SIZE = 20
+DISCOVER_MAX_PAGE_SIZE = 100
+
+# Neighbours kept per movie by the build_similarities command (and the most
+# the similar-movie endpoints return)
+SIMILAR_MOVIES_TOP_N = 50
+
+# Where /api/movies/<id>/recommended/ comes from. "tmdb": TMDB's recommendations,
+# or the local content neighbours (build_similarities --kind content) when TMDB
+# has none. "local": the content neighbours only, TMDB isn't called.
+RECOMMENDATIONS_MODE = os.getenv("RECOMMENDATIONS_MODE", "tmdb")
+
+# /api/movies/for-you/ (services/recommender.py). With a feature store every
+# worker memory-maps the snapshot published by `manage.py export_features` and
+# checks for a newer one every reload_interval seconds. Without one each
+# process loads the catalog from the database every catalog_ttl seconds.
+RECOMMENDER = {
+    "feature_store": os.getenv("RECOMMENDER_FEATURE_STORE") or None,
+    "reload_interval": 5,
+    "catalog_ttl": 10 * 60,
+    "page_size": 20,
+    "max_page_size": 50,
+    "weights": {
+        # how the score of a movie is made up
+        "genres": 1.0,  # cosine between its genres and the user's
+        "language": 0.3,  # share of the user's favorites in its language, 1 if preferred
+        "popularity": 0.2,  # log-scaled TMDB popularity, 0..1
+        # how the user's genre vector is made up
+        "preferred_genre": 1.0,
+        "favorite_genre": 2.0,
+    },
+}
+
+# /metrics (Prometheus text format). Scrapers must send `Authorization: Bearer <token>`.
+# Without a token the endpoint is a 404, unless DEBUG is on.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        # set MOVIES_LOG_LEVEL=DEBUG to log every TMDB call with its timing
+        "movies": {"handlers": ["console"], "level": os.getenv("MOVIES_LOG_LEVEL", "INFO")},
+    },
+}
+
 # cache sessions
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"                   # Sessions are stored in the Redis cache
@@ -174,6 +307,15 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "movies.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "movies.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,  # default page size
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
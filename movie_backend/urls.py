@@ -26,6 +26,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from movies.views import metrics
+
 # Schema view for JSON
 schema_view = get_schema_view(
     openapi.Info(
@@ -128,6 +130,9 @@ urlpatterns = [
     path('swagger/', custom_swagger_view),
     path('swagger.json', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     
+    # Prometheus scrape target
+    path('metrics', metrics, name='metrics'),
+
     # Admin
     path('admin/', admin.site.urls),
     
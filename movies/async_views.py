@@ -0,0 +1,194 @@
+"""
+Native async versions of the TMDB-backed movie endpoints.
+
+They're routed instead of the sync views in views.py when ASYNC_MOVIE_VIEWS
+is on, and are meant to be served by an ASGI server (see movie_backend/asgi.py).
+While a worker waits on TMDB it keeps serving other requests.
+"""
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from django.conf import settings
+
+from .models import Movie
+from .serializers import MovieSerializer, serialize_movie, serialize_movies
+from .services.exceptions import TMDBNotFoundError, TMDBUnavailableError
+from .services.tmdb import AsyncTMDBClient
+from .services.movie_sync import async_sync_movies_from_tmdb
+from .services.cache import swr_cache
+from .services.search import local_search
+from .services.fallback import recent_movies, movies_sharing_genres
+from .views import search_cache_key, similar_content, tmdb_unavailable, local_fallback
+
+tmdb = AsyncTMDBClient()
+
+MOVIE_ID_PARAMETER = openapi.Parameter(
+    'movie_id', openapi.IN_PATH,
+    description="TMDB Movie ID",
+    type=openapi.TYPE_INTEGER,
+    required=True
+)
+
+
+# Loaders used by the stale-while-revalidate cache (fetch + save + serialize)
+
+async def load_trending():
+    data = await tmdb.get_trending_movies()
+    movies = await async_sync_movies_from_tmdb(data.get("results", []))
+    return serialize_movies(movies)
+
+
+async def load_recommended(movie_id):
+    data = await tmdb.get_recommended(movie_id)
+    movies = await async_sync_movies_from_tmdb(data.get("results", []))
+    # TMDB often has nothing for older or niche titles
+    return serialize_movies(movies or await sync_to_async(similar_content)(movie_id))
+
+
+async def load_movie_details(movie_id):
+    try:
+        movie = await Movie.objects.aget(tmdb_id=movie_id)
+    except Movie.DoesNotExist:
+        data = await tmdb.get_movie_details(movie_id)
+        movie = (await async_sync_movies_from_tmdb([data]))[0]
+
+    return serialize_movie(movie)
+
+
+async def load_search(query):
+    data = await tmdb.search_movies(query)
+    movies = await async_sync_movies_from_tmdb(data.get("results", []))
+    return serialize_movies(movies)
+
+
+# Get Trending Movies
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Get trending movies",
+    operation_description="Retrieve currently trending movies from TMDB (cached, refreshed in the background)",
+    responses={
+        200: openapi.Response(description="List of trending movies", schema=MovieSerializer(many=True)),
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
+    }
+)
+@api_view(["GET"])
+async def trending_movies(request):
+    try:
+        movies = await swr_cache.aget_or_load("trending", "trending_movies", load_trending)
+        return Response(movies)
+    except TMDBUnavailableError as e:
+        return local_fallback(e, await sync_to_async(recent_movies)())
+    except Exception as e:
+        return Response({"error": f"Failed to fetch trending movies: {str(e)}"}, status=500)
+
+
+# Get Movie Recommendations
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Get movie recommendations",
+    operation_description=(
+        "Get recommended movies based on a specific movie. From TMDB, or from stored movies with "
+        "similar overviews when TMDB has none (or always, with RECOMMENDATIONS_MODE=local)."
+    ),
+    manual_parameters=[MOVIE_ID_PARAMETER],
+    responses={
+        200: openapi.Response(description="List of recommended movies", schema=MovieSerializer(many=True)),
+        404: openapi.Response(description="Movie not found"),
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
+    }
+)
+@api_view(["GET"])
+async def recommended_movies(request, movie_id):
+    try:
+        if settings.RECOMMENDATIONS_MODE == "local":
+            return Response(serialize_movies(await sync_to_async(similar_content)(movie_id)))
+
+        movies = await swr_cache.aget_or_load(
+            "recommended", f"recommended_movies:{movie_id}", lambda: load_recommended(movie_id)
+        )
+        return Response(movies)
+    except TMDBNotFoundError:
+        return Response({"error": "Movie not found"}, status=404)
+    except TMDBUnavailableError as e:
+        return local_fallback(
+            e, await sync_to_async(similar_content)(movie_id) or await sync_to_async(movies_sharing_genres)(movie_id)
+        )
+    except Exception as e:
+        return Response({"error": f"Failed to fetch recommendations: {str(e)}"}, status=500)
+
+
+# Get Movie Details
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Get movie details",
+    operation_description="Get detailed information about a specific movie",
+    manual_parameters=[MOVIE_ID_PARAMETER],
+    responses={
+        200: MovieSerializer,
+        404: openapi.Response(description="Movie not found"),
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
+    }
+)
+@api_view(["GET"])
+async def movie_details(request, movie_id):
+    try:
+        movie = await swr_cache.aget_or_load(
+            "details", f"movie_details:{movie_id}", lambda: load_movie_details(movie_id)
+        )
+        return Response(movie)
+    except TMDBNotFoundError:
+        return Response({"error": "Movie not found"}, status=404)
+    except TMDBUnavailableError as e:
+        return tmdb_unavailable(e)
+    except Exception as e:
+        return Response({"error": f"Failed to fetch movie details: {str(e)}"}, status=500)
+
+
+# Search Movies
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Search movies",
+    operation_description="Search stored movies by title and overview, falling back to TMDB when there are too few local matches",
+    manual_parameters=[
+        openapi.Parameter(
+            'query', openapi.IN_QUERY,
+            description="Search query",
+            type=openapi.TYPE_STRING,
+            required=True
+        )
+    ],
+    responses={
+        200: openapi.Response(description="Search results", schema=MovieSerializer(many=True)),
+        400: openapi.Response(description="Missing query parameter"),
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
+    }
+)
+@api_view(["GET"])
+async def search_movies(request):
+    try:
+        query = request.GET.get('query', '').strip()
+        if not query:
+            return Response({"error": "Query parameter is required"}, status=400)
+
+        local = [movie async for movie in local_search(query)[:settings.LOCAL_SEARCH_LIMIT]]
+        if len(local) >= settings.LOCAL_SEARCH_MIN_RESULTS:
+            return Response(serialize_movies(local))
+
+        try:
+            movies = await swr_cache.aget_or_load("search", search_cache_key(query), lambda: load_search(query))
+        except TMDBUnavailableError as e:
+            # Fewer local matches than we'd like, but better than nothing
+            return local_fallback(e, local)
+        return Response(movies)
+    except Exception as e:
+        return Response({"error": f"Search failed: {str(e)}"}, status=500)
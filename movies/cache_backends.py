@@ -0,0 +1,374 @@
+# movies/cache_backends.py
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import orjson
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+from django_redis.cache import RedisCache
+from django_redis.serializers.base import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalTier:
+    """Bounded LRU with per-entry expiry, shared by the threads of one process."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self.hits = self.misses = 0
+        # Bumped on every eviction, so a value read from Redis before an
+        # invalidation arrived isn't stored after it
+        self.generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None, generation=None):
+        ttl = self.ttl if timeout is None else min(self.ttl, timeout)
+        if ttl <= 0:
+            return self.delete(key)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+
+class TwoTierRedisCache(RedisCache):
+    """
+    django_redis cache with an in-process LRU in front of it for hot keys.
+
+    Only keys starting with one of OPTIONS["LOCAL_CACHE"]["KEY_PREFIXES"] use
+    the local tier; a hit there costs no network round trip and no unpickling.
+    Every write to such a key is broadcast over Redis pub/sub and evicts it
+    from the other processes. The local TTL bounds staleness should a message
+    be missed (e.g. while the subscriber reconnects).
+
+    Values from the local tier are shared between callers: don't mutate them.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        local = params.get("OPTIONS", {}).get("LOCAL_CACHE", {})
+        self.local_prefixes = tuple(local.get("KEY_PREFIXES", ()))
+        self.channel = local.get("CHANNEL", "cache:invalidate")
+        self.local = LocalTier(local.get("MAX_ENTRIES", 1000), local.get("TTL", 30))
+
+        self._origin = uuid.uuid4().hex
+        self._subscriber_lock = threading.Lock()
+        self._subscriber_pid = None
+        self._subscriber = None
+        self._retry_at = 0.0
+
+    # ===============================
+    #          INVALIDATION
+    # ===============================
+
+    def _local_ready(self):
+        """
+        True when invalidations are being received, starting the subscriber if needed.
+        Without it the local tier is skipped - serving from it could mean serving stale data.
+        """
+        pid = os.getpid()
+        if self._subscriber_pid == pid and self._subscriber.is_alive():
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+
+        with self._subscriber_lock:
+            if self._subscriber_pid == pid and self._subscriber.is_alive():
+                return True
+            if self._subscriber_pid == pid:
+                # Died in this process: drop its connection, we're starting another
+                logger.warning("Cache invalidation subscriber died, restarting it")
+                self._subscriber_pid = None
+                try:
+                    self._subscriber.pubsub.close()
+                except Exception:
+                    pass
+            # Forked workers must not reuse the parent's entries or thread, and
+            # nothing evicted our entries while no subscriber was listening
+            self.local.clear()
+            try:
+                pubsub = self.client.get_client(write=True).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_invalidate})
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1.0, daemon=True, exception_handler=self._on_subscriber_error
+                )
+            except Exception:
+                logger.warning("Cache invalidation subscriber failed to start, local tier disabled for now")
+                self._retry_at = time.monotonic() + 5
+                return False
+            self._subscriber_pid = pid
+            return True
+
+    def _on_invalidate(self, message):
+        origin, _, key = message["data"].decode().partition("|")
+        if origin == self._origin:
+            return
+        if key == "*":
+            self.local.clear()
+        else:
+            self.local.delete(key)
+
+    def _on_subscriber_error(self, error, pubsub, thread):
+        # Messages may have been lost while disconnected; pubsub resubscribes on its own
+        logger.warning("Cache invalidation subscriber lost its connection: %s", error)
+        self.local.clear()
+        time.sleep(1)
+
+    def _publish(self, *keys):
+        try:
+            client = self.client.get_client(write=True)
+            for key in keys:
+                client.publish(self.channel, f"{self._origin}|{key}")
+        except Exception:
+            logger.warning("Cache invalidation for %s could not be published", keys)
+
+    def _is_local(self, key):
+        return bool(self.local_prefixes) and str(key).startswith(self.local_prefixes)
+
+    def _local_key(self, key, version):
+        return self.make_key(key, version)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # ===============================
+    #            READS
+    # ===============================
+
+    def get(self, key, default=None, version=None, client=None):
+        if client is not None or not self._is_local(key) or not self._local_ready():
+            return super().get(key, default, version, client)
+
+        local_key = self._local_key(key, version)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            return value
+
+        generation = self.local.generation
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        self.local.set(local_key, value, generation=generation)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        if client is not None or not any(map(self._is_local, keys)) or not self._local_ready():
+            return super().get_many(keys, version=version, client=client)
+
+        found, remote = {}, []
+        for key in keys:
+            value = self.local.get(self._local_key(key, version)) if self._is_local(key) else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+
+        if remote:
+            generation = self.local.generation
+            fetched = super().get_many(remote, version=version)
+            for key, value in fetched.items():
+                if self._is_local(key):
+                    self.local.set(self._local_key(key, version), value, generation=generation)
+            found.update(fetched)
+        return found
+
+    # ===============================
+    #            WRITES
+    # ===============================
+
+    def _written(self, key, value, timeout, version):
+        """After a write to Redis: keep our copy and evict everyone else's."""
+        local_key = self._local_key(key, version)
+        if self._local_ready():
+            self.local.set(local_key, value, self._timeout(timeout))
+        self._publish(local_key)
+
+    def _removed(self, *keys, version=None):
+        local_keys = [self._local_key(key, version) for key in keys]
+        for local_key in local_keys:
+            self.local.delete(local_key)
+        self._publish(*local_keys)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        stored = super().set(key, value, timeout, version=version, client=client, nx=nx, xx=xx)
+        if self._is_local(key):
+            if stored:
+                self._written(key, value, timeout, version)
+            else:
+                self._removed(key, version=version)
+        return stored
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        added = super().add(key, value, timeout, version=version, client=client)
+        if added and self._is_local(key):
+            self._written(key, value, timeout, version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout, version=version, client=client)
+        for key, value in data.items():
+            if self._is_local(key):
+                self._written(key, value, timeout, version)
+        return result
+
+    def delete(self, key, version=None, client=None):
+        deleted = super().delete(key, version=version, client=client)
+        if self._is_local(key):
+            self._removed(key, version=version)
+        return deleted
+
+    def delete_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        result = super().delete_many(keys, version=version, client=client)
+        local_keys = [key for key in keys if self._is_local(key)]
+        if local_keys:
+            self._removed(*local_keys, version=version)
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None):
+        value = super().incr(key, delta, version=version, client=client)
+        if self._is_local(key):
+            self._removed(key, version=version)
+        return value
+
+    def decr(self, key, delta=1, version=None, client=None):
+        value = super().decr(key, delta, version=version, client=client)
+        if self._is_local(key):
+            self._removed(key, version=version)
+        return value
+
+    def clear(self):
+        result = super().clear()
+        self.local.clear()
+        self._publish("*")
+        return result
+
+
+# ===============================
+#        CACHE SERIALIZER
+# ===============================
+
+# First byte of a stored value: how it was encoded
+_JSON, _PICKLE = b"j", b"p"
+# Second byte: how it was compressed
+_RAW, _LZ4, _ZSTD = b"-", b"l", b"z"
+_PICKLE_PROTOCOL = b"\x80"  # values written by the plain pickle serializer
+
+
+def _lz4():
+    import lz4.frame
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+def _zstd():
+    import zstandard
+    return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+
+
+_CODECS = {_LZ4: _lz4, _ZSTD: _zstd}
+_COMPRESSION_NAMES = {"lz4": _LZ4, "zstd": _ZSTD}
+
+
+class ORJSONSerializer(BaseSerializer):
+    """
+    django_redis SERIALIZER: orjson instead of pickle, optionally compressed.
+
+    Plain JSON values are stored as JSON, so tuples come back as lists, dict
+    subclasses as dicts and UUIDs as strings. Dates, sets, model instances
+    and the like are pickled. Values written by PickleSerializer are still
+    read, so switching doesn't need a cache flush.
+
+    The codec for new values comes from OPTIONS["COMPRESSION"] (the
+    CACHE_COMPRESSION env var in settings): unset means no compression,
+    "lz4" or "zstd" compress values of OPTIONS["COMPRESS_MIN_BYTES"] or more.
+    Those packages (lz4, zstandard) aren't in requirements.txt; install the
+    one you pick, or startup fails with ImproperlyConfigured. Every value
+    records its own codec, so values written under an earlier setting stay
+    readable as long as their package is installed.
+    """
+
+    # Anything outside plain JSON must not be silently turned into strings
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def __init__(self, options):
+        super().__init__(options)
+        name = options.get("COMPRESSION")
+        self.min_bytes = options.get("COMPRESS_MIN_BYTES", 1024)
+        self.compression = _RAW
+        if name:
+            if name not in _COMPRESSION_NAMES:
+                raise ImproperlyConfigured(f"COMPRESSION must be one of {sorted(_COMPRESSION_NAMES)}, not {name!r}")
+            self.compression = _COMPRESSION_NAMES[name]
+            try:
+                self._compress = _CODECS[self.compression]()[0]
+            except ImportError as e:
+                raise ImproperlyConfigured(f"COMPRESSION={name!r} needs the {e.name} package") from e
+        self._decompressors = {}
+
+    def dumps(self, value):
+        try:
+            kind, data = _JSON, orjson.dumps(value, default=_not_json, option=self.options)
+        except TypeError:
+            kind, data = _PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if self.compression != _RAW and len(data) >= self.min_bytes:
+            return kind + self.compression + self._compress(data)
+        return kind + _RAW + data
+
+    def loads(self, value):
+        if value[:1] == _PICKLE_PROTOCOL:
+            return pickle.loads(value)
+
+        kind, compression, data = value[:1], value[1:2], value[2:]
+        if compression != _RAW:
+            data = self._decompressor(compression)(data)
+        if kind == _JSON:
+            return orjson.loads(data)
+        return pickle.loads(data)
+
+    def _decompressor(self, compression):
+        # Values compressed under an earlier COMPRESSION setting stay readable
+        decompress = self._decompressors.get(compression)
+        if decompress is None:
+            decompress = self._decompressors[compression] = _CODECS[compression]()[1]
+        return decompress
+
+
+def _not_json(value):
+    raise TypeError
@@ -0,0 +1,41 @@
+# movies/genres.py
+"""
+TMDB's movie genre ids. Movie.genres stores these; their position here is
+the bit used for the genre in bitmasks and the column in feature matrices.
+Only ever append, or stored masks change meaning.
+"""
+
+GENRES = {
+    28: "Action",
+    12: "Adventure",
+    16: "Animation",
+    35: "Comedy",
+    80: "Crime",
+    99: "Documentary",
+    18: "Drama",
+    10751: "Family",
+    14: "Fantasy",
+    36: "History",
+    27: "Horror",
+    10402: "Music",
+    9648: "Mystery",
+    10749: "Romance",
+    878: "Science Fiction",
+    10770: "TV Movie",
+    53: "Thriller",
+    10752: "War",
+    37: "Western",
+}
+
+GENRE_IDS = tuple(GENRES)
+GENRE_BITS = {genre_id: bit for bit, genre_id in enumerate(GENRE_IDS)}
+
+
+def genre_mask(genres):
+    """Bitmask of a list of TMDB genre ids; ids we don't know are ignored."""
+    mask = 0
+    for genre_id in genres or ():
+        bit = GENRE_BITS.get(genre_id)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.models import MovieSimilarity
+from movies.services.content_index import build_content_similarities
+from movies.services.similarity import build_cofavorite_similarities
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed similar-movie tables. `cofavorite` finds movies "
+        "favorited by the same users (cosine over user vectors), `content` movies "
+        "with similar overviews and titles (hashed TF-IDF, candidates from an inverted index)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", choices=[MovieSimilarity.COFAVORITE, MovieSimilarity.CONTENT], default=MovieSimilarity.COFAVORITE,
+        )
+        parser.add_argument(
+            "--top-n", type=int, default=settings.SIMILAR_MOVIES_TOP_N, help="Neighbours kept per movie",
+        )
+        parser.add_argument(
+            "--min-common", type=int, default=2, help="cofavorite: users two movies must share to count as similar",
+        )
+        parser.add_argument(
+            "--max-df", type=int, default=200, help="content: terms in more movies than this don't propose candidates",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["top_n"], options["min_common"], options["max_df"]) < 1:
+            raise CommandError("--top-n, --min-common and --max-df must be positive")
+
+        started = time.perf_counter()
+        if options["kind"] == MovieSimilarity.CONTENT:
+            saved = build_content_similarities(options["top_n"], options["max_df"])
+        else:
+            saved = build_cofavorite_similarities(options["top_n"], options["min_common"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {saved} {options['kind']} neighbours in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,34 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.services.feature_store import load_columns, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish a snapshot of the catalog features (genres, language, release year, "
+        "popularity) for the recommender to memory-map. Workers pick it up within "
+        "RECOMMENDER['reload_interval'] seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default=settings.RECOMMENDER.get("feature_store"),
+            help="Snapshot file (default: RECOMMENDER['feature_store'])",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("No --path given and RECOMMENDER['feature_store'] is not set")
+
+        started = time.perf_counter()
+        columns, languages = load_columns()
+        write_snapshot(path, columns, languages)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(columns['ids'])} movies ({os.path.getsize(path) / 1024:.0f} KiB) to {path} "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
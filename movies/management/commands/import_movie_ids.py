@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.services.importer import ExportImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import movies from a TMDB daily id export "
+        "(e.g. movie_ids_MM_DD_YYYY.json.gz), fetching details for each id."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Local path of the gzip'd export file")
+        parser.add_argument("--batch-size", type=int, default=500, help="Movies per upsert")
+        parser.add_argument("--concurrency", type=int, default=8, help="Max TMDB requests in flight")
+        parser.add_argument("--include-adult", action="store_true")
+        parser.add_argument(
+            "--refresh-existing", action="store_true",
+            help="Also re-fetch movies that are already stored",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--concurrency and --batch-size must be positive")
+
+        importer = ExportImporter(
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            skip_existing=not options["refresh_existing"],
+            on_progress=lambda stats: self.stdout.write(f"  {stats}"),
+        )
+
+        try:
+            stats = importer.run(options["path"], include_adult=options["include_adult"])
+        except FileNotFoundError:
+            raise CommandError(f"No such file: {options['path']}")
+
+        if stats.malformed:
+            self.stderr.write(f"Skipped {stats.malformed} malformed lines in {options['path']}")
+        self.stdout.write(self.style.SUCCESS(f"Import finished: {stats}"))
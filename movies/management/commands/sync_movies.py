@@ -0,0 +1,179 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from movies.models import Movie, SyncCheckpoint
+from movies.services.movie_sync import fetch_movie_details, sync_movies_from_tmdb
+from movies.services.tmdb import TMDBClient
+
+# TMDB's /movie/changes accepts at most a 14 day window
+MAX_CHANGES_WINDOW = timedelta(days=14)
+
+# Movies that fail are retried on later runs, up to this many attempts in all
+MAX_FETCH_ATTEMPTS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh stored movies from TMDB. `changes` (default) refreshes movies changed "
+        "since the last run, `full` refreshes every stored movie. Both resume from "
+        "their checkpoint if interrupted and retry the movies an earlier run failed to fetch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["changes", "full"], default="changes")
+        parser.add_argument(
+            "--since", type=date.fromisoformat,
+            help="Start date (YYYY-MM-DD) for changes mode instead of the stored watermark",
+        )
+        parser.add_argument("--concurrency", type=int, default=8, help="Max TMDB requests in flight")
+        parser.add_argument("--batch-size", type=int, default=100, help="Movies per upsert in full mode")
+        parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint cursor")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--concurrency and --batch-size must be positive")
+
+        self.client = TMDBClient(coalesce=False)
+        self.concurrency = options["concurrency"]
+        self.failed = {}  # tmdb_id -> failed attempts so far
+
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(name=f"sync_movies:{options['mode']}")
+        if options["restart"] or options["since"]:
+            checkpoint.cursor = {}
+
+        if options["mode"] == "changes":
+            self.sync_changes(checkpoint, options["since"])
+        else:
+            self.sync_full(checkpoint, options["batch_size"])
+
+    def refresh(self, tmdb_ids):
+        """Fetches one batch of movies concurrently and saves it in a single upsert."""
+        if not tmdb_ids:
+            return 0
+
+        payloads, failed = fetch_movie_details(tmdb_ids, self.client, self.concurrency)
+        sync_movies_from_tmdb(payloads)
+
+        for payload in payloads:
+            self.failed.pop(payload["id"], None)
+        for tmdb_id in failed:
+            self.failed[tmdb_id] = self.failed.get(tmdb_id, 0) + 1
+
+        if failed:
+            self.stderr.write(f"  {len(failed)} movies could not be fetched: {failed[:10]}")
+        given_up = [tmdb_id for tmdb_id, attempts in self.failed.items() if attempts >= MAX_FETCH_ATTEMPTS]
+        if given_up:
+            self.stderr.write(f"  Giving up on {len(given_up)} movies after {MAX_FETCH_ATTEMPTS} attempts: {given_up[:10]}")
+            for tmdb_id in given_up:
+                del self.failed[tmdb_id]
+        return len(payloads)
+
+    def retry_failed(self, checkpoint):
+        """Refreshes the movies an earlier run couldn't fetch (kept in the cursor)."""
+        cursor = checkpoint.cursor
+        self.failed = {int(tmdb_id): attempts for tmdb_id, attempts in cursor.pop("failed", {}).items()}
+        if not self.failed:
+            return 0
+
+        self.stdout.write(f"Retrying {len(self.failed)} movies that failed on an earlier run")
+        refreshed = self.refresh(list(self.failed))
+        self.save_cursor(checkpoint, cursor)
+        return refreshed
+
+    def with_failed(self, cursor):
+        """The cursor plus the movies still to retry, so moving past them doesn't lose them."""
+        if not self.failed:
+            return cursor
+        # JSON object keys are strings
+        return {**cursor, "failed": {str(tmdb_id): attempts for tmdb_id, attempts in self.failed.items()}}
+
+    def save_cursor(self, checkpoint, cursor):
+        checkpoint.cursor = self.with_failed(cursor)
+        checkpoint.save(update_fields=["cursor", "updated_at"])
+
+    # ===============================
+    #           CHANGES MODE
+    # ===============================
+
+    def sync_changes(self, checkpoint, since):
+        total = self.retry_failed(checkpoint)
+        today = timezone.now().date()
+        cursor = checkpoint.cursor
+
+        if "start" in cursor:
+            # Resume the window an earlier run didn't finish
+            start, end, page = date.fromisoformat(cursor["start"]), date.fromisoformat(cursor["end"]), cursor["page"]
+        else:
+            if since:
+                start = since
+            elif checkpoint.watermark:
+                start = timezone.localtime(checkpoint.watermark).date()
+            else:
+                start = today - timedelta(days=1)
+            end, page = min(start + MAX_CHANGES_WINDOW, today), 1
+
+        while True:
+            self.stdout.write(f"Syncing TMDB changes {start} -> {end}")
+            total += self.sync_changes_window(checkpoint, start, end, page)
+
+            # The window is done: move the watermark and forget the cursor, but not the failures
+            checkpoint.watermark = timezone.make_aware(datetime.combine(end, time.min))
+            checkpoint.cursor = self.with_failed({})
+            checkpoint.save(update_fields=["watermark", "cursor", "updated_at"])
+
+            if end >= today:
+                break
+            start, end, page = end, min(end + MAX_CHANGES_WINDOW, today), 1
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {total} movies"))
+
+    def sync_changes_window(self, checkpoint, start, end, page):
+        refreshed = 0
+        while True:
+            data = self.client.get_movie_changes(start.isoformat(), end.isoformat(), page)
+            changed = [item["id"] for item in data.get("results", []) if not item.get("adult")]
+
+            # Only movies we already store are refreshed
+            stored = list(Movie.objects.filter(tmdb_id__in=changed).values_list("tmdb_id", flat=True))
+            refreshed += self.refresh(stored)
+
+            total_pages = data.get("total_pages") or 1
+            self.stdout.write(f"  page {page}/{total_pages}: {len(stored)} of {len(changed)} changed movies stored")
+
+            if page >= total_pages:
+                return refreshed
+
+            page += 1
+            self.save_cursor(checkpoint, {"start": start.isoformat(), "end": end.isoformat(), "page": page})
+
+    # ===============================
+    #            FULL MODE
+    # ===============================
+
+    def sync_full(self, checkpoint, batch_size):
+        refreshed = self.retry_failed(checkpoint)
+        last_tmdb_id = checkpoint.cursor.get("last_tmdb_id", 0)
+        remaining = Movie.objects.filter(tmdb_id__gt=last_tmdb_id).count()
+        self.stdout.write(f"Refreshing {remaining} stored movies")
+
+        done = 0
+        while True:
+            batch = list(
+                Movie.objects.filter(tmdb_id__gt=last_tmdb_id)
+                .order_by("tmdb_id")
+                .values_list("tmdb_id", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+
+            refreshed += self.refresh(batch)
+            last_tmdb_id = batch[-1]
+            self.save_cursor(checkpoint, {"last_tmdb_id": last_tmdb_id})
+
+            done += len(batch)
+            self.stdout.write(f"  {done}/{remaining}")
+
+        self.save_cursor(checkpoint, {})
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} movies"))
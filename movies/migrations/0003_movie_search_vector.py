@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# bulk_create upserts skip Model.save(), so the vector is maintained in the database
+CREATE_TRIGGER = """
+CREATE FUNCTION movies_movie_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.overview, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER movies_movie_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, overview ON movies_movie
+    FOR EACH ROW EXECUTE FUNCTION movies_movie_search_vector_update();
+
+UPDATE movies_movie SET search_vector =
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(overview, '')), 'B');
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS movies_movie_search_vector_trigger ON movies_movie;
+DROP FUNCTION IF EXISTS movies_movie_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="movie_search_vector_gin"
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:15
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_movie_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="movie",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["title"],
+                name="movie_title_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
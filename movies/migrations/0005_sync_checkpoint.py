@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_movie_title_trigram"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("watermark", models.DateTimeField(blank=True, null=True)),
+                ("cursor", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
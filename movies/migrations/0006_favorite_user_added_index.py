@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0005_sync_checkpoint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="favoritemovie",
+            index=models.Index(
+                fields=["user", "-added_at", "-id"], name="favorite_user_added_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0006_favorite_user_added_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="popularity",
+            field=models.FloatField(default=0),
+        ),
+    ]
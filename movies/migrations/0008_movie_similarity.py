@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0007_movie_popularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovieSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("cofavorite", "Co-favorited")], max_length=20
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbours",
+                        to="movies.movie",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["movie", "kind", "-score"],
+                        name="movie_similarity_top_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("movie", "kind", "similar"),
+                        name="movie_similarity_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0008_movie_similarity"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="moviesimilarity",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("cofavorite", "Co-favorited"),
+                    ("content", "Similar content"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-17 08:01
+
+from django.db import migrations, models
+from django.db.models import F
+
+# movies.genres.GENRE_BITS as of this migration (TMDB genre id -> bit), copied
+# so later edits there can't change what this backfill did
+GENRE_BITS = {
+    28: 0, 12: 1, 16: 2, 35: 3, 80: 4, 99: 5, 18: 6, 10751: 7, 14: 8, 36: 9,
+    27: 10, 10402: 11, 9648: 12, 10749: 13, 878: 14, 10770: 15, 53: 16, 10752: 17, 37: 18,
+}
+
+
+def fill_genre_masks(apps, schema_editor):
+    # One UPDATE per genre rather than a save() per movie
+    Movie = apps.get_model("movies", "Movie")
+    for genre_id, bit in GENRE_BITS.items():
+        Movie.objects.filter(genres__contains=[genre_id]).update(genre_mask=F("genre_mask").bitor(1 << bit))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0009_movie_similarity_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="genre_mask",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_genre_masks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["language", "-popularity", "-id"],
+                name="movie_language_popularity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["language", "release_date", "id"],
+                name="movie_language_release_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-popularity", "-id"], name="movie_popularity_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["release_date", "id"], name="movie_release_date_idx"
+            ),
+        ),
+    ]
@@ -1,7 +1,11 @@
 # movies/models.py
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from users.models import User
 
+from .genres import genre_mask
+
 
 class Movie(models.Model):
     """
@@ -15,10 +19,48 @@ class Movie(models.Model):
     release_date = models.DateField(blank=True, null=True)
     genres = models.JSONField(default=list)
     language = models.CharField(max_length=10, default="en")
+    popularity = models.FloatField(default=0)  # TMDB's popularity score, when it was last synced
+    # genres as a bitmask (see movies/genres.py), so genre filters are an integer AND instead of JSON parsing.
+    # Set on save() and by movie_sync; bulk writes elsewhere must set it too.
+    genre_mask = models.IntegerField(default=0, editable=False)
+
+    # Weighted title (A) + overview (B) tsvector, kept current by a DB trigger (see migration 0003)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="movie_search_vector_gin"),
+            GinIndex(fields=["title"], opclasses=["gin_trgm_ops"], name="movie_title_trgm_gin"),
+            # /movies/discover/: filter by language and/or release date, in popularity or release order
+            models.Index(fields=["language", "-popularity", "-id"], name="movie_language_popularity_idx"),
+            models.Index(fields=["language", "release_date", "id"], name="movie_language_release_idx"),
+            models.Index(fields=["-popularity", "-id"], name="movie_popularity_idx"),
+            models.Index(fields=["release_date", "id"], name="movie_release_date_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.genre_mask = genre_mask(self.genres)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "genres" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "genre_mask"}
+        super().save(*args, **kwargs)
+
+
+class SyncCheckpoint(models.Model):
+    """
+    Progress of a resumable TMDB sync job (see the sync_movies command).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(blank=True, null=True)  # changes are synced up to here
+    cursor = models.JSONField(default=dict)  # position inside an unfinished run
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
 
 class FavoriteMovie(models.Model):
     """
@@ -31,6 +73,41 @@ class FavoriteMovie(models.Model):
 
     class Meta:
         unique_together = ('user', 'movie')  # A user can't favorite the same movie twice
+        indexes = [
+            # Keyset pagination of a user's favorites, newest first
+            models.Index(fields=["user", "-added_at", "-id"], name="favorite_user_added_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} → {self.movie.title}"
+
+
+class MovieSimilarity(models.Model):
+    """
+    Precomputed nearest neighbours of a movie, rebuilt offline per kind
+    (see the build_similarities command). Reading them is a single index scan.
+    """
+    COFAVORITE = "cofavorite"  # favorited by the same users
+    CONTENT = "content"  # similar overview and title text
+
+    KIND_CHOICES = [
+        (COFAVORITE, "Co-favorited"),
+        (CONTENT, "Similar content"),
+    ]
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="neighbours")
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["movie", "kind", "similar"], name="movie_similarity_unique"),
+        ]
+        indexes = [
+            # Top neighbours of one movie, best first
+            models.Index(fields=["movie", "kind", "-score"], name="movie_similarity_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} ~ {self.similar_id} ({self.kind} {self.score:.3f})"
@@ -0,0 +1,207 @@
+# movies/profiling.py
+"""
+Opt-in per-request profiling (settings.PROFILING["enabled"]).
+
+Counts and times what a request spends in SQL, the Redis cache, TMDB and
+serialization, and reports it as a Server-Timing header. Slow requests can
+be logged, sampled, with their queries grouped so N+1 patterns stand out.
+Kinds can overlap: queries a serializer triggers lazily count as db and serialize.
+"""
+import functools
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django_redis.client import DefaultClient
+
+logger = logging.getLogger(__name__)
+
+# Kinds reported in Server-Timing, in this order
+KINDS = ("db", "cache", "tmdb", "serialize")
+
+# The profile of the request being served, None when profiling is off.
+# Context variables follow the request through sync_to_async and back.
+_current = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.seconds = dict.fromkeys(KINDS, 0.0)
+        self.queries = []    # (sql, seconds)
+        self.active = set()  # kinds being timed, so nested calls (set_many -> set) count once
+
+    def add(self, kind, seconds):
+        self.counts[kind] += 1
+        self.seconds[kind] += seconds
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        parts = [
+            f'{kind};dur={self.seconds[kind] * 1000:.1f};desc="{self.counts[kind]} calls"'
+            for kind in KINDS if self.counts[kind]
+        ]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self):
+        return ", ".join(
+            f"{kind} {self.counts[kind]}x {self.seconds[kind] * 1000:.1f}ms" for kind in KINDS
+        )
+
+
+def record(kind, seconds):
+    """Adds one call of `kind` to the current request, if it's being profiled."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(kind, seconds)
+
+
+@contextmanager
+def timed(kind):
+    profile = _current.get()
+    if profile is None or kind in profile.active:
+        yield
+        return
+
+    profile.active.add(kind)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.active.discard(kind)
+        profile.add(kind, time.perf_counter() - started)
+
+
+# ===============================
+#              SQL
+# ===============================
+
+def _record_sql(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.add("db", elapsed)
+        profile.queries.append((sql, elapsed))
+
+
+def _install_sql_wrapper(connection, **kwargs):
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+# ===============================
+#             CACHE
+# ===============================
+
+CACHE_METHODS = (
+    "get", "get_many", "set", "set_many", "add", "delete", "delete_many",
+    "incr", "decr", "has_key", "touch", "ttl", "expire",
+)
+
+
+def _timed_cache_method(name):
+    method = getattr(DefaultClient, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with timed("cache"):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+# CLIENT_CLASS for django_redis that reports every cache call to the profile
+ProfiledRedisClient = type(
+    "ProfiledRedisClient",
+    (DefaultClient,),
+    {name: _timed_cache_method(name) for name in CACHE_METHODS},
+)
+
+
+# ===============================
+#           MIDDLEWARE
+# ===============================
+
+class ProfilingMiddleware:
+    """
+    Add near the top of MIDDLEWARE (settings does it when profiling is enabled)
+    so the totals cover the other middleware too. Works for sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = settings.PROFILING
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_sql_wrapper, dispatch_uid="movies.profiling")
+        for connection in connections.all(initialized_only=True):
+            _install_sql_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (JSON encoded) after the view returns
+        profile = _current.get()
+        if profile is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda r: profile.add("serialize", time.perf_counter() - started))
+        return response
+
+    def finish(self, request, response, profile):
+        total = profile.total
+        response["Server-Timing"] = profile.server_timing(total)
+
+        slow_ms = self.options.get("slow_ms")
+        if slow_ms is not None and total * 1000 >= slow_ms and random.random() < self.options.get("sample_rate", 1.0):
+            self.log_slow(request, profile, total)
+        return response
+
+    def log_slow(self, request, profile, total):
+        # Same statement many times over is the N+1 signature
+        repeated = Counter(sql for sql, _ in profile.queries).most_common(self.options.get("log_queries", 10))
+        queries = "\n".join(f"  {count}x {sql}" for sql, count in repeated)
+        logger.warning(
+            "Slow request %s %s: %.0fms (%s)\n%s",
+            request.method, request.path, total * 1000, profile.summary(), queries,
+        )
@@ -0,0 +1,34 @@
+# movies/renderers.py
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer on top of orjson, several times faster on the big
+    list responses (trending, search, favorites). Types orjson doesn't know
+    (lazy strings, Decimal, querysets...) go through DRF's encoder as before.
+    """
+
+    # json.dumps turns int keys into strings too. Dates and times go through DRF's
+    # encoder, which writes milliseconds and "Z" where orjson would write microseconds and "+00:00".
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def __init__(self):
+        self._encoder = self.encoder_class()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        # orjson only indents by 2, any requested indent (browsable API, `; indent=4`) gets that
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=self._encoder.default, option=options)
+
+        # Same as JSONRenderer: keep the output a strict javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
@@ -1,15 +1,154 @@
-from rest_framework import serializers
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
 from .models import Movie, FavoriteMovie
+from .profiling import timed
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Reports `.data` to the request profile when profiling is on (lists via TimedListSerializer)."""
 
-class MovieSerializer(serializers.ModelSerializer):
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class MovieSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Movie
-        fields = "__all__"
+        # Internal: ranking and filtering only, not part of the API
+        exclude = ["search_vector", "popularity", "genre_mask"]
+        list_serializer_class = TimedListSerializer
 
 
-class FavoriteMovieSerializer(serializers.ModelSerializer):
+class FavoriteMovieSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     movie = MovieSerializer(read_only=True)
 
     class Meta:
         model = FavoriteMovie
         fields = ["id", "movie", "added_at"]
+        list_serializer_class = TimedListSerializer
+
+
+# ===============================
+#     READ-ONLY FAST PATH
+# ===============================
+# Same output as the serializers above for list endpoints, without building
+# a DRF field tree per object. Works on model instances and on .values() rows.
+
+# Converters take the current timezone too, looked up once per list - it's
+# an asgiref Local and costs more than the formatting itself
+
+def _date(value, tz):
+    if not value or isinstance(value, str):
+        return value
+    if api_settings.DATE_FORMAT.lower() == ISO_8601:
+        return value.isoformat()
+    return value.strftime(api_settings.DATE_FORMAT)
+
+
+def _datetime(value, tz):
+    if not value or isinstance(value, str):
+        return value
+    value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    if api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return value.strftime(api_settings.DATETIME_FORMAT)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def _compile(model, names):
+    """(name, converter) per field; dates need formatting, everything else passes through."""
+    compiled = []
+    for name in names:
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateTimeField):
+            compiled.append((name, _datetime))
+        elif isinstance(field, models.DateField):
+            compiled.append((name, _date))
+        else:
+            compiled.append((name, None))
+    return tuple(compiled)
+
+
+MOVIE_FIELDS = tuple(
+    field.name for field in Movie._meta.concrete_fields if field.name not in MovieSerializer.Meta.exclude
+)
+_MOVIE = _compile(Movie, MOVIE_FIELDS)
+
+# .values() columns serialize_favorite needs from a FavoriteMovie queryset
+FAVORITE_VALUES = ("id", "added_at", *(f"movie__{name}" for name in MOVIE_FIELDS))
+
+
+def movie_projection(fields=None):
+    """Converters for a subset of the movie fields (all of them when fields is None)."""
+    if fields is None:
+        return _MOVIE
+    unknown = sorted(set(fields) - set(MOVIE_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(item for item in _MOVIE if item[0] in fields)
+
+
+def favorite_values(projection=_MOVIE):
+    """.values() columns for serialize_favorites(..., projection)."""
+    return ("id", "added_at", *(f"movie__{name}" for name, _ in projection))
+
+
+def _movie(get, tz, prefix="", projection=_MOVIE):
+    data = {}
+    for name, convert in projection:
+        value = get(prefix + name)
+        data[name] = convert(value, tz) if convert else value
+    return data
+
+
+def _favorite(favorite, tz, projection=_MOVIE):
+    if isinstance(favorite, dict):
+        return {
+            "id": favorite["id"],
+            "movie": _movie(favorite.__getitem__, tz, "movie__", projection),
+            "added_at": _datetime(favorite["added_at"], tz),
+        }
+    return {
+        "id": favorite.id,
+        "movie": _movie(favorite.movie.__getattribute__, tz, projection=projection),
+        "added_at": _datetime(favorite.added_at, tz),
+    }
+
+
+def _getter(row):
+    return row.__getitem__ if isinstance(row, dict) else row.__getattribute__
+
+
+def serialize_movie(movie):
+    """MovieSerializer(movie).data for a Movie or a Movie .values() row."""
+    return _movie(_getter(movie), timezone.get_current_timezone())
+
+
+def serialize_movies(movies):
+    with timed("serialize"):
+        tz = timezone.get_current_timezone()
+        return [_movie(_getter(movie), tz) for movie in movies]
+
+
+def serialize_favorite(favorite):
+    """FavoriteMovieSerializer(favorite).data for a FavoriteMovie or a FAVORITE_VALUES row."""
+    return _favorite(favorite, timezone.get_current_timezone())
+
+
+def serialize_favorites(favorites, projection=_MOVIE):
+    """Favorites with only the movie fields in projection (see movie_projection)."""
+    with timed("serialize"):
+        tz = timezone.get_current_timezone()
+        return [_favorite(favorite, tz, projection) for favorite in favorites]
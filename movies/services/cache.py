@@ -0,0 +1,133 @@
+# movies/services/cache.py
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("hit", "stale", "miss")
+
+
+class StaleWhileRevalidateCache:
+    """
+    Caches values with a soft and a hard TTL.
+    Before the soft TTL a value is a plain hit. Between the soft and the hard
+    TTL it is served immediately while one background refresh reloads it.
+    After the hard TTL it's gone and the caller loads it synchronously.
+
+    Entries are {"value", "soft_expires"} envelopes stored under
+    ENTRY_PREFIX + key. Bump the version when the envelope changes, so values
+    written by older code under the same key are never read as envelopes.
+    """
+
+    ENTRY_PREFIX = "swr:v1:"
+    REFRESH_LOCK_TIMEOUT = 60
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(lambda: dict.fromkeys(OUTCOMES, 0))
+        self._background_tasks = set()
+
+    def get_or_load(self, endpoint, key, loader):
+        soft_ttl, hard_ttl = self.ttls(endpoint)
+        entry = cache.get(self.ENTRY_PREFIX + key)
+
+        if entry is None:
+            self._record(endpoint, "miss")
+            return self._load(key, loader, soft_ttl, hard_ttl)
+
+        if entry["soft_expires"] > time.time():
+            self._record(endpoint, "hit")
+        else:
+            self._record(endpoint, "stale")
+            self._refresh_in_background(key, loader, soft_ttl, hard_ttl)
+
+        return entry["value"]
+
+    async def aget_or_load(self, endpoint, key, loader):
+        """Same as get_or_load for async views; `loader` is a coroutine function."""
+        soft_ttl, hard_ttl = self.ttls(endpoint)
+        entry = await cache.aget(self.ENTRY_PREFIX + key)
+
+        if entry is None:
+            self._record(endpoint, "miss")
+            return await self._aload(key, loader, soft_ttl, hard_ttl)
+
+        if entry["soft_expires"] > time.time():
+            self._record(endpoint, "hit")
+        else:
+            self._record(endpoint, "stale")
+            await self._arefresh_in_background(key, loader, soft_ttl, hard_ttl)
+
+        return entry["value"]
+
+    def ttls(self, endpoint):
+        ttl = settings.TMDB_CACHE_TTLS[endpoint]
+        return ttl["soft"], ttl["hard"]
+
+    def stats(self):
+        """Hit / stale / miss counts per endpoint for this process."""
+        with self._stats_lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+    def _record(self, endpoint, outcome):
+        with self._stats_lock:
+            self._stats[endpoint][outcome] += 1
+
+    def _load(self, key, loader, soft_ttl, hard_ttl):
+        value = loader()
+        cache.set(self.ENTRY_PREFIX + key, {"value": value, "soft_expires": time.time() + soft_ttl}, hard_ttl)
+        return value
+
+    async def _aload(self, key, loader, soft_ttl, hard_ttl):
+        value = await loader()
+        await cache.aset(self.ENTRY_PREFIX + key, {"value": value, "soft_expires": time.time() + soft_ttl}, hard_ttl)
+        return value
+
+    async def _arefresh_in_background(self, key, loader, soft_ttl, hard_ttl):
+        if not await cache.aadd(f"swr:refreshing:{key}", 1, self.REFRESH_LOCK_TIMEOUT):
+            return
+
+        task = asyncio.create_task(self._arefresh(key, loader, soft_ttl, hard_ttl))
+        # keep a reference so the task isn't garbage collected mid-flight
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _arefresh(self, key, loader, soft_ttl, hard_ttl):
+        try:
+            await self._aload(key, loader, soft_ttl, hard_ttl)
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            await cache.adelete(f"swr:refreshing:{key}")
+
+    def _refresh_in_background(self, key, loader, soft_ttl, hard_ttl):
+        # Only one worker refreshes a given key at a time
+        if not cache.add(f"swr:refreshing:{key}", 1, self.REFRESH_LOCK_TIMEOUT):
+            return
+
+        thread = threading.Thread(
+            target=self._refresh,
+            args=(key, loader, soft_ttl, hard_ttl),
+            daemon=True,
+        )
+        thread.start()
+
+    def _refresh(self, key, loader, soft_ttl, hard_ttl):
+        try:
+            self._load(key, loader, soft_ttl, hard_ttl)
+        except Exception:
+            # Keep serving the stale value until the hard TTL runs out
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            cache.delete(f"swr:refreshing:{key}")
+            connections.close_all()
+
+
+swr_cache = StaleWhileRevalidateCache()
@@ -0,0 +1,72 @@
+# movies/services/circuit_breaker.py
+from django.conf import settings
+from django.core.cache import cache
+
+from .exceptions import TMDBCircuitOpenError
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around TMDB, shared by all workers through the cache.
+
+    closed:    calls go through; `failure_threshold` consecutive failures open it.
+    open:      calls fail fast with TMDBCircuitOpenError for `reset_timeout` seconds.
+    half-open: one probe call at a time goes through; success closes the
+               breaker, failure opens it again.
+    If the cache is unreachable the breaker stays out of the way.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, probe_timeout, key="tmdb:circuit"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.failures_key = f"{key}:failures"
+        self.open_key = f"{key}:open"
+        self.probe_key = f"{key}:probe"
+
+    def before_call(self):
+        try:
+            state = cache.get_many([self.open_key, self.failures_key])
+            if self.open_key in state:
+                raise TMDBCircuitOpenError("TMDB is unavailable, try again shortly", retry_after=self.reset_timeout)
+            if state.get(self.failures_key, 0) >= self.failure_threshold:
+                # half-open: a single probe decides whether TMDB is back
+                if not cache.add(self.probe_key, 1, self.probe_timeout):
+                    raise TMDBCircuitOpenError("TMDB is recovering, try again shortly", retry_after=self.probe_timeout)
+        except TMDBCircuitOpenError:
+            raise
+        except Exception:
+            pass
+
+    def record_success(self):
+        try:
+            cache.delete_many([self.failures_key, self.probe_key])
+        except Exception:
+            pass
+
+    def record_failure(self):
+        # The count expires once TMDB has gone reset_timeout * 10 without a
+        # failure; every failure pushes that back, so slow failures add up too
+        ttl = self.reset_timeout * 10
+        try:
+            cache.add(self.failures_key, 0, ttl)
+            failures = cache.incr(self.failures_key)
+            cache.touch(self.failures_key, ttl)
+            if failures >= self.failure_threshold:
+                cache.set(self.open_key, 1, self.reset_timeout)
+                cache.delete(self.probe_key)
+        except Exception:
+            pass
+
+    def record(self, success):
+        if success:
+            self.record_success()
+        else:
+            self.record_failure()
+
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.TMDB_CIRCUIT_BREAKER["failure_threshold"],
+    reset_timeout=settings.TMDB_CIRCUIT_BREAKER["reset_timeout"],
+    probe_timeout=settings.TMDB_CONNECT_TIMEOUT + settings.TMDB_READ_TIMEOUT,
+)
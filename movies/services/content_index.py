@@ -0,0 +1,160 @@
+# movies/services/content_index.py
+"""
+Content-based similar movies from overview and title text.
+
+Movies become hashed TF-IDF vectors of word unigrams and bigrams, so there's
+no vocabulary to store or keep in sync. Candidate neighbours come from an
+inverted index over the moderately rare terms (names, places, themes) and are
+rescored exactly; see nearest_neighbours. The top neighbours are saved as
+"content" MovieSimilarity rows (see services/similarity.py).
+
+Random-projection LSH was tried first: at the cosines related overviews have
+(0.2-0.5) it needs so few bits per table that buckets hold a large share of
+the catalog, and it still missed most neighbours (benchmarks/content_index.py).
+"""
+import re
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from movies.models import Movie, MovieSimilarity
+
+from .similarity import save_neighbours
+
+WORD = re.compile(r"[^\W\d_]{2,}")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has he her his in into is it its of on or she that the their them they "
+    "this to was were when which while who will with after about all also an any been before can each had have "
+    "him how if more most new no not only other out over so some such than then there these through up what where "
+    "one two".split()
+)
+
+
+def tokens(text):
+    words = [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def hashed_counts(texts, n_features):
+    """Sparse term counts, one row per text; terms are crc32-hashed into n_features columns."""
+    indptr, indices = [0], []
+    for text in texts:
+        indices.extend(zlib.crc32(term.encode()) % n_features for term in tokens(text))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    counts = sparse.csr_matrix(
+        (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(texts), n_features),
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def document_frequency(counts):
+    """Number of rows each column appears in (counts has no duplicate entries)."""
+    return np.bincount(counts.indices, minlength=counts.shape[1])
+
+
+def tfidf(counts):
+    """Sublinear TF x smoothed IDF, rows scaled to unit length."""
+    n = counts.shape[0]
+    idf = np.log((1 + n) / (1 + document_frequency(counts))).astype(np.float32) + 1
+
+    weights = counts.copy()
+    weights.data = (1 + np.log(weights.data)) * idf[weights.indices]
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(weights).tocsr()
+
+
+def movie_texts(movies, title_weight=2):
+    """Title (repeated title_weight times) and overview of (id, title, overview) rows."""
+    return [" ".join([title] * title_weight + [overview]) for _, title, overview in movies]
+
+
+def split_terms(vectors, document_frequency, max_df):
+    """
+    (informative, common): vectors split by term. Informative terms are shared
+    by 2..max_df movies (names, places, themes); common ones by more. Terms
+    only one movie has can't make it similar to anything and are dropped.
+    A pair's cosine is the sum of its dot products in both parts.
+    """
+    df = document_frequency[vectors.indices]
+    informative, common = vectors.copy(), vectors.copy()
+    informative.data[(df < 2) | (df > max_df)] = 0
+    common.data[df <= max_df] = 0
+    informative.eliminate_zeros()
+    common.eliminate_zeros()
+    return informative, common
+
+
+def pair_dots(vectors, left, right, chunk_size=200_000):
+    """Dot product of each (left, right) row pair."""
+    dots = np.empty(len(left), dtype=np.float32)
+    for start in range(0, len(left), chunk_size):
+        end = start + chunk_size
+        dots[start:end] = np.asarray(vectors[left[start:end]].multiply(vectors[right[start:end]]).sum(axis=1)).ravel()
+    return dots
+
+
+def nearest_neighbours(vectors, document_frequency, top_n=20, max_df=200, candidates=3, min_score=0.05, chunk=1000):
+    """
+    Approximate top_n cosine neighbours of every row. Yields (row, neighbour rows, scores), best first.
+
+    An inverted index over the informative terms (see split_terms) scores
+    every pair sharing one, chunk rows at a time; the best candidates * top_n of
+    each row then get the common terms' share added for their exact cosine.
+    Cost grows with the number of pairs sharing a term of at most max_df
+    movies, not with rows squared. Pairs sharing only common words are never
+    considered - their similarity is mostly noise anyway.
+    """
+    informative, common = split_terms(vectors, document_frequency, max_df)
+    transposed = informative.T.tocsr()
+    keep = candidates * top_n
+
+    for start in range(0, vectors.shape[0], chunk):
+        partial = (informative[start:start + chunk] @ transposed).tocsr()
+        left, right, scores = [], [], []
+        for offset in range(partial.shape[0]):
+            begin, end = partial.indptr[offset], partial.indptr[offset + 1]
+            columns, dots = partial.indices[begin:end], partial.data[begin:end]
+            others = columns != start + offset
+            columns, dots = columns[others], dots[others]
+            if len(columns) > keep:
+                best = np.argpartition(-dots, keep - 1)[:keep]
+                columns, dots = columns[best], dots[best]
+            left.append(np.full(len(columns), start + offset))
+            right.append(columns)
+            scores.append(dots)
+
+        left, right, scores = np.concatenate(left), np.concatenate(right), np.concatenate(scores)
+        scores += pair_dots(common, left, right)
+        wanted = scores >= min_score
+        left, right, scores = left[wanted], right[wanted], scores[wanted]
+        if not len(left):
+            continue
+        order = np.lexsort((-scores, left))
+        left, right, scores = left[order], right[order], scores[order]
+
+        starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+        for first, last in zip(starts, np.r_[starts[1:], len(left)]):
+            last = min(last, first + top_n)
+            yield left[first], right[first:last], scores[first:last]
+
+
+def build_content_similarities(top_n=20, max_df=200, n_features=2 ** 18):
+    """Rebuilds the "content" neighbours of every movie with text. Returns the number of rows saved."""
+    movies = list(Movie.objects.exclude(overview="", title="").order_by("id").values_list("id", "title", "overview"))
+    if not movies:
+        return save_neighbours(MovieSimilarity.CONTENT, [])
+
+    ids = np.array([movie[0] for movie in movies], dtype=np.int64)
+    counts = hashed_counts(movie_texts(movies), n_features)
+    vectors = tfidf(counts)
+    neighbours = (
+        (int(ids[row]), int(ids[column]), float(score))
+        for row, columns, scores in nearest_neighbours(vectors, document_frequency(counts), top_n, max_df)
+        for column, score in zip(columns, scores)
+    )
+    return save_neighbours(MovieSimilarity.CONTENT, neighbours)
@@ -0,0 +1,28 @@
+# movies/services/exceptions.py
+
+
+class TMDBError(Exception):
+    """A TMDB call failed."""
+
+
+class TMDBNotFoundError(TMDBError):
+    """TMDB has no such resource (404). Remembered for a short while."""
+
+
+class TMDBUnavailableError(TMDBError):
+    """
+    TMDB wasn't called at all because we're shedding load.
+    `retry_after` is the number of seconds until a call is likely to succeed.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TMDBRateLimitError(TMDBUnavailableError):
+    """TMDB's rate limit couldn't be waited out within our wait budget."""
+
+
+class TMDBCircuitOpenError(TMDBUnavailableError):
+    """Too many recent TMDB failures: calls fail fast until the breaker half-opens."""
@@ -0,0 +1,27 @@
+# movies/services/fallback.py
+"""
+Local stand-ins for TMDB-backed lists, served while TMDB is unavailable.
+"""
+from django.db.models import F
+
+from movies.models import Movie
+
+
+def recent_movies(limit=20):
+    """Most recently stored movies (stand-in for trending)."""
+    return list(Movie.objects.defer("search_vector").order_by("-id")[:limit])
+
+
+def movies_sharing_genres(movie_id, limit=20):
+    """Stored movies sharing a genre with the given TMDB movie (stand-in for recommendations)."""
+    movie = Movie.objects.filter(tmdb_id=movie_id).only("genre_mask").first()
+    if movie is None or not movie.genre_mask:
+        return []
+
+    return list(
+        Movie.objects.alias(shared=F("genre_mask").bitand(movie.genre_mask))
+        .filter(shared__gt=0)
+        .exclude(tmdb_id=movie_id)
+        .defer("search_vector")
+        .order_by("-id")[:limit]
+    )
@@ -0,0 +1,192 @@
+# movies/services/feature_store.py
+"""
+Catalog features in a columnar file that workers memory-map.
+
+Every worker maps the same file read-only, so the columns live once in the
+page cache instead of once per process, and opening a snapshot costs no
+queries and no parsing. The export_features command publishes a new
+snapshot by writing a temporary file and renaming it over the old one;
+readers notice and switch over, while requests still holding the old
+snapshot keep reading its (unlinked) pages.
+
+Layout, little-endian:
+
+    header    magic "MVFS", format version, row count, created at, metadata length
+    metadata  JSON: column offsets and dtypes, languages by code
+    columns   one array per column, each 64-byte aligned
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from movies.genres import genre_mask
+
+MAGIC = b"MVFS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxQdI")
+ALIGNMENT = 64
+
+# name -> dtype, in file order
+COLUMNS = {
+    "ids": "<i8",
+    "genre_masks": "<u4",  # bit per genre, see movies.genres
+    "language_codes": "<u2",  # index into the snapshot's languages
+    "release_years": "<u2",  # 0 when unknown
+    "popularity": "<f4",  # log-scaled TMDB popularity, 0..1
+}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """One published set of columns. Attributes are read-only arrays."""
+
+    def __init__(self, columns, languages, created_at=None, buffer=None):
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        self.languages = {language: code for code, language in enumerate(languages)}
+        self.created_at = created_at
+        self._buffer = buffer  # keeps the mapping alive as long as the arrays
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def build_columns(rows):
+    """
+    Columns from (id, genres, language, release_date, popularity) rows sorted by id.
+    Returns (columns, languages).
+    """
+    rows = list(rows)
+    n = len(rows)
+    languages = {}
+    columns = {name: np.zeros(n, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    for i, (movie_id, genres, language, release_date, popularity) in enumerate(rows):
+        columns["ids"][i] = movie_id
+        columns["genre_masks"][i] = genre_mask(genres)
+        columns["language_codes"][i] = languages.setdefault(language, len(languages))
+        columns["release_years"][i] = release_date.year if release_date else 0
+        columns["popularity"][i] = popularity or 0.0
+
+    # TMDB popularity is long-tailed
+    popularity = np.log1p(columns["popularity"])
+    if n and popularity.max() > 0:
+        popularity /= popularity.max()
+    columns["popularity"] = popularity.astype(COLUMNS["popularity"])
+    return columns, list(languages)
+
+
+def load_columns():
+    """Columns for every stored movie, read through the ORM."""
+    from movies.models import Movie
+
+    rows = Movie.objects.order_by("id").values_list("id", "genres", "language", "release_date", "popularity")
+    return build_columns(rows.iterator(chunk_size=10_000))
+
+
+def write_snapshot(path, columns, languages):
+    """Writes a snapshot next to path and atomically renames it into place."""
+    rows = len(columns["ids"])
+    layout, offset = {}, 0
+    for name, dtype in COLUMNS.items():
+        layout[name] = {"dtype": dtype, "offset": offset}
+        offset += _aligned(rows * np.dtype(dtype).itemsize)
+
+    metadata = json.dumps({"columns": layout, "languages": languages}).encode()
+    data_start = _aligned(HEADER.size + len(metadata))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".features-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, rows, time.time(), len(metadata)))
+            out.write(metadata)
+            for name, dtype in COLUMNS.items():
+                out.seek(data_start + layout[name]["offset"])
+                out.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            out.truncate(data_start + offset)
+            out.flush()
+            os.fsync(out.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def open_snapshot(path):
+    """Maps a snapshot file. The arrays share the mapping's pages; nothing is copied."""
+    with open(path, "rb") as source:
+        size = os.fstat(source.fileno()).st_size
+        if size < HEADER.size:
+            raise SnapshotError(f"{path} is not a feature snapshot")
+        buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, rows, created_at, metadata_length = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a feature snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"{path} has format version {version}, this code reads {FORMAT_VERSION}")
+
+    if HEADER.size + metadata_length > size:
+        raise SnapshotError(f"{path} is truncated")
+    try:
+        metadata = json.loads(buffer[HEADER.size:HEADER.size + metadata_length])
+        layout, languages = metadata["columns"], list(metadata["languages"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotError(f"{path} has unreadable metadata: {e}") from e
+
+    data_start = _aligned(HEADER.size + metadata_length)
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        column = layout.get(name) if isinstance(layout, dict) else None
+        if not isinstance(column, dict) or column.get("dtype") != dtype or not isinstance(column.get("offset"), int):
+            raise SnapshotError(f"{path} has no {name} column of type {dtype}")
+        start = data_start + column["offset"]
+        if column["offset"] < 0 or start + rows * np.dtype(dtype).itemsize > size:
+            raise SnapshotError(f"{path} is truncated")
+        columns[name] = np.frombuffer(buffer, dtype=dtype, count=rows, offset=start)
+
+    return Snapshot(columns, languages, created_at, buffer)
+
+
+class SnapshotReader:
+    """
+    The latest snapshot at path. Checks whether a new one was published at
+    most every check_interval seconds (one stat call) and reopens it if so.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._identity = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._checked_at >= self.check_interval:
+                stat = os.stat(self.path)
+                identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if identity != self._identity:
+                    self._snapshot = open_snapshot(self.path)
+                    self._identity = identity
+                self._checked_at = time.monotonic()
+        return self._snapshot
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,115 @@
+# movies/services/importer.py
+import gzip
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connections
+
+from movies.models import Movie
+from .movie_sync import fetch_movie_details, sync_movies_from_tmdb
+from .tmdb import TMDBClient
+
+
+def read_export_ids(path, include_adult=False, on_malformed=None):
+    """
+    Yields movie ids from a TMDB daily id export (gzip'd, one JSON object per line).
+    The file is streamed, never loaded whole. Lines that aren't a JSON object with
+    an id are skipped, and their line number passed to `on_malformed`.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                tmdb_id = item["id"]
+            except (ValueError, TypeError, KeyError):
+                if on_malformed:
+                    on_malformed(number)
+                continue
+            if item.get("adult") and not include_adult:
+                continue
+            yield tmdb_id
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0      # ids read from the export
+        self.skipped = 0   # already stored
+        self.saved = 0
+        self.failed = 0
+        self.malformed = 0  # export lines that couldn't be read
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.saved / elapsed if elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"read {self.read}, saved {self.saved}, skipped {self.skipped}, "
+            f"failed {self.failed}, malformed {self.malformed} ({self.rows_per_second:.1f} rows/s)"
+        )
+
+
+class ExportImporter:
+    """
+    Imports a TMDB id export in fixed-size batches.
+    Reading ids, fetching details (`concurrency` requests in flight) and
+    upserting are pipelined: batch N is written while batch N+1 is fetched.
+    """
+
+    def __init__(self, client=None, batch_size=500, concurrency=8, skip_existing=True, on_progress=None):
+        self.client = client or TMDBClient(coalesce=False)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.skip_existing = skip_existing
+        self.on_progress = on_progress
+
+    def run(self, path, include_adult=False):
+        stats = ImportStats()
+
+        def malformed(number):
+            stats.malformed += 1
+
+        # A single writer thread keeps upserts ordered and off the fetch path
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            try:
+                pending = None
+
+                for ids in batched(read_export_ids(path, include_adult, malformed), self.batch_size):
+                    stats.read += len(ids)
+                    if self.skip_existing:
+                        stored = set(Movie.objects.filter(tmdb_id__in=ids).values_list("tmdb_id", flat=True))
+                        stats.skipped += len(stored)
+                        ids = [tmdb_id for tmdb_id in ids if tmdb_id not in stored]
+
+                    payloads, failed = fetch_movie_details(ids, self.client, self.concurrency)
+                    stats.failed += len(failed)
+
+                    if pending is not None:
+                        self._finish(pending, stats)
+                    pending = writer.submit(sync_movies_from_tmdb, payloads)
+
+                if pending is not None:
+                    self._finish(pending, stats)
+            finally:
+                # Also when a batch fails, or the writer's connection outlives its thread
+                writer.submit(connections.close_all).result()
+
+        return stats
+
+    def _finish(self, pending, stats):
+        stats.saved += len(pending.result())
+        if self.on_progress:
+            self.on_progress(stats)
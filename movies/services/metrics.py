@@ -0,0 +1,145 @@
+# movies/services/metrics.py
+import re
+import threading
+from bisect import bisect_left
+
+from .cache import swr_cache
+
+# Seconds. TMDB usually answers in 50-300ms, the tail is what we care about.
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes. Details payloads are a few KB, list pages tens of KB.
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_template(endpoint):
+    """/movie/550/recommendations -> /movie/{id}/recommendations, so labels stay bounded."""
+    return _ID_SEGMENT.sub("/{id}", endpoint)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in values:
+            lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. An observation is one bisect and a few additions
+    under a lock, cheap enough for every TMDB call.
+    """
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values):
+                cumulative += count
+                le = _label_text(self.labels, label_values, [("le", bound)])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _label_text(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {values[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+tmdb_request_duration = Histogram(
+    "tmdb_request_duration_seconds", "Latency of TMDB HTTP calls.", ("endpoint", "status")
+)
+tmdb_response_size = Histogram(
+    "tmdb_response_size_bytes", "Size of TMDB response bodies.", ("endpoint",), SIZE_BUCKETS
+)
+tmdb_requests = Counter(
+    "tmdb_requests_total", "TMDB HTTP calls by status code ('error' for network failures).",
+    ("endpoint", "status"),
+)
+tmdb_retries = Counter("tmdb_retries_total", "TMDB calls retried.", ("endpoint", "reason"))
+tmdb_short_circuits = Counter(
+    "tmdb_short_circuits_total", "TMDB calls answered without reaching TMDB.", ("endpoint", "reason")
+)
+
+REGISTRY = [tmdb_request_duration, tmdb_response_size, tmdb_requests, tmdb_retries, tmdb_short_circuits]
+
+
+def record_response(endpoint, status, seconds, size=None):
+    endpoint = endpoint_template(endpoint)
+    status = str(status)
+    tmdb_request_duration.observe(seconds, endpoint, status)
+    tmdb_requests.inc(endpoint, status)
+    if size is not None:
+        tmdb_response_size.observe(size, endpoint)
+
+
+def record_retry(endpoint, reason):
+    tmdb_retries.inc(endpoint_template(endpoint), reason)
+
+
+def record_short_circuit(endpoint, reason):
+    tmdb_short_circuits.inc(endpoint_template(endpoint), reason)
+
+
+def _cache_outcome_lines():
+    name = "movie_cache_requests_total"
+    lines = [f"# HELP {name} Movie cache lookups by outcome.", f"# TYPE {name} counter"]
+    for endpoint, counts in sorted(swr_cache.stats().items()):
+        for outcome, count in counts.items():
+            lines.append(f"{name}{_label_text(('endpoint', 'outcome'), (endpoint, outcome))} {count}")
+    return lines
+
+
+def render():
+    """
+    Every metric in the Prometheus text format.
+    Values are per process, like cache_stats - scrape each worker.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_cache_outcome_lines())
+    return "\n".join(lines) + "\n"
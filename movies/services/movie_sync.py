@@ -1,25 +1,105 @@
 # movies/services/movie_sync.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from .tmdb import TMDBClient
+from movies.genres import genre_mask
 from movies.models import Movie
 
+# Fields refreshed when a TMDB movie we already store shows up again
+UPSERT_FIELDS = ["title", "overview", "poster_url", "release_date", "genres", "genre_mask", "language", "popularity"]
+
+
+def build_poster_url(poster_path):
+    if poster_path:
+        return f"https://image.tmdb.org/t/p/w500{poster_path}"
+    return None
+
+
+def normalize_tmdb_movie(tmdb_movie):
+    """
+    Maps a TMDB movie payload (list item or full details) to Movie fields.
+    List endpoints send `genre_ids`, the details endpoint sends `genres` objects.
+    """
+    if "genre_ids" in tmdb_movie:
+        genres = tmdb_movie.get("genre_ids") or []
+    else:
+        genres = [genre["id"] for genre in tmdb_movie.get("genres") or []]
+
+    return {
+        "tmdb_id": tmdb_movie["id"],
+        "title": tmdb_movie.get("title") or "",
+        "overview": tmdb_movie.get("overview") or "",
+        "poster_url": build_poster_url(tmdb_movie.get("poster_path")),
+        "release_date": tmdb_movie.get("release_date") or None,
+        "genres": genres,
+        "genre_mask": genre_mask(genres),
+        "language": tmdb_movie.get("original_language") or "en",
+        "popularity": tmdb_movie.get("popularity") or 0.0,
+    }
+
+
+def _unsaved_movies(tmdb_movies):
+    # ON CONFLICT can't touch the same row twice in one statement
+    rows = {}
+    for item in tmdb_movies:
+        fields = normalize_tmdb_movie(item)
+        rows.setdefault(fields["tmdb_id"], Movie(**fields))
+    return list(rows.values())
+
+
+def sync_movies_from_tmdb(tmdb_movies):
+    """
+    Upserts a whole page of TMDB results with a single INSERT ... ON CONFLICT.
+    Returns the saved Movie rows in the same order as the TMDB results.
+    """
+    movies = _unsaved_movies(tmdb_movies)
+    if not movies:
+        return []
+
+    return Movie.objects.bulk_create(
+        movies,
+        update_conflicts=True,
+        unique_fields=["tmdb_id"],
+        update_fields=UPSERT_FIELDS,
+    )
+
+
+async def async_sync_movies_from_tmdb(tmdb_movies):
+    """Async version of sync_movies_from_tmdb for async views."""
+    movies = _unsaved_movies(tmdb_movies)
+    if not movies:
+        return []
+
+    return await Movie.objects.abulk_create(
+        movies,
+        update_conflicts=True,
+        unique_fields=["tmdb_id"],
+        update_fields=UPSERT_FIELDS,
+    )
+
 
 def sync_movie_from_tmdb(tmdb_movie):
     """
     Saves a TMDB movie response into the local DB.
     If already exists, update it.
     """
-    movie, created = Movie.objects.update_or_create(
-        tmdb_id=tmdb_movie["id"],
-        defaults={
-            "title": tmdb_movie.get("title"),
-            "overview": tmdb_movie.get("overview"),
-            "poster_url": f'https://image.tmdb.org/t/p/w500{tmdb_movie.get("poster_path")}'
-            if tmdb_movie.get("poster_path")
-            else None,
-            "release_date": tmdb_movie.get("release_date") or None,
-            "genres": tmdb_movie.get("genre_ids", []),
-            "language": tmdb_movie.get("original_language", "en"),
-        },
-    )
+    return sync_movies_from_tmdb([tmdb_movie])[0]
+
+
+def fetch_movie_details(tmdb_ids, client=None, max_workers=8):
+    """
+    Fetches TMDB details for many movies with at most `max_workers` requests in flight.
+    Returns (payloads, failed_ids); ids TMDB fails on are skipped, not raised.
+    """
+    client = client or TMDBClient()
+    payloads, failed = [], []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(client.get_movie_details, tmdb_id): tmdb_id for tmdb_id in tmdb_ids}
+        for future in as_completed(futures):
+            try:
+                payloads.append(future.result())
+            except Exception:
+                failed.append(futures[future])
 
-    return movie
+    return payloads, failed
@@ -0,0 +1,104 @@
+# movies/services/pagination.py
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(added_at, pk):
+    raw = f"{added_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(added_at, id) of the last row of the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        added_at, pk = raw.rsplit("|", 1)
+        added_at, pk = parse_datetime(added_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    if added_at is None:
+        raise InvalidCursor("Invalid cursor")
+    return added_at, pk
+
+
+def keyset_page(queryset, cursor, size):
+    """
+    One page of favorites, newest first, plus the cursor of the next page (None on the last).
+
+    Seeks past the cursor on (added_at, id) instead of using OFFSET, so page
+    100 costs the same as page 1 and rows added meanwhile don't shift pages.
+    Needs the (user, -added_at, -id) index on FavoriteMovie. queryset may be a
+    .values() queryset as long as it selects added_at and id.
+    """
+    queryset = queryset.order_by("-added_at", "-id")
+    if cursor:
+        added_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(added_at__lt=added_at) | Q(added_at=added_at, id__lt=pk))
+
+    rows = list(queryset[:size + 1])  # one extra row tells us whether there's a next page
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor(last["added_at"], last["id"])
+    return rows, encode_cursor(last.added_at, last.id)
+
+
+def encode_seek_cursor(ordering, value, pk):
+    raw = json.dumps([ordering, value, pk], cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_seek_cursor(cursor, ordering, field):
+    """(value, id) of the last row of the previous page; the cursor must come from the same ordering."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_ordering, value, pk = json.loads(raw)
+        value, pk = field.to_python(value), int(pk)
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        raise InvalidCursor("Invalid cursor")
+    if cursor_ordering != ordering or value is None:
+        raise InvalidCursor("Invalid cursor")
+    return value, pk
+
+
+def seek_page(queryset, ordering, cursor, size):
+    """
+    keyset_page for any single non-null column, e.g. ordering="-popularity":
+    rows sorted by it, id breaking ties in the same direction.
+
+    The seek repeats the column bound on its own (popularity <= last AND
+    (popularity < last OR id < last id)) so an index on (column, id) can
+    start the scan at the cursor instead of filtering its way there.
+    """
+    name = ordering.lstrip("-")
+    op = "lt" if ordering.startswith("-") else "gt"
+    queryset = queryset.order_by(ordering, "-id" if op == "lt" else "id")
+    if cursor:
+        value, pk = decode_seek_cursor(cursor, ordering, queryset.model._meta.get_field(name))
+        queryset = queryset.filter(
+            Q(**{f"{name}__{op}e": value}),
+            Q(**{f"{name}__{op}": value}) | Q(**{name: value, f"id__{op}": pk}),
+        )
+
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_seek_cursor(ordering, last[name], last["id"])
+    return rows, encode_seek_cursor(ordering, getattr(last, name), last.id)
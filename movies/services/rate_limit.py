@@ -0,0 +1,121 @@
+# movies/services/rate_limit.py
+import asyncio
+import email.utils
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .exceptions import TMDBRateLimitError
+
+# Returns how many ms the caller has to wait before a token is free (0 = token taken).
+# KEYS: bucket hash, pause key (set from Retry-After), penalty key (halves the rate)
+# ARGV: rate (tokens per second), capacity
+TOKEN_BUCKET_SCRIPT = """
+local paused = redis.call('PTTL', KEYS[2])
+if paused > 0 then
+    return paused
+end
+
+local rate = tonumber(ARGV[1])
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    rate = rate / 2
+end
+local capacity = tonumber(ARGV[2])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+def retry_after_seconds(response, default=1.0):
+    """Parses a Retry-After header (seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Adaptive token bucket kept in Redis, shared by every worker that calls TMDB.
+    Callers queue for up to `max_wait` seconds before the call is shed with
+    TMDBRateLimitError. A 429 pauses the bucket for Retry-After and halves the
+    rate for `penalty_seconds`.
+    If Redis isn't reachable the limiter lets calls through.
+    """
+
+    def __init__(self, rate, capacity, max_wait, penalty_seconds=60, key="tmdb:ratelimit"):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.penalty_seconds = penalty_seconds
+        self.keys = [f"{key}:bucket", f"{key}:paused", f"{key}:penalty"]
+        self._script = None
+
+    def _try_acquire(self):
+        """Takes a token, or returns the seconds to wait for one."""
+        try:
+            if self._script is None:
+                self._script = get_redis_connection("default").register_script(TOKEN_BUCKET_SCRIPT)
+            return self._script(keys=self.keys, args=[self.rate, self.capacity]) / 1000
+        except Exception:
+            return 0  # fail open: no shared limiter is better than no TMDB at all
+
+    def acquire(self):
+        deadline = time.monotonic() + self.max_wait
+        while (wait := self._try_acquire()) > 0:
+            if time.monotonic() + wait > deadline:
+                raise TMDBRateLimitError("TMDB rate limit reached, try again shortly", retry_after=wait)
+            time.sleep(wait)
+
+    async def aacquire(self):
+        deadline = time.monotonic() + self.max_wait
+        while (wait := await sync_to_async(self._try_acquire)()) > 0:
+            if time.monotonic() + wait > deadline:
+                raise TMDBRateLimitError("TMDB rate limit reached, try again shortly", retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Called on a 429: every worker holds off for `seconds`, then runs at half rate."""
+        try:
+            redis = get_redis_connection("default")
+            redis.set(self.keys[1], 1, px=max(int(seconds * 1000), 1))
+            redis.set(self.keys[2], 1, ex=max(int(seconds), self.penalty_seconds))
+        except Exception:
+            pass
+
+    async def apause(self, seconds):
+        await sync_to_async(self.pause)(seconds)
+
+
+rate_limiter = TokenBucket(
+    rate=settings.TMDB_RATE_LIMIT["rate"],
+    capacity=settings.TMDB_RATE_LIMIT["burst"],
+    max_wait=settings.TMDB_RATE_LIMIT["max_wait"],
+    penalty_seconds=settings.TMDB_RATE_LIMIT["penalty_seconds"],
+)
@@ -0,0 +1,37 @@
+# movies/services/search.py
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F
+from django.db.models.functions import ExtractYear
+
+from movies.models import Movie
+
+# Must match the text search config used by the search_vector trigger
+SEARCH_CONFIG = "english"
+
+
+def local_search(query):
+    """
+    Full-text search over stored movies, best matches first.
+    Uses the GIN-indexed search_vector (title weighted above overview).
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        Movie.objects.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F("search_vector"), search_query))
+        .order_by("-rank", "id")
+        .defer("search_vector")
+    )
+
+
+def autocomplete_titles(query, limit):
+    """
+    Typo-tolerant title suggestions as small dicts (id, tmdb_id, title, year).
+    Word similarity (`<%`) matches partial words and misspellings and is
+    served by the movie_title_trgm_gin index.
+    """
+    return (
+        Movie.objects.filter(title__trigram_word_similar=query)
+        .annotate(similarity=TrigramWordSimilarity(query, "title"), year=ExtractYear("release_date"))
+        .order_by("-similarity", "id")
+        .values("id", "tmdb_id", "title", "year")[:limit]
+    )
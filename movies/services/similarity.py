@@ -0,0 +1,106 @@
+# movies/services/similarity.py
+"""
+Offline item-item similarity, stored as MovieSimilarity rows.
+
+Builders run from the build_similarities command; requests only ever read
+the stored top neighbours of one movie.
+"""
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from movies.models import FavoriteMovie, MovieSimilarity
+
+
+def favorites_matrix():
+    """(movie ids, binary movie x user CSR matrix) of every FavoriteMovie row."""
+    pairs = np.fromiter(
+        (value for pair in FavoriteMovie.objects.values_list("movie_id", "user_id").iterator(chunk_size=10_000)
+         for value in pair),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    if not len(pairs):
+        return np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=np.float32)
+
+    movie_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    user_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(movie_ids), len(user_ids)),
+    )
+    return movie_ids, matrix
+
+
+def top_neighbours(matrix, top_n=20, min_common=2, chunk_size=1000):
+    """
+    Cosine similarity between the rows of a binary matrix, keeping the top_n
+    neighbours of each row. Pairs with fewer than min_common users in common
+    are dropped: one shared fan makes two obscure movies look identical.
+
+    Co-occurrence counts are computed chunk_size rows at a time, so memory
+    stays bounded by the densest chunk rather than the full item x item matrix.
+    Yields (row, neighbour rows, scores), best first.
+    """
+    norms = np.sqrt(np.asarray(matrix.sum(axis=1), dtype=np.float32).ravel())
+    transposed = matrix.T.tocsr()
+
+    for start in range(0, matrix.shape[0], chunk_size):
+        common = (matrix[start:start + chunk_size] @ transposed).tocsr()
+        for offset in range(common.shape[0]):
+            row = start + offset
+            begin, end = common.indptr[offset], common.indptr[offset + 1]
+            columns, counts = common.indices[begin:end], common.data[begin:end]
+
+            keep = (columns != row) & (counts >= min_common)
+            columns, counts = columns[keep], counts[keep]
+            if not len(columns):
+                continue
+
+            scores = counts / (norms[row] * norms[columns])
+            if len(scores) > top_n:
+                best = np.argpartition(-scores, top_n - 1)[:top_n]
+                columns, scores = columns[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            yield row, columns[order], scores[order]
+
+
+def save_neighbours(kind, neighbours, batch_size=5000):
+    """
+    Replaces every stored row of one kind with (movie id, similar id, score) tuples.
+    Runs in one transaction, so readers see the old set until the new one is complete.
+    """
+    saved = 0
+    with transaction.atomic():
+        MovieSimilarity.objects.filter(kind=kind).delete()
+        batch = []
+        for movie_id, similar_id, score in neighbours:
+            batch.append(MovieSimilarity(movie_id=movie_id, similar_id=similar_id, kind=kind, score=score))
+            if len(batch) >= batch_size:
+                MovieSimilarity.objects.bulk_create(batch)
+                saved += len(batch)
+                batch = []
+        MovieSimilarity.objects.bulk_create(batch)
+        saved += len(batch)
+    return saved
+
+
+def build_cofavorite_similarities(top_n=20, min_common=2):
+    """Rebuilds the "users who favorited X also favorited" neighbours. Returns the number of rows saved."""
+    movie_ids, matrix = favorites_matrix()
+    neighbours = (
+        (int(movie_ids[row]), int(movie_ids[column]), float(score))
+        for row, columns, scores in top_neighbours(matrix, top_n, min_common)
+        for column, score in zip(columns, scores)
+    )
+    return save_neighbours(MovieSimilarity.COFAVORITE, neighbours)
+
+
+def similar_movies(tmdb_id, kind, limit=20):
+    """Stored neighbours of a TMDB movie, best first, in one query."""
+    rows = (
+        MovieSimilarity.objects.filter(movie__tmdb_id=tmdb_id, kind=kind)
+        .select_related("similar")
+        .defer("similar__search_vector")
+        .order_by("-score")[:limit]
+    )
+    return [row.similar for row in rows]
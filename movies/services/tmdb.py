@@ -1,58 +1,442 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+
+import httpx
 import requests   # send HTTP requests to external APIs.
+from asgiref.sync import sync_to_async
 from django.conf import settings  # Imports my settings to import the TMDb Api key
+from django.core.cache import cache
+
+from movies import profiling
+
+from . import metrics
+from .circuit_breaker import circuit_breaker
+from .exceptions import (
+    TMDBCircuitOpenError,
+    TMDBError,
+    TMDBNotFoundError,
+    TMDBRateLimitError,
+)
+from .rate_limit import rate_limiter, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# How many 429s a single call tolerates before it gives up
+MAX_RATE_LIMIT_RETRIES = 3
+
+
+class _Call:
+    """One in-flight call that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one.
+    Inside a process, threads wait on the in-flight call.
+    Across workers, a short cache lock picks one leader; the others poll
+    for its result. Calls made with keep_stale also keep the last good
+    result for stale_ttl, which waiters fall back to when the leader is slow.
+    Only the endpoints served stale ask for it: a copy of every response
+    would fill the cache with single-use entries during bulk imports.
+    """
+
+    def __init__(self, lock_timeout=10, wait_timeout=5, result_ttl=5, stale_ttl=60 * 60, poll_interval=0.05):
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.stale_ttl = stale_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, keep_stale=False):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn, keep_stale)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn, keep_stale=False):
+        """
+        Cross-worker half of do() for the async client; `fn` is a coroutine function.
+        Callers in one event loop are already collapsed by AsyncTMDBClient.
+        """
+        lock_key, result_key, stale_key = self._keys(key)
+
+        try:
+            is_leader = await cache.aadd(lock_key, 1, self.lock_timeout)
+        except Exception:
+            return await fn()
+
+        if is_leader:
+            try:
+                result = await fn()
+            except Exception:
+                await self._aquietly(cache.adelete, lock_key)
+                raise
+            await self._aquietly(cache.aset, result_key, result, self.result_ttl)
+            if keep_stale:
+                await self._aquietly(cache.aset, stale_key, result, self.stale_ttl)
+            await self._aquietly(cache.adelete, lock_key)
+            return result
+
+        try:
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                result = await cache.aget(result_key)
+                if result is not None:
+                    return result
+                if await cache.aget(lock_key) is None:
+                    break
+
+            if keep_stale:
+                stale = await cache.aget(stale_key)
+                if stale is not None:
+                    return stale
+        except Exception as e:
+            logger.warning("Single flight lost the cache while waiting, calling TMDB itself: %s", e)
+        return await fn()
+
+    def _keys(self, key):
+        return f"tmdb:flight:lock:{key}", f"tmdb:flight:result:{key}", f"tmdb:flight:stale:{key}"
+
+    def _do_shared(self, key, fn, keep_stale):
+        lock_key, result_key, stale_key = self._keys(key)
+
+        try:
+            is_leader = cache.add(lock_key, 1, self.lock_timeout)
+        except Exception:
+            # Cache is down - coalescing is best effort, never block the call on it
+            return fn()
+
+        if is_leader:
+            try:
+                result = fn()
+            except Exception:
+                self._quietly(cache.delete, lock_key)
+                raise
+            # The call succeeded: failing to share its result mustn't fail it
+            self._quietly(cache.set, result_key, result, self.result_ttl)
+            if keep_stale:
+                self._quietly(cache.set, stale_key, result, self.stale_ttl)
+            self._quietly(cache.delete, lock_key)
+            return result
+
+        # Another worker is fetching: wait for its result
+        try:
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                result = cache.get(result_key)
+                if result is not None:
+                    return result
+                if cache.get(lock_key) is None:
+                    break  # leader gave up without a result
+
+            if keep_stale:
+                stale = cache.get(stale_key)
+                if stale is not None:
+                    return stale
+        except Exception as e:
+            logger.warning("Single flight lost the cache while waiting, calling TMDB itself: %s", e)
+        return fn()
+
+    def _quietly(self, operation, *args):
+        try:
+            operation(*args)
+        except Exception as e:
+            logger.warning("Single flight could not update the cache: %s", e)
+
+    async def _aquietly(self, operation, *args):
+        try:
+            await operation(*args)
+        except Exception as e:
+            logger.warning("Single flight could not update the cache: %s", e)
+
+
+single_flight = SingleFlight(
+    lock_timeout=settings.TMDB_SINGLE_FLIGHT_LOCK_TIMEOUT,
+    wait_timeout=settings.TMDB_SINGLE_FLIGHT_WAIT,
+    stale_ttl=settings.TMDB_SINGLE_FLIGHT_STALE_TTL,
+)
+
+
+def request_key(endpoint, params):
+    """Stable key for an endpoint + params pair (the api key is never part of it)."""
+    raw = json.dumps([endpoint, params], sort_keys=True, default=str)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def not_found_key(endpoint, params):
+    return f"tmdb:404:{request_key(endpoint, params)}"
+
+
+def read_response(response, endpoint, params):
+    """
+    Turns a TMDB response (requests or httpx) into data, or the matching TMDBError.
+    404s are remembered so the same unknown id doesn't reach TMDB again for a while.
+    """
+    if response.status_code == 404:
+        cache.set(not_found_key(endpoint, params), 1, settings.TMDB_NOT_FOUND_TTL)
+        raise TMDBNotFoundError(f"TMDB API Error 404: {endpoint} not found")
+
+    try:
+        data = response.json()
+    except ValueError:
+        raise TMDBError(f"TMDB API Error {response.status_code}: invalid JSON response")
+
+    if response.status_code != 200:
+        raise TMDBError(f"TMDB API Error {response.status_code}: {data}")
+    return data
 
 
 class TMDBClient:
-    BASE_URL = "https://api.themoviedb.org/3"
+    BASE_URL = settings.TMDB_BASE_URL
 
-    def __init__(self):   #runs when the class is created
+    def __init__(self, coalesce=True):   #runs when the class is created
         self.api_key = settings.TMDB_API_KEY
         self.session = requests.Session() # Creates a session for requests
+        # Bulk jobs fetch each movie once: sharing calls would only add cache round trips
+        self.coalesce = coalesce
 
-    def _get(self, endpoint, params=None):
+    def _get(self, endpoint, params=None, keep_stale=False):
         """
         Internal GET request handler.
-        Handles errors & adds API key automatically.
+        Identical concurrent requests share a single call to TMDB (see SingleFlight for keep_stale).
         """
         if params is None:
             params = {}
 
-        params['api_key'] = self.api_key
+        if not self.coalesce:
+            return self._request(endpoint, params)
+        key = request_key(endpoint, params)
+        return single_flight.do(key, lambda: self._request(endpoint, params), keep_stale)
 
-        url = f"{self.BASE_URL}{endpoint}"
-        
-        print(f" Making request to {url}")  # Debug log
-        print(f"  API Key exists: {bool(self.api_key)}")  # Debug log
+    def _request(self, endpoint, params):
+        """
+        Performs the actual HTTP call.
+        Handles errors & adds API key automatically.
+        Goes through the negative cache, circuit breaker and shared rate limiter.
+        """
+        if cache.get(not_found_key(endpoint, params)):
+            metrics.record_short_circuit(endpoint, "not_found")
+            raise TMDBNotFoundError(f"TMDB API Error 404: {endpoint} not found")
 
+        # Fails fast with TMDBCircuitOpenError while TMDB is down
         try:
-            response = self.session.get(url, params=params, timeout=30)
-            print(f"Response status: {response.status_code}")  # Debug log
+            circuit_breaker.before_call()
+        except TMDBCircuitOpenError:
+            metrics.record_short_circuit(endpoint, "circuit_open")
+            raise
+
+        query = {**params, 'api_key': self.api_key}
+        url = f"{self.BASE_URL}{endpoint}"
 
-            if response.status_code != 200:
-                error_data = response.json()
-                print(f" Error response: {error_data}")  # Debug log
-                raise Exception(f"TMDB API Error {response.status_code}: {error_data}")
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            # Queues briefly, raises TMDBRateLimitError once the wait budget is spent
+            rate_limiter.acquire()
 
-            data = response.json()
-            print(f" Success! Got {len(data.get('results', []))} results")  # Debug log
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            print(f" Request failed: {str(e)}")  # Debug log
-            raise Exception(f"TMDB API Request failed: {str(e)}")
+            started = time.perf_counter()
+            try:
+                response = self.session.get(
+                    url, params=query, timeout=(settings.TMDB_CONNECT_TIMEOUT, settings.TMDB_READ_TIMEOUT)
+                )
+            except requests.exceptions.RequestException as e:
+                elapsed = time.perf_counter() - started
+                metrics.record_response(endpoint, "error", elapsed)
+                profiling.record("tmdb", elapsed)
+                logger.warning("TMDB request to %s failed: %s", endpoint, e)
+                circuit_breaker.record_failure()
+                raise TMDBError(f"TMDB API Request failed: {str(e)}")
+
+            elapsed = time.perf_counter() - started
+            metrics.record_response(endpoint, response.status_code, elapsed, len(response.content))
+            profiling.record("tmdb", elapsed)
+            logger.debug("TMDB %s -> %s in %.0fms", endpoint, response.status_code, elapsed * 1000)
+
+            if response.status_code == 429:
+                metrics.record_retry(endpoint, "rate_limited")
+                rate_limiter.pause(retry_after_seconds(response))
+                continue
+
+            circuit_breaker.record(response.status_code < 500)
+            return read_response(response, endpoint, params)
+
+        raise TMDBRateLimitError("TMDB rate limit reached, try again shortly", retry_after=retry_after_seconds(response))
 
     # ===============================
     #           PUBLIC METHODS
     # ===============================
 
     def get_trending_movies(self):
-        return self._get("/trending/movie/week")
+        return self._get("/trending/movie/week", keep_stale=True)
 
     def get_movie_details(self, movie_id):
         return self._get(f"/movie/{movie_id}")
 
     def get_recommended(self, movie_id):
-        return self._get(f"/movie/{movie_id}/recommendations")
+        return self._get(f"/movie/{movie_id}/recommendations", keep_stale=True)
 
     def search_movies(self, query: str):
         return self._get("/search/movie", params={"query": query})
+
+    def get_movie_changes(self, start_date, end_date, page=1):
+        """IDs of movies changed between two dates (TMDB allows at most 14 days)."""
+        return self._get(
+            "/movie/changes",
+            params={"start_date": start_date, "end_date": end_date, "page": page},
+        )
+
+
+class _LoopState:
+    """Connection pool and in-flight requests bound to one event loop."""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.TMDB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TMDB_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                settings.TMDB_READ_TIMEOUT,
+                connect=settings.TMDB_CONNECT_TIMEOUT,
+                pool=settings.TMDB_POOL_TIMEOUT,
+            ),
+        )
+        self.inflight = {}
+
+
+class AsyncTMDBClient:
+    """
+    asyncio version of TMDBClient for async views.
+    Every instance shares one bounded HTTP/2 connection pool per event loop.
+    Identical concurrent requests share a single call: in one loop through a
+    shared task, across workers through single_flight (keep_stale included).
+    """
+    BASE_URL = TMDBClient.BASE_URL
+
+    _loops = weakref.WeakKeyDictionary()  # event loop -> _LoopState
+
+    def __init__(self):
+        self.api_key = settings.TMDB_API_KEY
+
+    @classmethod
+    def _state(cls):
+        loop = asyncio.get_running_loop()
+        state = cls._loops.get(loop)
+        if state is None or state.client.is_closed:
+            state = cls._loops[loop] = _LoopState()
+        return state
+
+    @classmethod
+    async def aclose(cls):
+        """Closes the pool of the running loop (e.g. on ASGI lifespan shutdown)."""
+        state = cls._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    async def _get(self, endpoint, params=None, keep_stale=False):
+        if params is None:
+            params = {}
+
+        key = request_key(endpoint, params)
+        inflight = self._state().inflight
+
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                single_flight.ado(key, lambda: self._request(endpoint, params), keep_stale)
+            )
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+
+        # shield: one caller going away must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _request(self, endpoint, params):
+        if await cache.aget(not_found_key(endpoint, params)):
+            metrics.record_short_circuit(endpoint, "not_found")
+            raise TMDBNotFoundError(f"TMDB API Error 404: {endpoint} not found")
+
+        try:
+            await sync_to_async(circuit_breaker.before_call)()
+        except TMDBCircuitOpenError:
+            metrics.record_short_circuit(endpoint, "circuit_open")
+            raise
+
+        query = {**params, 'api_key': self.api_key}
+        url = f"{self.BASE_URL}{endpoint}"
+
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await rate_limiter.aacquire()
+
+            started = time.perf_counter()
+            try:
+                response = await self._state().client.get(url, params=query)
+            except httpx.HTTPError as e:
+                elapsed = time.perf_counter() - started
+                metrics.record_response(endpoint, "error", elapsed)
+                profiling.record("tmdb", elapsed)
+                logger.warning("TMDB request to %s failed: %s", endpoint, e)
+                await sync_to_async(circuit_breaker.record_failure)()
+                raise TMDBError(f"TMDB API Request failed: {str(e)}")
+
+            elapsed = time.perf_counter() - started
+            metrics.record_response(endpoint, response.status_code, elapsed, len(response.content))
+            profiling.record("tmdb", elapsed)
+            logger.debug("TMDB %s -> %s in %.0fms", endpoint, response.status_code, elapsed * 1000)
+
+            if response.status_code == 429:
+                metrics.record_retry(endpoint, "rate_limited")
+                await rate_limiter.apause(retry_after_seconds(response))
+                continue
+
+            await sync_to_async(circuit_breaker.record)(response.status_code < 500)
+            return await sync_to_async(read_response)(response, endpoint, params)
+
+        raise TMDBRateLimitError("TMDB rate limit reached, try again shortly", retry_after=retry_after_seconds(response))
+
+    # ===============================
+    #           PUBLIC METHODS
+    # ===============================
+
+    async def get_trending_movies(self):
+        return await self._get("/trending/movie/week", keep_stale=True)
+
+    async def get_movie_details(self, movie_id):
+        return await self._get(f"/movie/{movie_id}")
+
+    async def get_recommended(self, movie_id):
+        return await self._get(f"/movie/{movie_id}/recommendations", keep_stale=True)
+
+    async def search_movies(self, query: str):
+        return await self._get("/search/movie", params={"query": query})
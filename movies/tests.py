@@ -1,3 +1,2149 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+
+try:
+    import fakeredis
+except ImportError:  # test dependency, see requirements.txt
+    fakeredis = None
+try:
+    import lupa  # lets fakeredis run Lua scripts
+except ImportError:
+    lupa = None
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from django_redis.serializers.pickle import PickleSerializer
+from django_redis.cache import RedisCache
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from users.models import User
+from . import async_views, profiling, urls, views
+from . import cache_backends
+from .cache_backends import _MISSING, LocalTier, ORJSONSerializer, TwoTierRedisCache
+from .management.commands.sync_movies import MAX_FETCH_ATTEMPTS
+from .models import FavoriteMovie, Movie, MovieSimilarity, SyncCheckpoint
+from .parsers import ORJSONParser
+from .profiling import ProfilingMiddleware, RequestProfile, timed
+from .renderers import ORJSONRenderer
+from .serializers import (
+    FAVORITE_VALUES,
+    MOVIE_FIELDS,
+    FavoriteMovieSerializer,
+    MovieSerializer,
+    serialize_favorite,
+    serialize_movie,
+)
+from .services.cache import StaleWhileRevalidateCache
+from .services.circuit_breaker import CircuitBreaker, circuit_breaker
+from .services.exceptions import TMDBCircuitOpenError, TMDBError, TMDBNotFoundError, TMDBRateLimitError
+from .services.rate_limit import TokenBucket, rate_limiter
+from .services.importer import ExportImporter, read_export_ids
+from .services.movie_sync import _unsaved_movies, sync_movies_from_tmdb
+from .services.tmdb import (
+    MAX_RATE_LIMIT_RETRIES, AsyncTMDBClient, SingleFlight, TMDBClient, request_key, single_flight,
+)
+from .services.content_index import (
+    build_content_similarities, document_frequency, hashed_counts, nearest_neighbours, tfidf, tokens,
+)
+from .services.feature_store import (
+    HEADER,
+    Snapshot,
+    SnapshotError,
+    SnapshotReader,
+    load_columns,
+    open_snapshot,
+    write_snapshot,
+)
+from .services.recommender import catalog_cache, recommend
+from .services.similarity import build_cofavorite_similarities, favorites_matrix, top_neighbours
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Cache methods counted against a budget (async variants go through these)
+CACHE_METHODS = ("get", "get_many", "set", "set_many", "add", "delete", "delete_many", "incr", "decr", "has_key", "touch")
+
+
+class StubTMDBClient:
+    """
+    Local stand-in for TMDB.
+    Serves canned movie details and fails for ids listed in `missing`.
+    Every window of /movie/changes lists the `changed` ids, two per page.
+    """
+
+    def __init__(self, missing=(), changed=()):
+        self.missing = set(missing)
+        self.changed = list(changed)
+        self.requested = []
+        self.changes_requested = []
+
+    def get_movie_changes(self, start_date, end_date, page=1):
+        self.changes_requested.append((start_date, end_date, page))
+        return {
+            "results": [{"id": tmdb_id, "adult": False} for tmdb_id in self.changed[(page - 1) * 2:page * 2]],
+            "page": page,
+            "total_pages": max(1, -(-len(self.changed) // 2)),
+        }
+
+    def get_movie_details(self, movie_id):
+        self.requested.append(movie_id)
+        if movie_id in self.missing:
+            raise Exception(f"TMDB API Error 404: movie {movie_id} not found")
+        return {
+            "id": movie_id,
+            "title": f"Movie {movie_id}",
+            "overview": f"Overview of movie {movie_id}",
+            "poster_path": f"/poster{movie_id}.jpg",
+            "release_date": "2020-01-01",
+            "genres": [{"id": 18, "name": "Drama"}],
+            "original_language": "en",
+        }
+
+
+def tmdb_movie(movie_id, genres=(18,)):
+    return {
+        "id": movie_id,
+        "title": f"Movie {movie_id}",
+        "overview": f"Overview of movie {movie_id}",
+        "poster_path": f"/poster{movie_id}.jpg",
+        "release_date": "2020-01-01",
+        "genre_ids": list(genres),
+        "original_language": "en",
+    }
+
+
+class StubResponse:
+    def __init__(self, status_code, data, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StubTMDBSession:
+    """
+    Stands in for TMDBClient.session, so the whole client path (negative cache,
+    circuit breaker, single flight) runs without reaching the network.
+    """
+
+    def __init__(self, missing=(), no_recommendations=(), rate_limited=0):
+        self.missing = set(missing)
+        self.no_recommendations = set(no_recommendations)
+        self.rate_limited = rate_limited  # the first this many requests get a 429
+        self.requested = []
+
+    def get(self, url, params=None, timeout=None):
+        path = url.removeprefix(views.tmdb.BASE_URL)
+        self.requested.append(path)
+
+        if len(self.requested) <= self.rate_limited:
+            return StubResponse(429, {"status_message": "Request count over limit."}, {"Retry-After": "2"})
+
+        if path == "/trending/movie/week":
+            return StubResponse(200, {"results": [tmdb_movie(i) for i in range(1, 6)]})
+        if path == "/search/movie":
+            return StubResponse(200, {"results": [tmdb_movie(i) for i in range(20, 23)]})
+
+        match = re.fullmatch(r"/movie/(\d+)(/recommendations)?", path)
+        movie_id = int(match[1])
+        if movie_id in self.missing:
+            return StubResponse(404, {"status_message": "The resource you requested could not be found."})
+        if match[2]:
+            if movie_id in self.no_recommendations:
+                return StubResponse(200, {"results": []})
+            return StubResponse(200, {"results": [tmdb_movie(i) for i in range(30, 34)]})
+        return StubResponse(200, tmdb_movie(movie_id))
+
+
+def async_tmdb_transport(handler):
+    """
+    Points AsyncTMDBClient's connection pools at an httpx.MockTransport.
+    `handler` takes an httpx.Request, or pass a StubTMDBSession to serve from it.
+    """
+    if isinstance(handler, StubTMDBSession):
+        session = handler
+
+        def handler(request):
+            response = session.get(str(request.url.copy_with(query=None)), dict(request.url.params))
+            return httpx.Response(response.status_code, content=response.content, headers=response.headers)
+
+    transport = httpx.MockTransport(handler)
+    AsyncTMDBClient._loops.clear()
+    return mock.patch(
+        "movies.services.tmdb._LoopState",
+        lambda: SimpleNamespace(client=httpx.AsyncClient(transport=transport), inflight={}),
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TMDBClientCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def client_with(self, **kwargs):
+        client = TMDBClient(**kwargs)
+        client.session = StubTMDBSession()
+        return client
+
+    def stale_copy(self, endpoint):
+        return caches["default"].get(f"tmdb:flight:stale:{request_key(endpoint, {})}")
+
+    def test_stale_copy_only_for_lists_served_stale(self):
+        client = self.client_with()
+        client.get_trending_movies()
+        client.get_recommended(550)
+        client.get_movie_details(550)
+
+        self.assertIsNotNone(self.stale_copy("/trending/movie/week"))
+        self.assertIsNotNone(self.stale_copy("/movie/550/recommendations"))
+        self.assertIsNone(self.stale_copy("/movie/550"))
+
+    def test_bulk_client_skips_coalescing(self):
+        client = self.client_with(coalesce=False)
+
+        with mock.patch.object(single_flight, "do") as shared:
+            self.assertEqual(client.get_movie_details(550)["id"], 550)
+
+        shared.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TMDBRateLimitRetryTests(APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+        patcher = mock.patch.object(rate_limiter, "pause")
+        self.pause = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client_with(self, session):
+        client = TMDBClient(coalesce=False)
+        client.session = session
+        return client
+
+    def test_retry_after_pauses_then_retries(self):
+        session = StubTMDBSession(rate_limited=1)
+
+        self.assertEqual(self.client_with(session).get_movie_details(550)["id"], 550)
+        self.pause.assert_called_once_with(2.0)
+        self.assertEqual(session.requested, ["/movie/550", "/movie/550"])
+
+    def test_gives_up_after_max_retries(self):
+        session = StubTMDBSession(rate_limited=MAX_RATE_LIMIT_RETRIES + 1)
+
+        with self.assertRaises(TMDBRateLimitError) as raised:
+            self.client_with(session).get_movie_details(550)
+
+        self.assertEqual(raised.exception.retry_after, 2.0)
+        self.assertEqual(len(session.requested), MAX_RATE_LIMIT_RETRIES + 1)
+        self.assertEqual(self.pause.call_count, MAX_RATE_LIMIT_RETRIES + 1)
+
+    def test_view_answers_503_with_retry_after(self):
+        user = User.objects.create_user(username="limited", email="limited@example.com", password="secret123")
+        self.client.force_authenticate(user)
+
+        with mock.patch.object(views.tmdb, "session", StubTMDBSession(rate_limited=100)):
+            response = self.client.get("/api/movies/trending/")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.cache = caches["default"]
+        self.flight = SingleFlight(wait_timeout=2, poll_interval=0.01)
+
+    def later(self, seconds, action):
+        timer = threading.Timer(seconds, action)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_threads_share_one_call(self):
+        release, calls, results = threading.Event(), [], []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return ["movies"]
+
+        threads = [threading.Thread(target=lambda: results.append(self.flight.do("k", fn))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)  # every thread is waiting on the first one's call
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["movies"]] * 5)
+        self.assertIsNone(self.cache.get("tmdb:flight:lock:k"))  # released
+
+    def test_other_worker_waits_for_the_leaders_result(self):
+        self.cache.add("tmdb:flight:lock:k", 1)  # another worker is fetching
+        self.later(0.1, lambda: self.cache.set("tmdb:flight:result:k", ["theirs"]))
+        fn = mock.Mock(return_value=["ours"])
+
+        self.assertEqual(self.flight.do("k", fn), ["theirs"])
+        fn.assert_not_called()
+
+    def test_stale_copy_served_when_the_leader_fails(self):
+        self.flight.do("k", lambda: ["good"], keep_stale=True)
+        self.cache.delete("tmdb:flight:result:k")
+        self.cache.add("tmdb:flight:lock:k", 1)
+        # the leader's call raised: it releases the lock without a result
+        self.later(0.1, lambda: self.cache.delete("tmdb:flight:lock:k"))
+        fn = mock.Mock(side_effect=TMDBError("TMDB down"))
+
+        self.assertEqual(self.flight.do("k", fn, keep_stale=True), ["good"])
+        fn.assert_not_called()
+
+    def test_leader_error_reaches_the_caller_and_frees_the_lock(self):
+        with self.assertRaises(TMDBError):
+            self.flight.do("k", mock.Mock(side_effect=TMDBError("TMDB down")), keep_stale=True)
+
+        self.assertIsNone(self.cache.get("tmdb:flight:lock:k"))
+
+    def test_without_keep_stale_the_waiter_calls_itself(self):
+        self.flight.do("k", lambda: ["good"])
+        self.cache.delete("tmdb:flight:result:k")
+        self.cache.add("tmdb:flight:lock:k", 1)
+        self.later(0.1, lambda: self.cache.delete("tmdb:flight:lock:k"))
+
+        self.assertEqual(self.flight.do("k", lambda: ["fresh"]), ["fresh"])
+
+    def test_cache_down_calls_straight_through(self):
+        with mock.patch.object(self.cache, "add", side_effect=ConnectionError("down")):
+            self.assertEqual(self.flight.do("k", lambda: ["movies"]), ["movies"])
+
+    def test_failing_to_share_the_result_still_returns_it(self):
+        with mock.patch.object(self.cache, "set", side_effect=ConnectionError("down")), \
+                mock.patch.object(self.cache, "delete", side_effect=ConnectionError("down")), \
+                self.assertLogs("movies.services.tmdb", "WARNING"):
+            self.assertEqual(self.flight.do("k", lambda: ["movies"], keep_stale=True), ["movies"])
+
+    def test_cache_lost_while_waiting(self):
+        self.cache.add("tmdb:flight:lock:k", 1)
+
+        with mock.patch.object(self.cache, "get", side_effect=ConnectionError("down")), \
+                self.assertLogs("movies.services.tmdb", "WARNING"):
+            self.assertEqual(self.flight.do("k", lambda: ["movies"]), ["movies"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncTMDBClientTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.requested = []
+        self.responses = []  # served in order, then every request gets a movie
+
+    def serve(self, request):
+        self.requested.append(request.url.path)
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json=tmdb_movie(550))
+
+    async def call(self, method, *args):
+        with async_tmdb_transport(self.serve):
+            return await getattr(AsyncTMDBClient(), method)(*args)
+
+    async def test_concurrent_callers_share_one_request(self):
+        async def slow(request):
+            await asyncio.sleep(0.05)
+            return self.serve(request)
+
+        with async_tmdb_transport(slow):
+            client = AsyncTMDBClient()
+            results = await asyncio.gather(*(client.get_movie_details(550) for _ in range(5)))
+
+        self.assertEqual([result["id"] for result in results], [550] * 5)
+        self.assertEqual(len(self.requested), 1)
+
+    async def test_not_found_is_negative_cached(self):
+        self.responses.append(httpx.Response(404, json={"status_message": "Not found"}))
+
+        for _ in range(2):
+            with self.assertRaises(TMDBNotFoundError):
+                await self.call("get_movie_details", 404)
+
+        self.assertEqual(len(self.requested), 1)
+
+    async def test_retry_after_pauses_then_retries(self):
+        self.responses.append(httpx.Response(429, json={}, headers={"Retry-After": "2"}))
+
+        with mock.patch.object(rate_limiter, "apause") as apause:
+            data = await self.call("get_movie_details", 550)
+
+        self.assertEqual(data["id"], 550)
+        apause.assert_awaited_once_with(2.0)
+        self.assertEqual(len(self.requested), 2)
+
+    async def test_http_error_records_breaker_failure(self):
+        self.responses.append(httpx.ConnectError("connection refused"))
+
+        with mock.patch.object(circuit_breaker, "record_failure") as record_failure:
+            with self.assertRaises(TMDBError), self.assertLogs("movies.services.tmdb", "WARNING"):
+                await self.call("get_movie_details", 550)
+
+        record_failure.assert_called_once_with()
+
+    async def test_keeps_stale_copy_of_trending_only(self):
+        await self.call("get_trending_movies")
+        await self.call("get_movie_details", 550)
+
+        self.assertIsNotNone(await caches["default"].aget(self.stale_key("/trending/movie/week")))
+        self.assertIsNone(await caches["default"].aget(self.stale_key("/movie/550")))
+
+    async def test_waits_for_other_worker_then_serves_stale(self):
+        key = request_key("/trending/movie/week", {})
+        await caches["default"].aadd(f"tmdb:flight:lock:{key}", 1)
+        await caches["default"].aset(self.stale_key("/trending/movie/week"), {"results": ["stale"]})
+
+        with mock.patch.object(single_flight, "wait_timeout", 0.1):
+            data = await self.call("get_trending_movies")
+
+        self.assertEqual(data, {"results": ["stale"]})
+        self.assertEqual(self.requested, [])
+
+    def stale_key(self, endpoint):
+        return f"tmdb:flight:stale:{request_key(endpoint, {})}"
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_hidden_without_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=True)
+    def test_open_without_token_in_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, probe_timeout=5, key="test:circuit")
+        self.now = time.time()
+        patcher = mock.patch("time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record_failures(self, times=1):
+        for _ in range(times):
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.record_failures(2)
+        self.breaker.before_call()
+
+        self.record_failures()
+        with self.assertRaises(TMDBCircuitOpenError):
+            self.breaker.before_call()
+
+    def test_success_resets_the_count(self):
+        self.record_failures(2)
+        self.breaker.record_success()
+        self.record_failures(2)
+
+        self.breaker.before_call()
+
+    def test_slow_failures_still_open_it(self):
+        # each failure comes 200s after the last, longer than the first one's TTL allows in total
+        for _ in range(3):
+            self.now += 200
+            self.record_failures()
+
+        with self.assertRaises(TMDBCircuitOpenError):
+            self.breaker.before_call()
+
+    def test_half_open_lets_one_probe_through(self):
+        self.record_failures(3)
+        self.now += 31
+
+        self.breaker.before_call()  # the probe
+        with self.assertRaisesRegex(TMDBCircuitOpenError, "recovering"):
+            self.breaker.before_call()
+
+    def test_successful_probe_closes(self):
+        self.record_failures(3)
+        self.now += 31
+        self.breaker.before_call()
+        self.breaker.record_success()
+
+        for _ in range(3):
+            self.breaker.before_call()
+
+    def test_failed_probe_opens_again(self):
+        self.record_failures(3)
+        self.now += 31
+        self.breaker.before_call()
+        self.record_failures()
+
+        with self.assertRaisesRegex(TMDBCircuitOpenError, "unavailable"):
+            self.breaker.before_call()
+
+    def test_stays_out_of_the_way_when_cache_is_down(self):
+        with mock.patch.object(caches["default"], "get_many", side_effect=ConnectionError("down")), \
+                mock.patch.object(caches["default"], "add", side_effect=ConnectionError("down")):
+            self.record_failures(5)
+            self.breaker.before_call()
+
+
+@unittest.skipUnless(fakeredis and lupa, "needs fakeredis and lupa")
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        redis = fakeredis.FakeRedis()
+        patcher = mock.patch("movies.services.rate_limit.get_redis_connection", return_value=redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_limited(self):
+        bucket = TokenBucket(rate=1, capacity=3, max_wait=0)
+        for _ in range(3):
+            bucket.acquire()
+
+        with self.assertRaises(TMDBRateLimitError) as raised:
+            bucket.acquire()
+        self.assertGreater(raised.exception.retry_after, 0)
+
+    def test_waits_for_a_token_within_max_wait(self):
+        bucket = TokenBucket(rate=20, capacity=1, max_wait=1)
+        bucket.acquire()
+
+        started = time.monotonic()
+        bucket.acquire()
+        self.assertGreater(time.monotonic() - started, 0.02)
+
+    def test_buckets_shared_between_instances(self):
+        first, second = TokenBucket(rate=1, capacity=1, max_wait=0), TokenBucket(rate=1, capacity=1, max_wait=0)
+        first.acquire()
+
+        with self.assertRaises(TMDBRateLimitError):
+            second.acquire()
+
+    def test_pause_holds_everyone_off_then_halves_the_rate(self):
+        bucket = TokenBucket(rate=10, capacity=1, max_wait=0)
+        bucket.pause(0.2)
+
+        self.assertGreater(bucket._try_acquire(), 0.1)
+        time.sleep(0.25)
+        bucket.acquire()
+        # at half rate the next token takes ~200ms instead of ~100ms
+        self.assertGreater(bucket._try_acquire(), 0.15)
+
+    def test_fails_open_without_redis(self):
+        bucket = TokenBucket(rate=1, capacity=1, max_wait=0)
+        with mock.patch("movies.services.rate_limit.get_redis_connection", side_effect=ConnectionError("down")):
+            for _ in range(5):
+                bucket.acquire()
+            bucket.pause(10)
+
+    def test_fails_open_when_the_script_errors(self):
+        bucket = TokenBucket(rate=1, capacity=1, max_wait=0)
+        bucket.acquire()
+        bucket._script = mock.Mock(side_effect=ConnectionError("connection reset"))
+
+        bucket.acquire()
+
+    async def test_async_acquire(self):
+        bucket = TokenBucket(rate=1, capacity=1, max_wait=0)
+        await bucket.aacquire()
+
+        with self.assertRaises(TMDBRateLimitError):
+            await bucket.aacquire()
+
+
+def write_export(path, ids, adult=()):
+    with gzip.open(path, "wt", encoding="utf-8") as export:
+        for movie_id in ids:
+            item = {"adult": movie_id in adult, "id": movie_id, "original_title": f"Movie {movie_id}"}
+            export.write(json.dumps(item) + "\n")
+
+
+# The importer writes from its own thread, so these need real commits
+class ExportImporterTests(TransactionTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json.gz")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_reads_ids_from_export_skipping_adult(self):
+        write_export(self.path, [1, 2, 3], adult={2})
+
+        self.assertEqual(list(read_export_ids(self.path)), [1, 3])
+        self.assertEqual(list(read_export_ids(self.path, include_adult=True)), [1, 2, 3])
+
+    def test_imports_every_id_in_batches(self):
+        write_export(self.path, range(1, 26))
+        progress = []
+
+        importer = ExportImporter(
+            client=StubTMDBClient(), batch_size=10, concurrency=4, on_progress=lambda s: progress.append(s.saved)
+        )
+        stats = importer.run(self.path)
+
+        self.assertEqual(stats.saved, 25)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertEqual(Movie.objects.count(), 25)
+        movie = Movie.objects.get(tmdb_id=7)
+        self.assertEqual(movie.title, "Movie 7")
+        self.assertEqual(movie.genres, [18])
+
+    def test_skips_movies_already_stored(self):
+        Movie.objects.create(tmdb_id=2, title="Kept")
+        write_export(self.path, [1, 2, 3])
+        client = StubTMDBClient()
+
+        stats = ExportImporter(client=client, batch_size=10).run(self.path)
+
+        self.assertEqual(sorted(client.requested), [1, 3])
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual(Movie.objects.get(tmdb_id=2).title, "Kept")
+
+    def test_failed_fetches_are_counted_not_raised(self):
+        write_export(self.path, [1, 2, 3])
+
+        stats = ExportImporter(client=StubTMDBClient(missing={2}), batch_size=2).run(self.path)
+
+        self.assertEqual((stats.saved, stats.failed), (2, 1))
+        self.assertFalse(Movie.objects.filter(tmdb_id=2).exists())
+
+    def write_corrupt_export(self):
+        with gzip.open(self.path, "wt", encoding="utf-8") as export:
+            export.write('{"adult": false, "id": 1}\n{"adult": false, "id": 2\n[3]\n\n{"adult": false}\n{"id": 4}\n')
+
+    def test_malformed_lines_are_skipped(self):
+        self.write_corrupt_export()
+        malformed = []
+
+        self.assertEqual(list(read_export_ids(self.path, on_malformed=malformed.append)), [1, 4])
+        self.assertEqual(malformed, [2, 3, 5])
+
+    def test_import_counts_malformed_lines(self):
+        self.write_corrupt_export()
+        out, err = io.StringIO(), io.StringIO()
+
+        with mock.patch("movies.services.importer.TMDBClient", return_value=StubTMDBClient()):
+            call_command("import_movie_ids", self.path, stdout=out, stderr=err)
+
+        self.assertIn("saved 2, skipped 0, failed 0, malformed 3", out.getvalue())
+        self.assertIn("Skipped 3 malformed lines", err.getvalue())
+        self.assertEqual(set(Movie.objects.values_list("tmdb_id", flat=True)), {1, 4})
+
+    def test_writer_connection_closed_when_a_batch_fails(self):
+        write_export(self.path, [1, 2])
+
+        with mock.patch("movies.services.importer.sync_movies_from_tmdb", side_effect=DatabaseError("gone")), \
+                mock.patch.object(connections, "close_all") as close_all:
+            with self.assertRaises(DatabaseError):
+                ExportImporter(client=StubTMDBClient()).run(self.path)
+
+        close_all.assert_called_once_with()
+
+
+class MovieSyncTests(TestCase):
+    def test_one_query_for_a_page(self):
+        Movie.objects.create(tmdb_id=3, title="Old title")
+
+        with self.assertNumQueries(1):
+            movies = sync_movies_from_tmdb([tmdb_movie(tmdb_id) for tmdb_id in range(1, 21)])
+
+        self.assertEqual(len(movies), 20)
+        self.assertEqual(Movie.objects.count(), 20)
+
+    def test_existing_rows_updated_in_place(self):
+        stored = Movie.objects.create(tmdb_id=550, title="Old title", genres=[18], popularity=1.0)
+
+        [movie] = sync_movies_from_tmdb([{**tmdb_movie(550, genres=(18, 53)), "popularity": 61.4}])
+
+        self.assertEqual(movie.pk, stored.pk)
+        stored.refresh_from_db()
+        self.assertEqual(
+            (stored.title, stored.genres, stored.popularity, stored.poster_url),
+            ("Movie 550", [18, 53], 61.4, "https://image.tmdb.org/t/p/w500/poster550.jpg"),
+        )
+        self.assertEqual(Movie.objects.count(), 1)
+
+    def test_tmdb_order_preserved(self):
+        stored = Movie.objects.create(tmdb_id=10, title="Old title")
+
+        movies = sync_movies_from_tmdb([tmdb_movie(30), tmdb_movie(10), tmdb_movie(20)])
+
+        self.assertEqual([movie.tmdb_id for movie in movies], [30, 10, 20])
+        self.assertEqual(movies[1].pk, stored.pk)
+        self.assertEqual([movie.pk for movie in movies], [Movie.objects.get(tmdb_id=i).pk for i in (30, 10, 20)])
+
+    def test_duplicates_in_one_payload_collapse(self):
+        payload = [{**tmdb_movie(7), "title": "First"}, tmdb_movie(8), {**tmdb_movie(7), "title": "Second"}]
+
+        unsaved = _unsaved_movies(payload)
+        self.assertEqual(
+            [(movie.tmdb_id, movie.title, movie.pk) for movie in unsaved], [(7, "First", None), (8, "Movie 8", None)]
+        )
+
+        movies = sync_movies_from_tmdb(payload)
+
+        self.assertEqual([movie.tmdb_id for movie in movies], [7, 8])
+        self.assertEqual(list(Movie.objects.filter(tmdb_id=7).values_list("title", flat=True)), ["First"])
+
+
+class SyncMoviesCommandTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.tmdb = StubTMDBClient()
+        patcher = mock.patch("movies.management.commands.sync_movies.TMDBClient", return_value=self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sync(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("sync_movies", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def store(self, *tmdb_ids):
+        Movie.objects.bulk_create(Movie(tmdb_id=tmdb_id, title="Old title") for tmdb_id in tmdb_ids)
+
+    def titles(self):
+        return dict(Movie.objects.values_list("tmdb_id", "title"))
+
+    def checkpoint(self, mode):
+        return SyncCheckpoint.objects.get(name=f"sync_movies:{mode}")
+
+    def test_changes_mode_refreshes_stored_movies(self):
+        self.store(1, 2, 3)
+        self.tmdb.changed = [1, 2, 5]
+
+        since = self.today - timedelta(days=20)
+        out, _ = self.sync("--since", since.isoformat())
+
+        # Two windows, TMDB allows 14 days at most; each lists 1 and 2 again
+        self.assertIn("Refreshed 4 movies", out)
+        self.assertEqual(self.titles(), {1: "Movie 1", 2: "Movie 2", 3: "Old title"})
+        middle = since + timedelta(days=14)
+        self.assertEqual(
+            [(start, end) for start, end, _ in self.tmdb.changes_requested[::2]],
+            [(since.isoformat(), middle.isoformat()), (middle.isoformat(), self.today.isoformat())],
+        )
+        checkpoint = self.checkpoint("changes")
+        self.assertEqual(timezone.localtime(checkpoint.watermark).date(), self.today)
+        self.assertEqual(checkpoint.cursor, {})
+
+    def test_changes_mode_resumes_from_cursor(self):
+        self.store(1, 2, 3)
+        self.tmdb.changed = [1, 2, 3]
+        start = self.today - timedelta(days=1)
+        SyncCheckpoint.objects.create(
+            name="sync_movies:changes", cursor={"start": start.isoformat(), "end": self.today.isoformat(), "page": 2}
+        )
+
+        self.sync()
+
+        self.assertEqual(self.tmdb.changes_requested, [(start.isoformat(), self.today.isoformat(), 2)])
+        self.assertEqual(self.titles(), {1: "Old title", 2: "Old title", 3: "Movie 3"})
+        self.assertEqual(self.checkpoint("changes").cursor, {})
+
+    def test_failed_movies_are_retried_on_the_next_run(self):
+        self.store(1, 2)
+        self.tmdb.changed = [1, 2]
+        self.tmdb.missing = {2}
+
+        _, err = self.sync()
+
+        self.assertIn("1 movies could not be fetched: [2]", err)
+        checkpoint = self.checkpoint("changes")
+        self.assertEqual(timezone.localtime(checkpoint.watermark).date(), self.today)
+        self.assertEqual(checkpoint.cursor, {"failed": {"2": 1}})
+
+        # TMDB recovers; movie 2 no longer shows up in the changes
+        self.tmdb.changed, self.tmdb.missing, self.tmdb.requested = [], set(), []
+        out, _ = self.sync()
+
+        self.assertIn("Retrying 1 movies", out)
+        self.assertEqual(self.tmdb.requested, [2])
+        self.assertEqual(self.titles()[2], "Movie 2")
+        self.assertEqual(self.checkpoint("changes").cursor, {})
+
+    def test_gives_up_after_max_attempts(self):
+        self.store(2)
+        self.tmdb.missing = {2}
+        SyncCheckpoint.objects.create(name="sync_movies:changes", cursor={"failed": {"2": MAX_FETCH_ATTEMPTS - 1}})
+
+        _, err = self.sync()
+
+        self.assertIn("Giving up on 1 movies", err)
+        self.assertEqual(self.checkpoint("changes").cursor, {})
+
+    def test_full_mode_resumes_after_last_tmdb_id(self):
+        self.store(1, 2, 3, 4, 5)
+        SyncCheckpoint.objects.create(name="sync_movies:full", cursor={"last_tmdb_id": 2})
+
+        out, _ = self.sync("--mode", "full", "--batch-size", "2")
+
+        self.assertIn("Refreshed 3 movies", out)
+        self.assertEqual(sorted(self.tmdb.requested), [3, 4, 5])
+        self.assertEqual(self.titles()[2], "Old title")
+        self.assertEqual(self.checkpoint("full").cursor, {})
+
+    def test_full_mode_keeps_failures_for_the_next_run(self):
+        self.store(1, 2, 3)
+        self.tmdb.missing = {2}
+
+        self.sync("--mode", "full")
+
+        self.assertEqual(self.checkpoint("full").cursor, {"failed": {"2": 1}})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TMDB_CACHE_TTLS={"trending": {"soft": 60, "hard": 600}})
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.swr = StaleWhileRevalidateCache()
+        self.cache = caches["default"]
+        self.threads = []
+        start_thread = threading.Thread.start
+
+        def recording_start(thread):
+            self.threads.append(thread)
+            start_thread(thread)
+
+        patcher = mock.patch.object(threading.Thread, "start", recording_start)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store_stale(self, key, value):
+        self.cache.set(self.swr.ENTRY_PREFIX + key, {"value": value, "soft_expires": time.time() - 1}, 600)
+
+    def test_miss_then_hit(self):
+        loader = mock.Mock(return_value=["fresh"])
+
+        self.assertEqual(self.swr.get_or_load("trending", "k", loader), ["fresh"])
+        self.assertEqual(self.swr.get_or_load("trending", "k", loader), ["fresh"])
+
+        loader.assert_called_once()
+        self.assertEqual(self.swr.stats()["trending"], {"hit": 1, "stale": 0, "miss": 1})
+
+    def test_value_under_the_bare_key_is_a_miss(self):
+        # what an older deploy left under the same key
+        self.cache.set("k", ["old", "list"])
+
+        self.assertEqual(self.swr.get_or_load("trending", "k", lambda: ["fresh"]), ["fresh"])
+        self.assertEqual(self.cache.get("k"), ["old", "list"])
+
+    def test_stale_value_served_and_refreshed_once(self):
+        self.store_stale("k", ["stale"])
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(5)
+            return ["fresh"]
+
+        self.assertEqual(self.swr.get_or_load("trending", "k", loader), ["stale"])
+        self.assertEqual(self.swr.get_or_load("trending", "k", loader), ["stale"])
+        release.set()
+        for thread in self.threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(self.threads), 1)
+        self.assertEqual(self.swr.get_or_load("trending", "k", loader), ["fresh"])
+        self.assertEqual(self.swr.stats()["trending"], {"hit": 1, "stale": 2, "miss": 0})
+
+    def test_failed_refresh_keeps_stale_value(self):
+        self.store_stale("k", ["stale"])
+
+        with self.assertLogs("movies.services.cache", "ERROR"):
+            self.swr.get_or_load("trending", "k", mock.Mock(side_effect=RuntimeError("TMDB down")))
+            self.threads[0].join(5)
+
+        self.assertEqual(self.swr.get_or_load("trending", "k", lambda: ["fresh"]), ["stale"])
+        self.assertEqual(len(self.threads), 2)  # the lock was released, so the next stale read retries
+
+    async def test_async_stale_value_served_and_refreshed_once(self):
+        self.store_stale("k", ["stale"])
+        loader = mock.AsyncMock(return_value=["fresh"])
+
+        self.assertEqual(await self.swr.aget_or_load("trending", "k", loader), ["stale"])
+        self.assertEqual(await self.swr.aget_or_load("trending", "k", loader), ["stale"])
+        await asyncio.gather(*self.swr._background_tasks)
+
+        loader.assert_awaited_once()
+        self.assertEqual(await self.swr.aget_or_load("trending", "k", loader), ["fresh"])
+
+
+class LocalTierTests(SimpleTestCase):
+    def test_set_from_before_an_eviction_is_dropped(self):
+        tier = LocalTier(max_entries=10, ttl=30)
+        generation = tier.generation  # a read from Redis starts...
+        tier.delete("k")  # ...an invalidation arrives...
+        tier.set("k", "old", generation=generation)  # ...and the read tries to store what it got
+
+        self.assertIs(tier.get("k"), _MISSING)
+        tier.set("k", "new", generation=tier.generation)
+        self.assertEqual(tier.get("k"), "new")
+
+    def test_least_recently_used_evicted(self):
+        tier = LocalTier(max_entries=2, ttl=30)
+        tier.set("a", 1)
+        tier.set("b", 2)
+        tier.get("a")
+        tier.set("c", 3)
+
+        self.assertEqual([tier.get("a"), tier.get("b"), tier.get("c")], [1, _MISSING, 3])
+
+
+@unittest.skipUnless(fakeredis, "needs fakeredis")
+class TwoTierRedisCacheTests(SimpleTestCase):
+    """Two backends sharing one fake Redis server stand in for two workers."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.first, self.second = self.backend(), self.backend()
+
+    def backend(self):
+        backend = TwoTierRedisCache("redis://fake:6379/0", {"OPTIONS": {
+            "SERIALIZER": "movies.cache_backends.ORJSONSerializer",
+            "CONNECTION_POOL_KWARGS": {"connection_class": fakeredis.FakeConnection, "server": self.server},
+            "LOCAL_CACHE": {"KEY_PREFIXES": ("hot:",), "TTL": 30},
+        }})
+        self.addCleanup(lambda: backend._subscriber and backend._subscriber.stop())
+        return backend
+
+    def local_value(self, backend, key):
+        return backend.local._entries.get(backend.make_key(key), (None, _MISSING))[1]
+
+    def wait_for_eviction(self, backend, key):
+        deadline = time.monotonic() + 5
+        while self.local_value(backend, key) is not _MISSING:
+            if time.monotonic() > deadline:
+                self.fail(f"{key} was never evicted")
+            time.sleep(0.01)
+
+    def test_only_prefixed_keys_kept_locally(self):
+        self.first.set("hot:a", [1])
+        self.first.set("cold:a", [1])
+
+        self.assertEqual(self.local_value(self.first, "hot:a"), [1])
+        self.assertIs(self.local_value(self.first, "cold:a"), _MISSING)
+
+    def test_write_evicts_other_workers_copy(self):
+        self.first.set("hot:a", [1])
+        self.assertEqual(self.second.get("hot:a"), [1])
+
+        self.first.set("hot:a", [2])
+        self.wait_for_eviction(self.second, "hot:a")
+        self.assertEqual(self.second.get("hot:a"), [2])
+
+        self.first.delete("hot:a")
+        self.wait_for_eviction(self.second, "hot:a")
+        self.assertIsNone(self.second.get("hot:a"))
+
+    def test_read_racing_an_invalidation_is_not_kept(self):
+        self.first.set("hot:a", [1])
+        self.assertTrue(self.second._local_ready())
+        fetch = RedisCache.get
+
+        def fetch_then_invalidated(backend, *args, **kwargs):
+            value = fetch(backend, *args, **kwargs)
+            # the write this read raced with is announced before the read stores its value
+            backend._on_invalidate({"data": f"other|{backend.make_key('hot:a')}".encode()})
+            return value
+
+        with mock.patch.object(RedisCache, "get", fetch_then_invalidated):
+            self.assertEqual(self.second.get("hot:a"), [1])
+
+        self.assertIs(self.local_value(self.second, "hot:a"), _MISSING)
+
+    def test_dead_subscriber_drops_local_entries(self):
+        self.first.set("hot:a", [1])
+        self.assertEqual(self.second.get("hot:a"), [1])
+        dead = self.second._subscriber
+        dead.stop()
+        dead.join(5)
+
+        # Nobody tells the second worker about this one
+        self.first.set("hot:a", [2])
+
+        with self.assertLogs("movies.cache_backends", "WARNING"):
+            self.assertEqual(self.second.get("hot:a"), [2])
+        self.assertIsNot(self.second._subscriber, dead)
+
+    def test_local_tier_skipped_while_subscriber_cannot_start(self):
+        self.second.set("hot:a", [1])
+        self.second._subscriber.stop()
+        self.second._subscriber.join(5)
+
+        with mock.patch.object(self.second.client, "get_client", side_effect=ConnectionError("down")), \
+                self.assertLogs("movies.cache_backends", "WARNING"):
+            self.assertFalse(self.second._local_ready())
+
+        self.assertEqual(self.second.local._entries, {})
+        self.assertEqual(self.second.get("hot:a"), [1])  # straight from Redis
+        self.assertEqual(self.second.local._entries, {})
+
+    def test_forked_worker_starts_over(self):
+        self.first.set("hot:a", [1])
+        parent = self.first._subscriber
+
+        with mock.patch("movies.cache_backends.os.getpid", return_value=os.getpid() + 1):
+            self.assertTrue(self.first._local_ready())
+            self.assertEqual(self.first.local._entries, {})
+            self.assertIsNot(self.first._subscriber, parent)
+        parent.stop()
+
+    def test_own_writes_not_evicted(self):
+        self.first.set("hot:a", [1])
+        self.first._on_invalidate({"data": f"{self.first._origin}|{self.first.make_key('hot:a')}".encode()})
+
+        self.assertEqual(self.local_value(self.first, "hot:a"), [1])
+
+
+def installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+class ORJSONSerializerTests(TestCase):
+    VALUES = [
+        None, 0, 1.5, "text", [1, "two", None], {"nested": {"list": [1, 2]}, "unicode": "caf\u00e9"},
+        [{"id": i, "title": f"Movie {i}", "genres": [18]} for i in range(200)],  # big enough to compress
+    ]
+    # Not plain JSON: these must be pickled, not turned into strings
+    PICKLED = [date(2020, 1, 1), {1, 2}, {"when": date(2020, 1, 1)}, {1: "int key"}]
+
+    def serializer(self, **options):
+        return ORJSONSerializer(options)
+
+    @contextmanager
+    def zlib_as_lz4(self):
+        # Stand-in codec, so the compression framing is tested without the package
+        with mock.patch.dict(cache_backends._CODECS, {cache_backends._LZ4: lambda: (zlib.compress, zlib.decompress)}):
+            yield
+
+    def assertRoundTrips(self, serializer, values):
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+
+    def test_round_trip(self):
+        serializer = self.serializer()
+        self.assertRoundTrips(serializer, self.VALUES + self.PICKLED)
+
+        self.assertEqual(serializer.dumps({"a": 1})[:2], b"j-")
+        self.assertEqual(serializer.dumps({1, 2})[:2], b"p-")
+
+    def test_json_types_come_back_as_json(self):
+        serializer = self.serializer()
+
+        self.assertEqual(serializer.loads(serializer.dumps((1, 2))), [1, 2])
+
+    def test_model_instances_pickled(self):
+        movie = Movie.objects.create(tmdb_id=550, title="Fight Club")
+        serializer = self.serializer()
+
+        self.assertEqual(serializer.loads(serializer.dumps(movie)), movie)
+        self.assertEqual(serializer.loads(serializer.dumps([movie]))[0].title, "Fight Club")
+
+    def test_reads_values_written_by_pickle_serializer(self):
+        old = PickleSerializer({})
+        serializer = self.serializer()
+
+        for value in self.VALUES + self.PICKLED:
+            with self.subTest(value=value):
+                self.assertEqual(serializer.loads(old.dumps(value)), value)
+
+    def test_compresses_large_values_only(self):
+        with self.zlib_as_lz4():
+            serializer = self.serializer(COMPRESSION="lz4", COMPRESS_MIN_BYTES=1024)
+            self.assertRoundTrips(serializer, self.VALUES + self.PICKLED)
+
+            self.assertEqual(serializer.dumps({"a": 1})[:2], b"j-")
+            big = serializer.dumps(self.VALUES[-1])
+            self.assertEqual(big[:2], b"jl")
+            self.assertLess(len(big), len(self.serializer().dumps(self.VALUES[-1])))
+
+    def test_reads_values_compressed_under_another_setting(self):
+        with self.zlib_as_lz4():
+            stored = self.serializer(COMPRESSION="lz4", COMPRESS_MIN_BYTES=0).dumps({"a": 1})
+            self.assertEqual(self.serializer().loads(stored), {"a": 1})
+
+    def test_unknown_codec(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, "COMPRESSION must be one of"):
+            self.serializer(COMPRESSION="gzip")
+
+    def test_codec_package_missing(self):
+        def missing():
+            raise ImportError("No module named 'lz4'", name="lz4")
+
+        with mock.patch.dict(cache_backends._CODECS, {cache_backends._LZ4: missing}), \
+                self.assertRaisesRegex(ImproperlyConfigured, "needs the lz4 package"):
+            self.serializer(COMPRESSION="lz4")
+
+    @unittest.skipUnless(installed("lz4"), "lz4 not installed")
+    def test_lz4(self):
+        serializer = self.serializer(COMPRESSION="lz4", COMPRESS_MIN_BYTES=0)
+        self.assertRoundTrips(serializer, self.VALUES + self.PICKLED)
+        self.assertEqual(serializer.dumps([1])[1:2], b"l")
+
+    @unittest.skipUnless(installed("zstandard"), "zstandard not installed")
+    def test_zstd(self):
+        serializer = self.serializer(COMPRESSION="zstd", COMPRESS_MIN_BYTES=0)
+        self.assertRoundTrips(serializer, self.VALUES + self.PICKLED)
+        self.assertEqual(serializer.dumps([1])[1:2], b"z")
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_renders_like_json_renderer(self):
+        data = {
+            "added_at": datetime(2026, 10, 17, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "naive": datetime(2026, 10, 17, 9, 30),
+            "release_date": date(1999, 10, 15),
+            "starts": dt_time(20, 15, 0, 500000),
+            "price": Decimal("9.99"),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "nested": [{"title": "Am\u00e9lie", 1: None}],
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'"2026-10-17T09:30:15.123456Z"', ORJSONRenderer().render(data))
+
+
+class ORJSONParserTests(APITestCase):
+    def parse(self, body, encoding="utf-8"):
+        return ORJSONParser().parse(io.BytesIO(body), "application/json", {"encoding": encoding})
+
+    def test_parses_like_json_parser(self):
+        body = '{"tmdb_ids": [1, 2], "title": "Am\u00e9lie", "nested": {"ok": true, "none": null}}'.encode()
+
+        self.assertEqual(self.parse(body), json.loads(body))
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            self.parse(b'{"tmdb_ids": [1, 2')
+
+    def test_other_encodings_use_drf_parser(self):
+        body = '{"title": "Am\u00e9lie"}'.encode("latin-1")
+
+        self.assertEqual(self.parse(body, encoding="latin-1"), {"title": "Am\u00e9lie"})
+
+    def test_request_bodies_go_through_it(self):
+        user = User.objects.create_user(username="parser", email="parser@example.com", password="secret123")
+        self.client.force_authenticate(user)
+
+        response = self.client.post("/api/movies/favorites/batch/remove/", b'{"tmdb_ids": [1', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class FastSerializationTests(TestCase):
+    """The read-only fast path must render exactly like the DRF serializers."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="fast", email="fast@example.com", password="secret123")
+        self.movie = Movie.objects.create(
+            tmdb_id=550, title="Fight Club", overview="Mischief", release_date=date(1999, 10, 15), genres=[18, 53]
+        )
+        Movie.objects.create(tmdb_id=551, title="Unreleased", poster_url=None, release_date=None)
+        FavoriteMovie.objects.create(user=user, movie=self.movie)
+
+    def assertRendersLike(self, fast, expected):
+        render = ORJSONRenderer().render
+        self.assertEqual(render(fast), render(expected))
+
+    def test_movies_from_instances_and_rows(self):
+        for movie in Movie.objects.all():
+            expected = MovieSerializer(movie).data
+            self.assertRendersLike(serialize_movie(movie), expected)
+            self.assertRendersLike(serialize_movie(Movie.objects.values(*MOVIE_FIELDS).get(pk=movie.pk)), expected)
+
+    def test_internal_fields_not_serialized(self):
+        for data in (MovieSerializer(self.movie).data, serialize_movie(self.movie)):
+            self.assertFalse({"search_vector", "popularity", "genre_mask"} & set(data))
+
+    def test_favorites_from_instances_and_rows(self):
+        favorite = FavoriteMovie.objects.select_related("movie").get()
+        expected = FavoriteMovieSerializer(favorite).data
+
+        self.assertRendersLike(serialize_favorite(favorite), expected)
+        self.assertRendersLike(serialize_favorite(FavoriteMovie.objects.values(*FAVORITE_VALUES).get()), expected)
+
+
+class RecommenderTests(TestCase):
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.user = User.objects.create_user(username="fan", email="fan@example.com", password="secret123")
+        # (genres, language, popularity)
+        specs = {
+            "action": ([28], "en", 10), "action_fr": ([28], "fr", 10), "action_thriller": ([28, 53], "en", 5),
+            "comedy": ([35], "en", 50), "drama": ([18], "en", 900), "horror": ([27], "ja", 1),
+        }
+        self.movies = {
+            name: Movie.objects.create(tmdb_id=i, title=name, genres=genres, language=language, popularity=popularity)
+            for i, (name, (genres, language, popularity)) in enumerate(specs.items(), 1)
+        }
+
+    def recommend(self, **profile):
+        ids = recommend(Snapshot(*load_columns()), **profile)
+        names = {movie.id: name for name, movie in self.movies.items()}
+        return [names[movie_id] for movie_id in ids]
+
+    def test_cold_start_is_most_popular_first(self):
+        self.assertEqual(self.recommend(limit=2), ["drama", "comedy"])
+
+    def test_preferred_genres_come_first(self):
+        ranked = self.recommend(preferred_genres=[28], preferred_languages=["en"])
+        self.assertEqual(ranked[0], "action")
+        self.assertEqual(set(ranked[1:3]), {"action_thriller", "action_fr"})
+
+    def test_favorites_shape_the_profile_and_are_left_out(self):
+        ranked = self.recommend(favorite_ids=[self.movies["action_thriller"].id])
+
+        self.assertNotIn("action_thriller", ranked)
+        self.assertEqual(ranked[0], "action")  # same genre and language as the favorite
+
+    def test_limit_larger_than_catalog(self):
+        ranked = self.recommend(favorite_ids=[self.movies["drama"].id], limit=50)
+        self.assertEqual(len(ranked), 5)
+
+    def test_empty_catalog(self):
+        Movie.objects.all().delete()
+        self.assertEqual(self.recommend(preferred_genres=[28]), [])
+
+
+class FeatureStoreTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "features.bin")
+        Movie.objects.create(
+            tmdb_id=1, title="A", genres=[28, 53], language="en", release_date=date(1999, 1, 1), popularity=20
+        )
+        Movie.objects.create(tmdb_id=2, title="B", genres=[99999], language="fr", popularity=0)
+
+    def test_round_trip(self):
+        write_snapshot(self.path, *load_columns())
+
+        snapshot = open_snapshot(self.path)
+        self.assertEqual(snapshot.ids.tolist(), sorted(Movie.objects.values_list("id", flat=True)))
+        self.assertEqual(snapshot.genre_masks.tolist(), [1 << 0 | 1 << 16, 0])  # Action + Thriller; unknown genre
+        self.assertEqual(snapshot.languages, {"en": 0, "fr": 1})
+        self.assertEqual(snapshot.language_codes.tolist(), [0, 1])
+        self.assertEqual(snapshot.release_years.tolist(), [1999, 0])
+        self.assertEqual(snapshot.popularity.tolist(), [1.0, 0.0])
+        self.assertFalse(snapshot.ids.flags.writeable)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as other:
+            other.write(b"not a snapshot" * 10)
+
+        with self.assertRaises(SnapshotError):
+            open_snapshot(self.path)
+
+    def test_rejects_unreadable_metadata(self):
+        write_snapshot(self.path, *load_columns())
+        with open(self.path, "rb") as snapshot:
+            header = HEADER.unpack_from(snapshot.read(HEADER.size))
+
+        for metadata, length in [
+            (b"{not json", None),
+            (b'{"languages": []}', None),
+            (b'{"columns": {"ids": "<i8"}, "languages": []}', None),
+            (b"{}", 10 ** 9),  # length past the end of the file
+        ]:
+            with open(self.path, "wb") as snapshot:
+                snapshot.write(HEADER.pack(*header[:4], length or len(metadata)) + metadata + b"\0" * 64)
+            with self.subTest(metadata=metadata), self.assertRaises(SnapshotError):
+                open_snapshot(self.path)
+
+    def test_corrupt_snapshot_falls_back_to_database(self):
+        with open(self.path, "wb") as snapshot:
+            snapshot.write(HEADER.pack(b"MVFS", 1, 2, 0.0, 9) + b"{not json")
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+
+        with override_settings(RECOMMENDER={**settings.RECOMMENDER, "feature_store": self.path}), \
+                self.assertLogs("movies.services.recommender", "WARNING"):
+            catalog = catalog_cache.get()
+
+        self.assertEqual(len(catalog), 2)
+
+    def test_reader_switches_to_a_new_snapshot(self):
+        write_snapshot(self.path, *load_columns())
+        reader = SnapshotReader(self.path, check_interval=0)
+        old = reader.get()
+
+        Movie.objects.create(tmdb_id=3, title="C")
+        write_snapshot(self.path, *load_columns())
+
+        self.assertEqual(len(reader.get()), 3)
+        self.assertEqual(len(old), 2)  # still readable after being replaced
+
+    def test_recommendations_match_database_catalog(self):
+        write_snapshot(self.path, *load_columns())
+        profile = {"preferred_genres": [53], "preferred_languages": ["fr"]}
+
+        self.assertEqual(recommend(open_snapshot(self.path), **profile), recommend(Snapshot(*load_columns()), **profile))
+
+
+class CofavoriteSimilarityTests(TestCase):
+    def setUp(self):
+        self.movies = {tmdb_id: Movie.objects.create(tmdb_id=tmdb_id, title=f"Movie {tmdb_id}") for tmdb_id in range(1, 6)}
+        # Movies 1 and 2 share three fans, 1 and 3 two, 4 and 5 only one
+        fans = {"a": [1, 2, 3], "b": [1, 2, 3], "c": [1, 2], "d": [2], "e": [4, 5]}
+        for name, tmdb_ids in fans.items():
+            user = User.objects.create_user(username=name, email=f"{name}@example.com", password="secret123")
+            for tmdb_id in tmdb_ids:
+                FavoriteMovie.objects.create(user=user, movie=self.movies[tmdb_id])
+
+    def neighbours(self, tmdb_id):
+        rows = MovieSimilarity.objects.filter(movie__tmdb_id=tmdb_id).order_by("-score")
+        return [(row.similar.tmdb_id, round(row.score, 3)) for row in rows]
+
+    def test_cosine_over_fans(self):
+        build_cofavorite_similarities(top_n=10, min_common=2)
+
+        # 3 common fans / sqrt(3 fans * 4 fans)
+        self.assertEqual(self.neighbours(1), [(2, 0.866), (3, 0.816)])
+        self.assertEqual(self.neighbours(3), [(1, 0.816), (2, 0.707)])
+        self.assertEqual(self.neighbours(4), [])
+
+    def test_top_n_and_rebuild_replace_old_rows(self):
+        build_cofavorite_similarities(top_n=10, min_common=1)
+        self.assertEqual(self.neighbours(4), [(5, 1.0)])
+
+        build_cofavorite_similarities(top_n=1, min_common=2)
+        self.assertEqual(self.neighbours(1), [(2, 0.866)])
+        self.assertEqual(self.neighbours(4), [])
+
+    def test_chunking_does_not_change_results(self):
+        _, matrix = favorites_matrix()
+        whole = [(row, list(columns), list(scores)) for row, columns, scores in top_neighbours(matrix, 3, 1)]
+        chunked = [(row, list(columns), list(scores)) for row, columns, scores in top_neighbours(matrix, 3, 1, chunk_size=2)]
+        self.assertEqual(whole, chunked)
+
+
+class ContentSimilarityTests(TestCase):
+    OVERVIEWS = {
+        "Space One": "Astronauts aboard a failing space station fight to return home to earth.",
+        "Space Two": "A crew of astronauts stranded on a space station must find a way home to earth.",
+        "Heist": "A gang of thieves plans the biggest bank robbery in the history of the city.",
+        "Heist Again": "The thieves return for one last bank robbery, bigger than the first.",
+        "Cooking": "A young chef opens a small restaurant in Paris.",
+    }
+
+    def setUp(self):
+        self.movies = {
+            title: Movie.objects.create(tmdb_id=i, title=title, overview=overview)
+            for i, (title, overview) in enumerate(self.OVERVIEWS.items(), 1)
+        }
+
+    def neighbours(self, title):
+        rows = MovieSimilarity.objects.filter(movie=self.movies[title], kind=MovieSimilarity.CONTENT)
+        return [row.similar.title for row in rows.order_by("-score")]
+
+    def test_tokens_drop_stop_words_and_add_bigrams(self):
+        self.assertEqual(tokens("The Return of the Jedi, 1983"), ["return", "jedi", "return jedi"])
+
+    def test_similar_overviews_are_neighbours(self):
+        build_content_similarities(top_n=1)
+
+        self.assertEqual(self.neighbours("Space One"), ["Space Two"])
+        self.assertEqual(self.neighbours("Heist"), ["Heist Again"])
+        self.assertFalse(MovieSimilarity.objects.filter(kind=MovieSimilarity.COFAVORITE).exists())
+
+    def test_neighbours_match_brute_force(self):
+        counts = hashed_counts(list(self.OVERVIEWS.values()), 2 ** 12)
+        vectors = tfidf(counts)
+        exact = (vectors @ vectors.T).toarray()
+
+        for row, columns, scores in nearest_neighbours(vectors, document_frequency(counts), top_n=2):
+            self.assertNotIn(row, columns)
+            np.testing.assert_allclose(scores, exact[row, columns], rtol=1e-5)
+            self.assertTrue(all(scores[:-1] >= scores[1:]))
+
+
+class BudgetAssertions:
+    """
+    Query and cache-call budgets. A budget is a ceiling: going over it fails
+    with the offending queries / cache calls listed.
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield
+        if len(context) > budget:
+            queries = "\n".join(f"  {i}. {query['sql']}" for i, query in enumerate(context.captured_queries, 1))
+            self.fail(f"{len(context)} queries executed, budget is {budget}:\n{queries}")
+
+    @contextmanager
+    def assertMaxCacheCalls(self, budget):
+        backend = caches["default"]
+        calls = []
+        depth = [0]
+
+        def counting(name, method):
+            def wrapper(*args, **kwargs):
+                # get_many -> get and friends count once
+                if depth[0] == 0:
+                    calls.append(f"{name}{args[:1]}")
+                depth[0] += 1
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    depth[0] -= 1
+            return wrapper
+
+        patches = [
+            mock.patch.object(backend, name, counting(name, getattr(backend, name))) for name in CACHE_METHODS
+        ]
+        for patch in patches:
+            patch.start()
+        try:
+            yield
+        finally:
+            for patch in patches:
+                patch.stop()
+
+        if len(calls) > budget:
+            listed = "\n".join(f"  {i}. {call}" for i, call in enumerate(calls, 1))
+            self.fail(f"{len(calls)} cache calls made, budget is {budget}:\n{listed}")
+
+    @contextmanager
+    def assertBudget(self, queries, cache_calls):
+        with self.assertMaxQueries(queries), self.assertMaxCacheCalls(cache_calls):
+            yield
+
+
+requires_postgres = unittest.skipUnless(
+    connection.vendor == "postgresql", "full-text and trigram search need PostgreSQL"
+)
+
+
+class FavoritesPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pages", email="pages@example.com", password="secret123")
+        self.client.force_authenticate(self.user)
+        movies = [Movie.objects.create(tmdb_id=i, title=f"Movie {i}") for i in range(1, 8)]
+        self.favorites = [FavoriteMovie.objects.create(user=self.user, movie=movie) for movie in movies]
+        # Ties on added_at must be broken by id, not skipped or repeated
+        FavoriteMovie.objects.filter(id__in=[f.id for f in self.favorites[2:5]]).update(
+            added_at=self.favorites[2].added_at
+        )
+
+    def test_pages_cover_every_favorite_once_newest_first(self):
+        seen, url = [], "/api/movies/favorites/?limit=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [favorite["id"] for favorite in response.data["results"]]
+            url = response.data["next"]
+
+        expected = FavoriteMovie.objects.order_by("-added_at", "-id").values_list("id", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_last_page_has_no_next(self):
+        response = self.client.get("/api/movies/favorites/", {"limit": 7})
+
+        self.assertEqual(len(response.data["results"]), 7)
+        self.assertIsNone(response.data["next"])
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_next_keeps_other_parameters(self):
+        response = self.client.get("/api/movies/favorites/", {"limit": 2, "fields": "title"})
+
+        self.assertIn("fields=title", response.data["next"])
+        self.assertIn("limit=2", response.data["next"])
+
+    def test_fields_projection(self):
+        response = self.client.get("/api/movies/favorites/", {"fields": "tmdb_id, title"})
+
+        newest = self.favorites[-1]
+        self.assertEqual(response.data["results"][0]["movie"], {"tmdb_id": newest.movie.tmdb_id, "title": newest.movie.title})
+        self.assertEqual(set(response.data["results"][0]), {"id", "movie", "added_at"})
+
+    def test_unknown_field(self):
+        response = self.client.get("/api/movies/favorites/", {"fields": "title,search_vector"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("search_vector", response.data["error"])
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-a-cursor", "bm90fGE"):
+            response = self.client.get("/api/movies/favorites/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_invalid_limit(self):
+        response = self.client.get("/api/movies/favorites/", {"limit": "many"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class DiscoverTests(APITestCase):
+    # title: (genres, language, release_date, popularity)
+    MOVIES = {
+        "Heat": ([28, 80, 18], "en", date(1995, 12, 15), 30.0),
+        "Alien": ([27, 878], "en", date(1979, 5, 25), 40.0),
+        "Amelie": ([35, 10749], "fr", date(2001, 4, 25), 20.0),
+        "Leon": ([80, 18, 28], "fr", date(1994, 9, 14), 30.0),
+        "Ran": ([18, 10752], "ja", None, 10.0),
+    }
+
+    def setUp(self):
+        user = User.objects.create_user(username="discover", email="discover@example.com", password="secret123")
+        self.client.force_authenticate(user)
+        for i, (title, (genres, language, release_date, popularity)) in enumerate(self.MOVIES.items(), 1):
+            Movie.objects.create(
+                tmdb_id=i, title=title, genres=genres, language=language,
+                release_date=release_date, popularity=popularity,
+            )
+
+    def titles(self, **params):
+        response = self.client.get("/api/movies/discover/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [movie["title"] for movie in response.data["results"]]
+
+    def test_genre_mask_follows_genres(self):
+        movie = Movie.objects.get(title="Ran")
+        movie.genres = [28]
+        movie.save(update_fields=["genres"])
+        self.assertEqual(Movie.objects.get(title="Ran").genre_mask, 1)
+
+        [synced] = sync_movies_from_tmdb([{"id": 5, "title": "Ran", "genre_ids": [12, 99999]}])
+        self.assertEqual(Movie.objects.get(pk=synced.pk).genre_mask, 2)
+
+    def test_genres_any_and_all(self):
+        self.assertEqual(set(self.titles(genres="27,35")), {"Alien", "Amelie"})
+        self.assertEqual(set(self.titles(genres="28,80", genres_match="all")), {"Heat", "Leon"})
+        self.assertEqual(self.titles(genres="27,35", genres_match="all"), [])
+
+    def test_language_and_release_dates(self):
+        self.assertEqual(self.titles(language="fr"), ["Leon", "Amelie"])
+        # Equally popular: the later stored one first
+        self.assertEqual(self.titles(release_date_gte="1990-01-01", release_date_lte="1999-12-31"), ["Leon", "Heat"])
+
+    def test_release_date_ordering_skips_undated(self):
+        self.assertEqual(self.titles(ordering="release_date"), ["Alien", "Leon", "Heat", "Amelie"])
+        self.assertEqual(self.titles(ordering="-release_date", genres="18"), ["Heat", "Leon"])
+
+    def test_pages_cover_every_movie_once(self):
+        for ordering in ("-popularity", "release_date"):
+            seen, url = [], f"/api/movies/discover/?limit=2&ordering={ordering}"
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                seen += [movie["title"] for movie in response.data["results"]]
+                url = response.data["next"]
+
+            self.assertEqual(seen, self.titles(ordering=ordering, limit=10))
+
+    def test_cursor_is_tied_to_ordering(self):
+        cursor = self.client.get("/api/movies/discover/", {"limit": 1}).data["next_cursor"]
+
+        response = self.client.get("/api/movies/discover/", {"cursor": cursor, "ordering": "release_date"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"genres": "action"}, {"genres": "12345"}, {"genres_match": "some", "genres": "28"},
+            {"release_date_gte": "1995-13-01"}, {"ordering": "title"}, {"limit": "many"}, {"cursor": "nope"},
+        ):
+            response = self.client.get("/api/movies/discover/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_genre_mask_not_serialized(self):
+        response = self.client.get("/api/movies/discover/")
+
+        self.assertNotIn("genre_mask", response.data["results"][0])
+
+
+# Every movies route, with a stubbed TMDB. Budgets are per request;
+# authentication is forced so they only cover the view's own work.
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieEndpointBudgetTests(BudgetAssertions, APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user(username="budget", email="budget@example.com", password="secret123")
+        self.client.force_authenticate(self.user)
+
+        self.tmdb = StubTMDBSession(missing={404}, no_recommendations={1893})
+        patcher = mock.patch.object(views.tmdb, "session", self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store(self, *tmdb_ids):
+        return [
+            Movie.objects.create(tmdb_id=tmdb_id, title=f"Movie {tmdb_id}", genres=[18]) for tmdb_id in tmdb_ids
+        ]
+
+    # ---- trending ----
+
+    def test_trending_cold(self):
+        with self.assertBudget(queries=1, cache_calls=9):
+            response = self.client.get("/api/movies/trending/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(self.tmdb.requested, ["/trending/movie/week"])
+
+    def test_trending_warm(self):
+        self.client.get("/api/movies/trending/")
+
+        with self.assertBudget(queries=0, cache_calls=1):
+            response = self.client.get("/api/movies/trending/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.tmdb.requested), 1)
+
+    # ---- details ----
+
+    def test_details_stored_movie(self):
+        self.store(550)
+
+        with self.assertBudget(queries=1, cache_calls=2):
+            response = self.client.get("/api/movies/550/")
+
+        self.assertEqual(response.data["title"], "Movie 550")
+        self.assertEqual(self.tmdb.requested, [])
+
+    def test_details_from_tmdb(self):
+        with self.assertBudget(queries=2, cache_calls=8):
+            response = self.client.get("/api/movies/551/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.tmdb.requested, ["/movie/551"])
+
+    def test_details_warm(self):
+        self.client.get("/api/movies/551/")
+
+        with self.assertBudget(queries=0, cache_calls=1):
+            response = self.client.get("/api/movies/551/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_details_not_found_is_cached(self):
+        self.client.get("/api/movies/404/")
+
+        with self.assertBudget(queries=1, cache_calls=4):
+            response = self.client.get("/api/movies/404/")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.tmdb.requested, ["/movie/404"])
+
+    # ---- recommendations ----
+
+    def test_recommendations_cold(self):
+        with self.assertBudget(queries=1, cache_calls=9):
+            response = self.client.get("/api/movies/550/recommended/")
+
+        self.assertEqual(len(response.data), 4)
+
+    def test_recommendations_warm(self):
+        self.client.get("/api/movies/550/recommended/")
+
+        with self.assertBudget(queries=0, cache_calls=1):
+            self.client.get("/api/movies/550/recommended/")
+
+        self.assertEqual(len(self.tmdb.requested), 1)
+
+    def test_recommendations_fall_back_to_similar_content(self):
+        movie, similar = self.store(1893, 1894)
+        MovieSimilarity.objects.create(movie=movie, similar=similar, kind=MovieSimilarity.CONTENT, score=0.4)
+
+        with self.assertBudget(queries=1, cache_calls=9):
+            response = self.client.get("/api/movies/1893/recommended/")
+
+        self.assertEqual([movie["tmdb_id"] for movie in response.data], [1894])
+
+    @override_settings(RECOMMENDATIONS_MODE="local")
+    def test_recommendations_local_mode(self):
+        movie, similar = self.store(550, 551)
+        MovieSimilarity.objects.create(movie=movie, similar=similar, kind=MovieSimilarity.CONTENT, score=0.4)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/550/recommended/")
+
+        self.assertEqual([movie["tmdb_id"] for movie in response.data], [551])
+        self.assertEqual(self.tmdb.requested, [])
+
+    # ---- search ----
+
+    @requires_postgres
+    def test_search_answered_locally(self):
+        Movie.objects.bulk_create(
+            Movie(tmdb_id=i, title=f"Matrix {i}", overview="Neo") for i in range(1, 8)
+        )
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/search/", {"query": "matrix"})
+
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(self.tmdb.requested, [])
+
+    @requires_postgres
+    def test_search_falls_back_to_tmdb(self):
+        with self.assertBudget(queries=2, cache_calls=9):
+            response = self.client.get("/api/movies/search/", {"query": "matrix"})
+
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(self.tmdb.requested, ["/search/movie"])
+
+    @requires_postgres
+    def test_autocomplete_cold_and_warm(self):
+        self.store(1)
+
+        with self.assertBudget(queries=1, cache_calls=2):
+            self.client.get("/api/movies/autocomplete/", {"q": "movie"})
+        with self.assertBudget(queries=0, cache_calls=1):
+            self.client.get("/api/movies/autocomplete/", {"q": "movie"})
+
+    def test_autocomplete_short_query_does_no_work(self):
+        with self.assertBudget(queries=0, cache_calls=0):
+            response = self.client.get("/api/movies/autocomplete/", {"q": "ab"})
+
+        self.assertEqual(response.data, [])
+
+    # ---- favorites ----
+
+    def test_add_stored_movie_to_favorites(self):
+        movie, = self.store(550)
+
+        with self.assertBudget(queries=5, cache_calls=0):
+            response = self.client.post(f"/api/movies/{movie.id}/favorite/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(FavoriteMovie.objects.filter(user=self.user, movie=movie).exists())
+
+    def test_add_favorite_fetches_unknown_movie(self):
+        with self.assertBudget(queries=6, cache_calls=6):
+            response = self.client.post("/api/movies/999999/favorite/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.tmdb.requested, ["/movie/999999"])
+
+    def test_add_existing_favorite(self):
+        movie, = self.store(550)
+        FavoriteMovie.objects.create(user=self.user, movie=movie)
+
+        with self.assertBudget(queries=2, cache_calls=0):
+            response = self.client.post(f"/api/movies/{movie.id}/favorite/")
+
+        self.assertEqual(response.data, {"message": "Already in favorites"})
+
+    def test_list_favorites_query_count_does_not_grow(self):
+        for movie in self.store(*range(1, 21)):
+            FavoriteMovie.objects.create(user=self.user, movie=movie)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/favorites/")
+
+        self.assertEqual(len(response.data["results"]), 20)
+
+    def test_list_favorites_later_page(self):
+        for movie in self.store(*range(1, 21)):
+            FavoriteMovie.objects.create(user=self.user, movie=movie)
+        first = self.client.get("/api/movies/favorites/", {"limit": 5})
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/favorites/", {"limit": 5, "cursor": first.data["next_cursor"]})
+
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_remove_favorite(self):
+        movie, = self.store(550)
+        FavoriteMovie.objects.create(user=self.user, movie=movie)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.delete(f"/api/movies/favorites/{movie.id}/remove/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_favorites_batch(self):
+        stored, = self.store(550)
+        FavoriteMovie.objects.create(user=self.user, movie=stored)
+
+        # TMDB is called from worker threads, whose cache connections aren't counted
+        with self.assertMaxQueries(3):
+            response = self.client.post(
+                "/api/movies/favorites/batch/", {"tmdb_ids": [550, 680, 404, 680]}, format="json"
+            )
+
+        self.assertEqual(response.data, {"favorited": [550, 680], "failed": [404]})
+        self.assertEqual(sorted(self.tmdb.requested), ["/movie/404", "/movie/680"])
+        self.assertEqual(
+            set(FavoriteMovie.objects.filter(user=self.user).values_list("movie__tmdb_id", flat=True)), {550, 680}
+        )
+
+    def test_add_favorites_batch_stored_movies(self):
+        self.store(550, 680, 13)
+
+        with self.assertBudget(queries=2, cache_calls=0):
+            response = self.client.post("/api/movies/favorites/batch/", {"tmdb_ids": [550, 680, 13]}, format="json")
+
+        self.assertEqual(response.data["favorited"], [550, 680, 13])
+        self.assertEqual(self.tmdb.requested, [])
+
+    def test_add_favorites_batch_rejects_bad_ids(self):
+        for body in ({}, {"tmdb_ids": []}, {"tmdb_ids": [1, "x"]}, {"tmdb_ids": [True]}, {"tmdb_ids": list(range(101))}):
+            response = self.client.post("/api/movies/favorites/batch/", body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_remove_favorites_batch(self):
+        for movie in self.store(550, 680, 13):
+            FavoriteMovie.objects.create(user=self.user, movie=movie)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.post("/api/movies/favorites/batch/remove/", {"tmdb_ids": [550, 13, 1]}, format="json")
+
+        self.assertEqual(response.data, {"removed": 2})
+        self.assertEqual(list(FavoriteMovie.objects.values_list("movie__tmdb_id", flat=True)), [680])
+
+    def test_check_favorites(self):
+        movies = self.store(*range(1, 21))
+        for movie in movies[::2]:
+            FavoriteMovie.objects.create(user=self.user, movie=movie)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/favorites/check/", {"tmdb_ids": ",".join(map(str, range(1, 21)))})
+
+        self.assertEqual(response.data, {tmdb_id: tmdb_id % 2 == 1 for tmdb_id in range(1, 21)})
+
+    def test_also_favorited(self):
+        movies = self.store(550, 680, 13)
+        for movie, score in zip(movies[1:], (0.9, 0.5)):
+            MovieSimilarity.objects.create(movie=movies[0], similar=movie, kind=MovieSimilarity.COFAVORITE, score=score)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/550/also-favorited/")
+
+        self.assertEqual([movie["tmdb_id"] for movie in response.data], [680, 13])
+        self.assertEqual(self.tmdb.requested, [])
+
+    # ---- for you ----
+
+    def test_for_you_cold(self):
+        self.store(*range(1, 31))
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+
+        with self.assertBudget(queries=4, cache_calls=0):
+            response = self.client.get("/api/movies/for-you/", {"limit": 10})
+
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(self.tmdb.requested, [])
+
+    def test_for_you_warm(self):
+        self.store(*range(1, 31))
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client.get("/api/movies/for-you/")
+
+        with self.assertBudget(queries=3, cache_calls=0):
+            response = self.client.get("/api/movies/for-you/")
+
+        self.assertEqual(len(response.data), 20)
+
+    # ---- discover ----
+
+    def test_discover(self):
+        self.store(*range(1, 31))
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/movies/discover/", {"genres": "18,28", "language": "en", "limit": 10})
+
+        self.assertEqual(len(response.data["results"]), 10)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(self.tmdb.requested, [])
+
+    # ---- admin ----
+
+    def test_cache_stats(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        with self.assertBudget(queries=0, cache_calls=0):
+            response = self.client.get("/api/movies/cache/stats/")
+
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ASYNC_MOVIE_VIEWS=True)
+class AsyncMovieEndpointTests(BudgetAssertions, TestCase):
+    """The async_views versions of the TMDB-backed endpoints, same budgets as the sync ones."""
+
+    @classmethod
+    def setUpClass(cls):
+        # movies/urls.py picks the views at import time. Class cleanups run last in,
+        # first out, so registering this first reloads after the settings are restored.
+        cls.addClassCleanup(cls.reload_urls)
+        super().setUpClass()
+        cls.reload_urls()
+
+    @staticmethod
+    def reload_urls():
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def setUp(self):
+        caches["default"].clear()
+        user = User.objects.create_user(username="async", email="async@example.com", password="secret123")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+        self.tmdb = StubTMDBSession(missing={404}, no_recommendations={1893})
+        patcher = async_tmdb_transport(self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertBudget(self, queries, cache_calls):
+        # These requests carry a real JWT (no force_authenticate), which costs the user lookup
+        return super().assertBudget(queries + 1, cache_calls)
+
+    def get(self, path, data=None):
+        # Sync on the outside, so the budgets count queries on this thread's connection
+        return async_to_sync(self.async_client.get)(path, data, headers=self.headers)
+
+    def store(self, *tmdb_ids):
+        return [
+            Movie.objects.create(tmdb_id=tmdb_id, title=f"Movie {tmdb_id}", genres=[18]) for tmdb_id in tmdb_ids
+        ]
+
+    def test_routed_to_async_views(self):
+        self.assertIs(urls.movie_views, async_views)
+
+    def test_trending(self):
+        with self.assertBudget(queries=1, cache_calls=9):
+            response = self.get("/api/movies/trending/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(self.tmdb.requested, ["/trending/movie/week"])
+
+        with self.assertBudget(queries=0, cache_calls=1):
+            self.get("/api/movies/trending/")
+
+        self.assertEqual(len(self.tmdb.requested), 1)
+
+    def test_details_stored_movie(self):
+        self.store(550)
+
+        with self.assertBudget(queries=1, cache_calls=2):
+            response = self.get("/api/movies/550/")
+
+        self.assertEqual(response.json()["title"], "Movie 550")
+        self.assertEqual(self.tmdb.requested, [])
+
+    def test_details_from_tmdb(self):
+        with self.assertBudget(queries=2, cache_calls=8):
+            response = self.get("/api/movies/551/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tmdb_id"], 551)
+        self.assertTrue(Movie.objects.filter(tmdb_id=551).exists())
+        self.assertEqual(self.tmdb.requested, ["/movie/551"])
+
+    def test_details_not_found_is_cached(self):
+        self.assertEqual(self.get("/api/movies/404/").status_code, 404)
+
+        with self.assertBudget(queries=1, cache_calls=4):
+            response = self.get("/api/movies/404/")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.tmdb.requested, ["/movie/404"])
+
+    def test_recommendations_fall_back_to_similar_content(self):
+        movie, similar = self.store(1893, 1894)
+        MovieSimilarity.objects.create(movie=movie, similar=similar, kind=MovieSimilarity.CONTENT, score=0.4)
+
+        with self.assertBudget(queries=1, cache_calls=9):
+            response = self.get("/api/movies/1893/recommended/")
+
+        self.assertEqual([movie["tmdb_id"] for movie in response.json()], [1894])
+        self.assertEqual(self.tmdb.requested, ["/movie/1893/recommendations"])
+
+    @requires_postgres
+    def test_search_answered_locally(self):
+        Movie.objects.bulk_create(
+            Movie(tmdb_id=i, title=f"Matrix {i}", overview="Neo") for i in range(1, 8)
+        )
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.get("/api/movies/search/", {"query": "matrix"})
+
+        self.assertEqual(len(response.json()), 7)
+        self.assertEqual(self.tmdb.requested, [])
+
+    @requires_postgres
+    def test_search_falls_back_to_tmdb(self):
+        with self.assertBudget(queries=2, cache_calls=9):
+            response = self.get("/api/movies/search/", {"query": "matrix"})
+
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(self.tmdb.requested, ["/search/movie"])
+
+
+def profiled_caches(server):
+    """django_redis on a fake Redis server, through the profiling client class."""
+    return {"default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://fake:6379/0",
+        "OPTIONS": {
+            "CLIENT_CLASS": "movies.profiling.ProfiledRedisClient",
+            "SERIALIZER": "movies.cache_backends.ORJSONSerializer",
+            "CONNECTION_POOL_KWARGS": {"connection_class": fakeredis.FakeConnection, "server": server},
+        },
+    }}
+
+
+PROFILING_ON = {"enabled": True, "slow_ms": None, "sample_rate": 1.0, "log_queries": 10}
+SERVER_TIMING = re.compile(r'(?:(\w+);dur=\d+\.\d;desc="(\d+) calls", )*total;dur=\d+\.\d')
+
+
+@unittest.skipUnless(fakeredis and lupa, "needs fakeredis and lupa")
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        patcher = override_settings(
+            PROFILING=PROFILING_ON,
+            MIDDLEWARE=["movies.profiling.ProfilingMiddleware", *settings.MIDDLEWARE],
+            CACHES=profiled_caches(fakeredis.FakeServer()),
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        user = User.objects.create_user(username="profiled", email="profiled@example.com", password="secret123")
+        self.client.force_authenticate(user)
+        self.tmdb = StubTMDBSession()
+        patcher = mock.patch.object(views.tmdb, "session", self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def timings(self, response):
+        header = response["Server-Timing"]
+        self.assertRegex(header, rf"^{SERVER_TIMING.pattern}$")
+        return {kind: int(calls) for kind, calls in re.findall(r'(\w+);dur=[\d.]+;desc="(\d+) calls"', header)}
+
+    def middleware(self, get_response, **options):
+        with override_settings(PROFILING={**PROFILING_ON, **options}):
+            return ProfilingMiddleware(get_response)
+
+    def test_server_timing_for_a_stored_movie(self):
+        Movie.objects.create(tmdb_id=550, title="Fight Club")
+
+        response = self.client.get("/api/movies/550/")
+
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertEqual({kind: timings[kind] for kind in ("db", "cache")}, {"db": 1, "cache": 2})
+        self.assertNotIn("tmdb", timings)
+        self.assertGreaterEqual(timings["serialize"], 1)
+
+    def test_server_timing_counts_tmdb_calls(self):
+        response = self.client.get("/api/movies/551/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.timings(response)["tmdb"], 1)
+        self.assertEqual(self.tmdb.requested, ["/movie/551"])
+
+    def test_nested_cache_calls_count_once(self):
+        profile = RequestProfile()
+        token = profiling._current.set(profile)
+        try:
+            caches["default"].set_many({"a": 1, "b": 2, "c": 3})  # a pipeline of three set() calls
+            with timed("cache"):
+                caches["default"].get("a")
+        finally:
+            profiling._current.reset(token)
+
+        self.assertEqual(profile.counts["cache"], 2)
+
+    def test_slow_request_logged_with_repeated_queries_grouped(self):
+        def view(request):
+            for tmdb_id in range(3):
+                list(Movie.objects.filter(tmdb_id=tmdb_id))
+            list(Movie.objects.all())
+            return HttpResponse()
+
+        middleware = self.middleware(view, slow_ms=0, sample_rate=1.0)
+        with self.assertLogs("movies.profiling", "WARNING") as logs:
+            middleware(RequestFactory().get("/api/movies/n-plus-one/"))
+
+        [message] = logs.output
+        self.assertIn("Slow request GET /api/movies/n-plus-one/", message)
+        self.assertIn("db 4x", message)
+        lines = message.splitlines()
+        self.assertRegex(lines[1], r'^  3x SELECT .* WHERE "movies_movie"."tmdb_id" = %s')
+        self.assertRegex(lines[2], r"^  1x SELECT ")
+
+    def test_slow_requests_sampled(self):
+        middleware = self.middleware(lambda request: HttpResponse(), slow_ms=0, sample_rate=0.0)
+
+        with self.assertNoLogs("movies.profiling", "WARNING"):
+            response = middleware(RequestFactory().get("/"))
+
+        self.assertRegex(response["Server-Timing"], r"^total;dur=")
+
+    async def test_async_requests_profiled(self):
+        async def view(request):
+            await sync_to_async(list)(Movie.objects.all())
+            profiling.record("tmdb", 0.01)
+            return HttpResponse()
+
+        # Built where the test database connection lives, so its queries get the SQL wrapper
+        middleware = await sync_to_async(self.middleware)(view)
+        response = await middleware(RequestFactory().get("/"))
+
+        self.assertEqual(self.timings(response), {"db": 1, "tmdb": 1})
@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# TMDB-backed endpoints switch to native async views when running under ASGI
+movie_views = async_views if settings.ASYNC_MOVIE_VIEWS else views
 
 urlpatterns = [
-    path("trending/", views.trending_movies),
-    path("search/", views.search_movies), 
-    path("<int:movie_id>/", views.movie_details),  
-    path("<int:movie_id>/recommended/", views.recommended_movies),
+    path("trending/", movie_views.trending_movies),
+    path("search/", movie_views.search_movies), 
+    path("autocomplete/", views.autocomplete),
+    path("for-you/", views.for_you),
+    path("discover/", views.discover),
+    path("<int:movie_id>/", movie_views.movie_details),  
+    path("<int:movie_id>/recommended/", movie_views.recommended_movies),
+    path("<int:movie_id>/also-favorited/", views.also_favorited),
     path("<int:movie_id>/favorite/", views.add_favorite),
     path("favorites/", views.list_favorites),
+    path("favorites/batch/", views.add_favorites_batch),
+    path("favorites/batch/remove/", views.remove_favorites_batch),
+    path("favorites/check/", views.check_favorites),
     path("favorites/<int:movie_id>/remove/", views.remove_favorite),
+    path("cache/stats/", views.cache_stats),
 ]
\ No newline at end of file
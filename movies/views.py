@@ -1,68 +1,123 @@
+import hmac
+import math
+
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-
-from .models import Movie, FavoriteMovie
-from .serializers import MovieSerializer, FavoriteMovieSerializer
-from .services.tmdb import TMDBClient
+from django.conf import settings
+
+from .genres import GENRE_BITS, genre_mask
+from .models import Movie, FavoriteMovie, MovieSimilarity
+from .serializers import (
+    FavoriteMovieSerializer,
+    MovieSerializer,
+    favorite_values,
+    movie_projection,
+    serialize_favorite,
+    serialize_favorites,
+    serialize_movie,
+    serialize_movies,
+)
+from .services.exceptions import TMDBNotFoundError, TMDBUnavailableError
+from .services.tmdb import TMDBClient, request_key
+from .services.movie_sync import fetch_movie_details, sync_movie_from_tmdb, sync_movies_from_tmdb
+from .services.cache import swr_cache
+from .services.search import local_search, autocomplete_titles
+from .services.fallback import recent_movies, movies_sharing_genres
+from .services import metrics as tmdb_metrics
+from .services.pagination import InvalidCursor, keyset_page, seek_page
+from .services.recommender import recommend_for_user
+from .services.similarity import similar_movies
 
 tmdb = TMDBClient()
 
-CACHE_TIMEOUT = 60 * 60  # 1 hour
 
-# Helper function to build full poster URL
-def build_poster_url(poster_path):
-    if poster_path:
-        return f"https://image.tmdb.org/t/p/w500{poster_path}"
-    return None
+def tmdb_unavailable(error):
+    """503 for TMDB calls we had to shed, with Retry-After when we know it."""
+    response = Response({"error": str(error)}, status=503)
+    if error.retry_after:
+        response["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
+
+def local_fallback(error, movies):
+    """While TMDB is unavailable serve whatever we have locally, or a 503 if there's nothing."""
+    if movies:
+        return Response(serialize_movies(movies))
+    return tmdb_unavailable(error)
+
+
+# Loaders used by the stale-while-revalidate cache (fetch + save + serialize)
+
+def load_trending():
+    data = tmdb.get_trending_movies()
+    return serialize_movies(sync_movies_from_tmdb(data.get("results", [])))
+
+
+def load_recommended(movie_id):
+    data = tmdb.get_recommended(movie_id)
+    movies = sync_movies_from_tmdb(data.get("results", []))
+    # TMDB often has nothing for older or niche titles
+    return serialize_movies(movies or similar_content(movie_id))
+
+
+def similar_content(movie_id):
+    """Stored movies with similar overviews, as many as a TMDB page."""
+    return similar_movies(movie_id, MovieSimilarity.CONTENT, limit=20)
+
+
+def load_movie_details(movie_id):
+    # Try to get from database first
+    movie = Movie.objects.filter(tmdb_id=movie_id).first()
+
+    if not movie:
+        # Fetch from TMDB if not in database
+        movie = sync_movie_from_tmdb(tmdb.get_movie_details(movie_id))
+
+    return serialize_movie(movie)
+
+
+def load_search(query):
+    data = tmdb.search_movies(query)
+    return serialize_movies(sync_movies_from_tmdb(data.get("results", [])))
+
+
+def search_cache_key(query):
+    return f"search_movies:{request_key('/search/movie', {'query': query.lower()})}"
+
 
 #Get Trending Movies (cached + auto-save to DB)
 
 @swagger_auto_schema(
     method='get',
     operation_summary="Get trending movies",
-    operation_description="Retrieve currently trending movies from TMDB (cached for 1 hour)",
+    operation_description="Retrieve currently trending movies from TMDB (cached, refreshed in the background)",
     responses={
         200: openapi.Response(
             description="List of trending movies",
             schema=MovieSerializer(many=True)
         ),
-        500: openapi.Response(description="TMDB API error")
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
     }
 )
 
 @api_view(["GET"])
 def trending_movies(request):
   try:
-    cached = cache.get("trending_movies")  #check cache
-
-    if cached:
-        return Response(cached)
-
-    data = tmdb.get_trending_movies() #Fetch from TMDB API
-    movies_data = data.get("results", [])
-
-    movies = []
-    for item in movies_data:
-        movie, _ = Movie.objects.get_or_create(
-            tmdb_id=item["id"],
-            defaults={
-                "title": item.get("title"),
-                "overview": item.get("overview"),
-                "poster_url": build_poster_url(item.get("poster_path")), 
-                "release_date": item.get("release_date"),
-                "genres": item.get("genre_ids", []),
-            }
-        )
-        movies.append(MovieSerializer(movie).data)
-
-    cache.set("trending_movies", movies, CACHE_TIMEOUT)
+    movies = swr_cache.get_or_load("trending", "trending_movies", load_trending)
 
     return Response(movies)
+  except TMDBUnavailableError as e:
+        return local_fallback(e, recent_movies())
   except Exception as e:
         return Response({"error": f"Failed to fetch trending movies: {str(e)}"}, status=500)
 
@@ -71,7 +126,10 @@ def trending_movies(request):
 @swagger_auto_schema(
     method='get',
     operation_summary="Get movie recommendations",
-    operation_description="Get recommended movies based on a specific movie",
+    operation_description=(
+        "Get recommended movies based on a specific movie. From TMDB, or from stored movies with "
+        "similar overviews when TMDB has none (or always, with RECOMMENDATIONS_MODE=local)."
+    ),
     manual_parameters=[
         openapi.Parameter(
             'movie_id', openapi.IN_PATH, 
@@ -86,35 +144,73 @@ def trending_movies(request):
             schema=MovieSerializer(many=True)
         ),
         404: openapi.Response(description="Movie not found"),
-        500: openapi.Response(description="TMDB API error")
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
     }
 )
 
 @api_view(["GET"])
 def recommended_movies(request, movie_id):
     try:
-        data = tmdb.get_recommended(movie_id)
-        movies_data = data.get("results", [])
-
-        movies = []
-        for item in movies_data:
-            movie, _ = Movie.objects.get_or_create(
-                tmdb_id=item["id"],
-                defaults={
-                    "title": item.get("title"),
-                    "overview": item.get("overview", ""),
-                    "poster_url": build_poster_url(item.get("poster_path")),  # ✅ FIXED
-                    "release_date": item.get("release_date"),
-                    "genres": item.get("genre_ids", []),
-                }
-            )
-            movies.append(MovieSerializer(movie).data)
+        if settings.RECOMMENDATIONS_MODE == "local":
+            return Response(serialize_movies(similar_content(movie_id)))
+
+        movies = swr_cache.get_or_load(
+            "recommended", f"recommended_movies:{movie_id}", lambda: load_recommended(movie_id)
+        )
 
         return Response(movies)
     
+    except TMDBNotFoundError:
+        return Response({"error": "Movie not found"}, status=404)
+    except TMDBUnavailableError as e:
+        return local_fallback(e, similar_content(movie_id) or movies_sharing_genres(movie_id))
     except Exception as e:
         return Response({"error": f"Failed to fetch recommendations: {str(e)}"}, status=500)
 
+# Users who favorited this also favorited
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Also favorited",
+    operation_description=(
+        "Movies most often favorited by the users who favorited this one, best first. "
+        "Read from the precomputed similarity table (build_similarities command), no TMDB call."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'movie_id', openapi.IN_PATH,
+            description="TMDB Movie ID",
+            type=openapi.TYPE_INTEGER,
+            required=True
+        ),
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description=f"Number of movies (default 20, max {settings.SIMILAR_MOVIES_TOP_N})",
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Co-favorited movies; empty until enough users favorited this one",
+            schema=MovieSerializer(many=True)
+        ),
+        400: openapi.Response(description="Invalid limit")
+    }
+)
+
+@api_view(["GET"])
+def also_favorited(request, movie_id):
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), settings.SIMILAR_MOVIES_TOP_N))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+
+    try:
+        return Response(serialize_movies(similar_movies(movie_id, MovieSimilarity.COFAVORITE, limit)))
+    except Exception as e:
+        return Response({"error": f"Failed to fetch similar movies: {str(e)}"}, status=500)
+
 # Get Movie Details
 
 @swagger_auto_schema(
@@ -132,32 +228,24 @@ def recommended_movies(request, movie_id):
     responses={
         200: MovieSerializer,
         404: openapi.Response(description="Movie not found"),
-        500: openapi.Response(description="TMDB API error")
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
     }
 )
 
 @api_view(["GET"])
 def movie_details(request, movie_id):
     try:
-        # Try to get from database first
-        movie = Movie.objects.filter(tmdb_id=movie_id).first()
-        
-        if not movie:
-            # Fetch from TMDB if not in database
-            data = tmdb.get_movie_details(movie_id)
-            movie, _ = Movie.objects.get_or_create(
-                tmdb_id=data["id"],
-                defaults={
-                    "title": data.get("title"),
-                    "overview": data.get("overview", ""),
-                    "poster_url": build_poster_url(data.get("poster_path")),  # ✅ FIXED
-                    "release_date": data.get("release_date"),
-                    "genres": [genre["id"] for genre in data.get("genres", [])],
-                }
-            )
+        movie = swr_cache.get_or_load(
+            "details", f"movie_details:{movie_id}", lambda: load_movie_details(movie_id)
+        )
 
-        return Response(MovieSerializer(movie).data)
+        return Response(movie)
     
+    except TMDBNotFoundError:
+        return Response({"error": "Movie not found"}, status=404)
+    except TMDBUnavailableError as e:
+        return tmdb_unavailable(e)
     except Exception as e:
         return Response({"error": f"Failed to fetch movie details: {str(e)}"}, status=500)
 
@@ -166,7 +254,7 @@ def movie_details(request, movie_id):
 @swagger_auto_schema(
     method='get',
     operation_summary="Search movies",
-    operation_description="Search for movies by title",
+    operation_description="Search stored movies by title and overview, falling back to TMDB when there are too few local matches",
     manual_parameters=[
         openapi.Parameter(
             'query', openapi.IN_QUERY, 
@@ -181,7 +269,8 @@ def movie_details(request, movie_id):
             schema=MovieSerializer(many=True)
         ),
         400: openapi.Response(description="Missing query parameter"),
-        500: openapi.Response(description="TMDB API error")
+        500: openapi.Response(description="TMDB API error"),
+        503: openapi.Response(description="TMDB unavailable, retry after Retry-After seconds")
     }
 )
 
@@ -192,28 +281,254 @@ def search_movies(request):
         if not query:
             return Response({"error": "Query parameter is required"}, status=400)
 
-        data = tmdb.search_movies(query)
-        movies_data = data.get("results", [])
-
-        movies = []
-        for item in movies_data:
-            movie, _ = Movie.objects.get_or_create(
-                tmdb_id=item["id"],
-                defaults={
-                    "title": item.get("title"),
-                    "overview": item.get("overview", ""),
-                    "poster_url": build_poster_url(item.get("poster_path")),  # ✅ FIXED
-                    "release_date": item.get("release_date"),
-                    "genres": item.get("genre_ids", []),
-                }
-            )
-            movies.append(MovieSerializer(movie).data)
+        local = list(local_search(query)[:settings.LOCAL_SEARCH_LIMIT])
+        if len(local) >= settings.LOCAL_SEARCH_MIN_RESULTS:
+            return Response(serialize_movies(local))
+
+        try:
+            movies = swr_cache.get_or_load("search", search_cache_key(query), lambda: load_search(query))
+        except TMDBUnavailableError as e:
+            # Fewer local matches than we'd like, but better than nothing
+            return local_fallback(e, local)
 
         return Response(movies)
     
     except Exception as e:
         return Response({"error": f"Search failed: {str(e)}"}, status=500)
 
+# Title autocomplete
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Autocomplete movie titles",
+    operation_description="Typo-tolerant title suggestions from stored movies (no TMDB call). Public and cacheable.",
+    manual_parameters=[
+        openapi.Parameter(
+            'q', openapi.IN_QUERY,
+            description="Partial title (at least 3 characters)",
+            type=openapi.TYPE_STRING,
+            required=True
+        ),
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description="Max suggestions (capped at 10)",
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Suggestions",
+            examples={
+                "application/json": [
+                    {"id": 12, "tmdb_id": 11, "title": "Star Wars", "year": 1977}
+                ]
+            }
+        ),
+        400: openapi.Response(description="Invalid limit")
+    }
+)
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    query = " ".join(request.GET.get('q', '').split()).lower()
+
+    try:
+        limit = min(int(request.GET.get('limit', settings.AUTOCOMPLETE_MAX_RESULTS)), settings.AUTOCOMPLETE_MAX_RESULTS)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+
+    if len(query) < settings.AUTOCOMPLETE_MIN_LENGTH or limit < 1:
+        suggestions = []
+    else:
+        key = f"autocomplete:{limit}:{request_key('autocomplete', query)}"
+        suggestions = cache.get(key)
+        if suggestions is None:
+            suggestions = list(autocomplete_titles(query, limit))
+            cache.set(key, suggestions, settings.AUTOCOMPLETE_CACHE_TTL)
+
+    response = Response(suggestions)
+    patch_cache_control(response, public=True, max_age=settings.AUTOCOMPLETE_CACHE_TTL)
+    return response
+
+# Personalized recommendations
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Movies for you",
+    operation_description=(
+        "Stored movies ranked against the user's preferred genres and languages and their favorites. "
+        "Scored locally, no TMDB call. Favorites are left out."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description=f"Number of movies (default {settings.RECOMMENDER['page_size']}, max {settings.RECOMMENDER['max_page_size']})",
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: MovieSerializer(many=True),
+        400: openapi.Response(description="Invalid limit"),
+        401: openapi.Response(description="Authentication required")
+    }
+)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def for_you(request):
+    try:
+        limit = int(request.GET.get('limit', settings.RECOMMENDER["page_size"]))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, settings.RECOMMENDER["max_page_size"]))
+
+    try:
+        return Response(serialize_movies(recommend_for_user(request.user, limit)))
+    except Exception as e:
+        return Response({"error": f"Failed to build recommendations: {str(e)}"}, status=500)
+
+# Discover stored movies
+
+DISCOVER_ORDERINGS = ["-popularity", "-release_date", "release_date"]
+
+
+def discover_queryset(params):
+    """Stored movies matching the discover query params. Raises ValueError on invalid ones."""
+    movies = Movie.objects.defer("search_vector")
+
+    genres = [value.strip() for value in params.get('genres', '').split(",") if value.strip()]
+    if genres:
+        if not all(value.isdigit() for value in genres):
+            raise ValueError("genres must be comma-separated TMDB genre ids")
+        unknown = sorted({int(value) for value in genres} - set(GENRE_BITS))
+        if unknown:
+            raise ValueError(f"Unknown genre ids: {', '.join(map(str, unknown))}")
+        mask = genre_mask(int(value) for value in genres)
+        match = params.get('genres_match', 'any')
+        if match not in ("any", "all"):
+            raise ValueError("genres_match must be any or all")
+        movies = movies.alias(matched=F("genre_mask").bitand(mask))
+        movies = movies.filter(matched=mask) if match == "all" else movies.filter(matched__gt=0)
+
+    if params.get('language'):
+        movies = movies.filter(language=params['language'])
+
+    for param, lookup in (('release_date_gte', 'release_date__gte'), ('release_date_lte', 'release_date__lte')):
+        if params.get(param):
+            try:
+                day = parse_date(params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValueError(f"{param} must be a date (YYYY-MM-DD)")
+            movies = movies.filter(**{lookup: day})
+
+    return movies
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Discover movies",
+    operation_description=(
+        "Stored movies filtered by genres, original language and release date, one page at a time. "
+        "Answered from the local catalog with indexes, no TMDB call. "
+        "Follow `next` (or pass its `cursor`) for the following page; it's null on the last one."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'genres', openapi.IN_QUERY,
+            description="Comma-separated TMDB genre ids, e.g. 28,12",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'genres_match', openapi.IN_QUERY,
+            description="any: movies in at least one of the genres (default); all: in every one",
+            type=openapi.TYPE_STRING,
+            enum=["any", "all"]
+        ),
+        openapi.Parameter(
+            'language', openapi.IN_QUERY,
+            description="Original language (ISO 639-1), e.g. en",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'release_date_gte', openapi.IN_QUERY,
+            description="Released on or after this date (YYYY-MM-DD)",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'release_date_lte', openapi.IN_QUERY,
+            description="Released on or before this date (YYYY-MM-DD)",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'ordering', openapi.IN_QUERY,
+            description="Sort order (default -popularity). Release date orderings leave out movies without one",
+            type=openapi.TYPE_STRING,
+            enum=DISCOVER_ORDERINGS
+        ),
+        openapi.Parameter(
+            'cursor', openapi.IN_QUERY,
+            description="Opaque position returned as next_cursor by the previous page",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description=f"Page size (default {settings.DISCOVER_PAGE_SIZE}, max {settings.DISCOVER_MAX_PAGE_SIZE})",
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="A page of movies",
+            examples={
+                "application/json": {
+                    "next": "http://localhost:8000/api/movies/discover/?genres=28&cursor=WyItcG9wdWxhcml0eSIsNDIuNSw3XQ",
+                    "next_cursor": "WyItcG9wdWxhcml0eSIsNDIuNSw3XQ",
+                    "results": [{"tmdb_id": 550, "title": "Fight Club", "genres": [18]}]
+                }
+            }
+        ),
+        400: openapi.Response(description="Invalid filter, ordering, cursor or limit")
+    }
+)
+
+@api_view(["GET"])
+def discover(request):
+    try:
+        limit = int(request.GET.get('limit', settings.DISCOVER_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, settings.DISCOVER_MAX_PAGE_SIZE))
+
+    ordering = request.GET.get('ordering', DISCOVER_ORDERINGS[0])
+    if ordering not in DISCOVER_ORDERINGS:
+        return Response({"error": f"ordering must be one of {', '.join(DISCOVER_ORDERINGS)}"}, status=400)
+
+    try:
+        movies = discover_queryset(request.GET)
+        if ordering != "-popularity":
+            movies = movies.filter(release_date__isnull=False)
+        rows, next_cursor = seek_page(movies, ordering, request.GET.get('cursor'), limit)
+    except ValueError as e:  # InvalidCursor too
+        return Response({"error": str(e)}, status=400)
+    except Exception as e:
+        return Response({"error": f"Failed to discover movies: {str(e)}"}, status=500)
+
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return Response({
+        "next": next_url,
+        "next_cursor": next_cursor,
+        "results": serialize_movies(rows),
+    })
+
 # Add to favorites
 
 @swagger_auto_schema(
@@ -253,16 +568,9 @@ def add_favorite(request, movie_id):
                 tmdb_data = tmdb.get_movie_details(movie_id)
                 
                 # Create the movie in local database
-                movie, created = Movie.objects.get_or_create(
-                    tmdb_id=tmdb_data["id"],
-                    defaults={
-                        "title": tmdb_data.get("title"),
-                        "overview": tmdb_data.get("overview", ""),
-                        "poster_url": build_poster_url(tmdb_data.get("poster_path")),
-                        "release_date": tmdb_data.get("release_date"),
-                        "genres": [genre["id"] for genre in tmdb_data.get("genres", [])],
-                    }
-                )
+                movie = sync_movie_from_tmdb(tmdb_data)
+            except TMDBUnavailableError as e:
+                return tmdb_unavailable(e)
             except Exception as e:
                 return Response({"error": f"Movie not found in TMDB: {str(e)}"}, status=404)
 
@@ -275,7 +583,7 @@ def add_favorite(request, movie_id):
         if not created:
             return Response({"message": "Already in favorites"})
 
-        return Response(FavoriteMovieSerializer(fav).data)
+        return Response(serialize_favorite(fav))
     
     except Exception as e:
         return Response({"error": f"Failed to add favorite: {str(e)}"}, status=500)
@@ -285,12 +593,41 @@ def add_favorite(request, movie_id):
 @swagger_auto_schema(
     method='get',
     operation_summary="List favorite movies",
-    operation_description="Get user's list of favorite movies",
+    operation_description=(
+        "Get user's favorite movies, newest first, one page at a time. "
+        "Follow `next` (or pass its `cursor`) for the following page; it's null on the last one."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'cursor', openapi.IN_QUERY,
+            description="Opaque position returned as next_cursor by the previous page",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description=f"Page size (default {settings.FAVORITES_PAGE_SIZE}, max {settings.FAVORITES_MAX_PAGE_SIZE})",
+            type=openapi.TYPE_INTEGER
+        ),
+        openapi.Parameter(
+            'fields', openapi.IN_QUERY,
+            description="Comma-separated movie fields to return, e.g. tmdb_id,title (default: all)",
+            type=openapi.TYPE_STRING
+        )
+    ],
     responses={
         200: openapi.Response(
-            description="List of favorite movies",
-            schema=FavoriteMovieSerializer(many=True)
+            description="A page of favorite movies",
+            examples={
+                "application/json": {
+                    "next": "http://localhost:8000/api/movies/favorites/?cursor=MjAyNi0xMC0xN1QwOTowMDowMCswMDowMHw0Mg",
+                    "next_cursor": "MjAyNi0xMC0xN1QwOTowMDowMCswMDowMHw0Mg",
+                    "results": [
+                        {"id": 42, "movie": {"tmdb_id": 550, "title": "Fight Club"}, "added_at": "2026-10-17T09:00:00Z"}
+                    ]
+                }
+            }
         ),
+        400: openapi.Response(description="Invalid cursor, limit or fields"),
         401: openapi.Response(description="Authentication required")
     }
 )
@@ -299,12 +636,37 @@ def add_favorite(request, movie_id):
 @permission_classes([IsAuthenticated])
 def list_favorites(request):
     try:
-        favs = FavoriteMovie.objects.filter(user=request.user).select_related('movie')
-        return Response(FavoriteMovieSerializer(favs, many=True).data)
-    
+        limit = int(request.GET.get('limit', settings.FAVORITES_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, settings.FAVORITES_MAX_PAGE_SIZE))
+
+    fields = request.GET.get('fields')
+    try:
+        projection = movie_projection([name.strip() for name in fields.split(",") if name.strip()] if fields else None)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        favs = FavoriteMovie.objects.filter(user=request.user).values(*favorite_values(projection))
+        rows, next_cursor = keyset_page(favs, request.GET.get('cursor'), limit)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
     except Exception as e:
         return Response({"error": f"Failed to fetch favorites: {str(e)}"}, status=500)
 
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return Response({
+        "next": next_url,
+        "next_cursor": next_cursor,
+        "results": serialize_favorites(rows, projection),
+    })
+
 # Remove from favorites
 
 @swagger_auto_schema(
@@ -348,4 +710,193 @@ def remove_favorite(request, movie_id):
         return Response({"message": "Removed from favorites"})
     
     except Exception as e:
-        return Response({"error": f"Failed to remove favorite: {str(e)}"}, status=500)
\ No newline at end of file
+        return Response({"error": f"Failed to remove favorite: {str(e)}"}, status=500)
+
+# Batch favorites
+
+TMDB_IDS_BODY = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=['tmdb_ids'],
+    properties={
+        'tmdb_ids': openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Items(type=openapi.TYPE_INTEGER),
+            description=f"TMDB movie IDs (at most {settings.FAVORITES_BATCH_MAX})"
+        )
+    }
+)
+
+
+def parse_tmdb_ids(values):
+    """Deduplicated TMDB ids, in order. Takes ints or digit strings, raises ValueError on anything else."""
+    error = ValueError("tmdb_ids must be a non-empty list of integers")
+    if not isinstance(values, list) or not values:
+        raise error
+    if len(values) > settings.FAVORITES_BATCH_MAX:
+        raise ValueError(f"At most {settings.FAVORITES_BATCH_MAX} tmdb_ids per request")
+
+    ids = []
+    for value in values:
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if type(value) is not int:  # bools are ints too
+            raise error
+        ids.append(value)
+    return list(dict.fromkeys(ids))
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Add many movies to favorites",
+    operation_description=(
+        "Favorites a list of TMDB movies in one request. Movies we don't store yet are fetched "
+        "from TMDB concurrently; ids TMDB can't return are listed in `failed`."
+    ),
+    request_body=TMDB_IDS_BODY,
+    responses={
+        200: openapi.Response(
+            description="TMDB ids now in favorites and ids that couldn't be fetched",
+            examples={"application/json": {"favorited": [550, 680], "failed": [999999]}}
+        ),
+        400: openapi.Response(description="Invalid tmdb_ids"),
+        401: openapi.Response(description="Authentication required")
+    }
+)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def add_favorites_batch(request):
+    try:
+        tmdb_ids = parse_tmdb_ids(request.data.get('tmdb_ids'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        movies = {movie.tmdb_id: movie for movie in Movie.objects.filter(tmdb_id__in=tmdb_ids)}
+
+        failed = []
+        missing = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in movies]
+        if missing:
+            payloads, failed = fetch_movie_details(missing, client=tmdb)
+            movies.update((movie.tmdb_id, movie) for movie in sync_movies_from_tmdb(payloads))
+
+        # Already favorited movies are skipped by the unique (user, movie) constraint
+        FavoriteMovie.objects.bulk_create(
+            [FavoriteMovie(user=request.user, movie=movies[tmdb_id]) for tmdb_id in tmdb_ids if tmdb_id in movies],
+            ignore_conflicts=True,
+        )
+
+        return Response({
+            "favorited": [tmdb_id for tmdb_id in tmdb_ids if tmdb_id in movies],
+            "failed": [tmdb_id for tmdb_id in tmdb_ids if tmdb_id in failed],
+        })
+
+    except Exception as e:
+        return Response({"error": f"Failed to add favorites: {str(e)}"}, status=500)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Remove many movies from favorites",
+    operation_description="Removes a list of TMDB movies from user's favorites in one query",
+    request_body=TMDB_IDS_BODY,
+    responses={
+        200: openapi.Response(
+            description="Number of favorites removed",
+            examples={"application/json": {"removed": 2}}
+        ),
+        400: openapi.Response(description="Invalid tmdb_ids"),
+        401: openapi.Response(description="Authentication required")
+    }
+)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def remove_favorites_batch(request):
+    try:
+        tmdb_ids = parse_tmdb_ids(request.data.get('tmdb_ids'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        removed, _ = FavoriteMovie.objects.filter(user=request.user, movie__tmdb_id__in=tmdb_ids).delete()
+        return Response({"removed": removed})
+
+    except Exception as e:
+        return Response({"error": f"Failed to remove favorites: {str(e)}"}, status=500)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Check which movies are favorited",
+    operation_description="Favorite status for a whole page of TMDB movies in one query, e.g. to mark hearts on trending",
+    manual_parameters=[
+        openapi.Parameter(
+            'tmdb_ids', openapi.IN_QUERY,
+            description=f"Comma-separated TMDB movie IDs (at most {settings.FAVORITES_BATCH_MAX})",
+            type=openapi.TYPE_STRING,
+            required=True
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Favorite status per TMDB id",
+            examples={"application/json": {"550": True, "680": False}}
+        ),
+        400: openapi.Response(description="Invalid tmdb_ids"),
+        401: openapi.Response(description="Authentication required")
+    }
+)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def check_favorites(request):
+    raw = request.GET.get('tmdb_ids', '')
+    try:
+        tmdb_ids = parse_tmdb_ids([value for value in raw.split(",") if value.strip()])
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    favorited = set(
+        FavoriteMovie.objects.filter(user=request.user, movie__tmdb_id__in=tmdb_ids)
+        .values_list("movie__tmdb_id", flat=True)
+    )
+    return Response({tmdb_id: tmdb_id in favorited for tmdb_id in tmdb_ids})
+
+# Cache statistics
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Movie cache statistics",
+    operation_description="Hit, stale and miss counts per cached endpoint for the serving process (admin only)",
+    responses={
+        200: openapi.Response(
+            description="Counts per endpoint",
+            examples={
+                "application/json": {
+                    "trending": {"hit": 120, "stale": 3, "miss": 1}
+                }
+            }
+        ),
+        403: openapi.Response(description="Admin access required")
+    }
+)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(swr_cache.stats())
+
+
+# Prometheus scrape endpoint.
+# Plain Django view: no JWT, no content negotiation, nothing in the schema.
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Fail closed: without a token only a DEBUG server shows its metrics
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(tmdb_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,3 +1,50 @@
-from django.test import TestCase
+from django.test import override_settings
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from movies.tests import LOCMEM_CACHES, BudgetAssertions
+from .models import User, UserPreference
+
+
+# Query / cache-call budgets for every users route (see movies/tests.py)
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserEndpointBudgetTests(BudgetAssertions, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="budget", email="budget@example.com", password="secret123")
+        self.client.force_authenticate(self.user)
+
+    def test_register(self):
+        self.client.force_authenticate(None)
+
+        # unique checks for username and email, the user, its preferences
+        with self.assertBudget(queries=4, cache_calls=0):
+            response = self.client.post(
+                "/api/users/register/",
+                {"username": "new", "email": "new@example.com", "password": "secret123"},
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(UserPreference.objects.filter(user__username="new").exists())
+
+    def test_profile(self):
+        with self.assertBudget(queries=0, cache_calls=0):
+            response = self.client.get("/api/users/profile/")
+
+        self.assertEqual(response.data["username"], "budget")
+
+    def test_get_preferences(self):
+        UserPreference.objects.create(user=self.user)
+
+        with self.assertBudget(queries=1, cache_calls=0):
+            response = self.client.get("/api/users/preferences/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_preferences(self):
+        UserPreference.objects.create(user=self.user)
+
+        with self.assertBudget(queries=2, cache_calls=0):
+            response = self.client.put(
+                "/api/users/preferences/update/", {"preferred_genres": [18, 35]}, format="json"
+            )
+
+        self.assertEqual(response.data["preferred_genres"], [18, 35])